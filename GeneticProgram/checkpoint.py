@@ -0,0 +1,62 @@
+"""
+Generation-level checkpoints of evolution runs, so a long run that is stopped can go on from its last finished
+generation instead of starting over. A checkpoint is a pickled dict with the state of a run after a generation:
+the population itself (the agents with their traits, scores or ratings and move times), the agent counter, the
+metrics of every generation so far and the state of the random module. Everything a run draws comes from the random
+module, so a run resumed from a checkpoint makes the same choices as the run that saved it would have made.
+See GeneticProgram.evolution(), the main loop of genetic_results.py and all_together/genetic_program_runner.py.
+"""
+import os
+import pickle
+import random
+from typing import Optional
+
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path: str, state: dict) -> None:
+    """
+    Writes a checkpoint atomically: the state goes to a temporary file next to the checkpoint, which then replaces
+    it, so a crash while writing leaves the previous checkpoint as it was.
+    @param path: The checkpoint file
+    @param state: The state of the run, anything picklable. The state of the random module is added to it.
+    @return: None
+    """
+    state = dict(state, version=CHECKPOINT_VERSION, random_state=random.getstate())
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    """
+    Reads a checkpoint and puts the random module back in the state it was saved in.
+    @param path: The checkpoint file
+    @return: The state given to save_checkpoint(), None if there is no checkpoint yet
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        state = pickle.load(f)
+    if not isinstance(state, dict) or state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f'{path} is not an evolution checkpoint')
+    random.setstate(state['random_state'])
+    return state
+
+
+def check_run(state: dict, **parameters) -> None:
+    """
+    Makes sure a checkpoint is resumed with the parameters of the run that saved it.
+    @param state: A loaded checkpoint, saved with the parameters in a 'parameters' dict
+    @param parameters: The parameters of the run that resumes it
+    @return: None
+    """
+    if state['parameters'] != parameters:
+        raise ValueError(f"The checkpoint was saved by a run with {state['parameters']}, not {parameters}")
@@ -3,18 +3,46 @@ A lot of this currently holds place holders for things like the parents and chil
 be replaced once the needed portions of the genetic agent have been fleshed out.
 """
 
+import os
 import random
 from time import time
 
 from agent.genetic_agent import GeneticAgent
-from playground.evaluator import evaluate
+from game.archive import ArchiveWriter
+from GeneticProgram.checkpoint import check_run, load_checkpoint, save_checkpoint
+from playground.evaluator import evaluate, evaluate_pairs
+from playground.match_cache import MatchCache
 from typing import Optional, Tuple, List
 
 
 class GeneticProgram:
 
-    def __init__(self):
+    def __init__(self, workers: Optional[int] = None, archive_path: Optional[str] = None,
+                 cache_path: Optional[str] = None, checkpoint_path: Optional[str] = None,
+                 seed: Optional[int] = None):
+        """
+        @param workers: Number of processes to play a generation's matches in. The matches are played one after
+        another if None.
+        @param archive_path: If given, every game of the evolution is appended to this game archive (see
+        game.archive), tagged with its generation
+        @param cache_path: If given, match results are kept in this SQLite file and pairings of traits that were
+        already played are not played again, see playground.match_cache. Needs a seed.
+        @param checkpoint_path: If given, the state of the evolution is saved to this file after every generation
+        and evolution(resume=True) goes on from it, see GeneticProgram.checkpoint
+        @param seed: Seed the matches are played with, see evaluate_pairs(). With the match cache, every match is
+        seeded from it and the pairing, so the cached results are the ones the matches would give again.
+        """
         self.current_agent_number = 0
+        self.workers = workers
+        self.archive_path = archive_path
+        self.archive: Optional[ArchiveWriter] = None
+        self.cache_path = cache_path
+        self.cache: Optional[MatchCache] = None
+        self.cache_counts: List[Tuple[int, int]] = []  # (hits, misses) of the match cache in every generation
+        self.seed = seed
+        self.generation_number = 0
+        self.checkpoint_path = checkpoint_path
+        self.generation_metrics: List[dict] = []  # best agent and duration of every generation
 
     def generate_random_agent(self) -> GeneticAgent:
         """
@@ -151,17 +179,19 @@ class GeneticProgram:
 
         return child
 
-    def fitness(self, pool, top_k_num):
+    def fitness(self, pool, top_k_num, tie_break: str = 'p90'):
         """
         Takes in a list of agents and finds the top k agents in the list using the agents total
-        win score and if there is a tie then their average running time.
+        win score and if there is a tie then their move times.
         @param pool: A list of genetic agent to be evaluated for fitness
         @param top_k_num: The max number of agents to allow through
+        @param tie_break: 'p90' to prefer the agent whose moves take the least time 90% of the time (see
+        Agent.latency), 'mean' to prefer the lowest average move time
         @return: A list of the top k genetic agents from the given pool
         """
-        #pool.sort(key=lambda x: (x.total_win_score, x.average_time), reverse=True)
+        assert tie_break in ('p90', 'mean')
         print("Performing fitness")
-        pool.sort(key=lambda x: x.average_time)
+        pool.sort(key=(lambda x: x.latency.p90) if tie_break == 'p90' else (lambda x: x.average_time))
         pool.sort(key=lambda x: x.total_win_score, reverse=True)
         return pool[0:top_k_num]
 
@@ -176,81 +206,138 @@ class GeneticProgram:
 
         def generation_runner(player, competition):
             """
-            Plays one agents against all of the other agents
+            Pairs one agent with all of the other agents
             @param player: The main genetic agent being tested
             @param competition: The remaining agents in the pool
-            @return: None
+            @return: A list of (player, opponent) pairs
             """
             print("Starting competition with " + player.agent_name)
-            for opponent in competition:
-                player_score = evaluate(player, opponent, 6)
-                player.total_win_score += player_score
-                opponent.total_win_score += (1 - player_score)
-                player.total_genetic_rounds += 1
+            return [(player, opponent) for opponent in competition]
 
         finished_agents = []
+        pairs = []
         for num in range(0, len(pool)):
             current_agent = pool.pop()
-            generation_runner(current_agent, pool)
+            pairs.extend(generation_runner(current_agent, pool))
             finished_agents.append(current_agent)
 
+        # The matches may be played in parallel, the scores are added up in the same order as they were paired
+        if self.archive is not None:
+            self.archive.set_extra(generation=self.generation_number)
+        if self.cache is not None:
+            scores = self.cache.evaluate_pairs(pairs, 6, self.workers, self.seed, archive=self.archive)
+            hits, misses = self.cache.take_counts()
+            self.cache_counts.append((hits, misses))
+            print("Match cache: " + str(hits) + " hits, " + str(misses) + " misses")
+        else:
+            scores = evaluate_pairs(pairs, 6, self.workers, self.seed, archive=self.archive)
+        self.generation_number += 1
+        for (player, opponent), player_score in zip(pairs, scores):
+            player.total_win_score += player_score
+            opponent.total_win_score += (1 - player_score)
+            player.total_genetic_rounds += 1
+
         remaining = self.fitness(finished_agents, top_k_num)
 
         return remaining
 
-    def evolution(self, generation_num, agent_num, top_k_num):
+    def evolution(self, generation_num, agent_num, top_k_num, resume: bool = False):
         """
         Perform evolution over the specified number of generations and return the top agent after evolution
         @param generation_num: The number of generations the evolution process should occur over
         @param agent_num: The number of agents that should be in each generation
         @param top_k_num: The max number of agents from each generation to accept into the parent pool
+        @param resume: Go on from the checkpoint at checkpoint_path, if there is one, instead of starting over. The
+        run must have the same parameters as the one that saved it. It then plays the same games and makes the same
+        choices as that run would have. The results of a match cache in memory are not kept, so with one the matches
+        must be seeded for that to hold.
         @return: The top genetic agent after evolution has concluded
         """
 
-        def evolution_runner(current_pool, generations_left):
+        def evolution_runner(current_pool, first_generation):
             """
-            A recursive function that actually runs the evolution process for the specified
-            number of generations
+            Runs the evolution process from the given generation until the specified number of generations
             @param current_pool: A list of genetic agents that represents the current generation
             of agents
-            @param generations_left: The number of remaining generations before evolutions concludes
+            @param first_generation: The number of generations that are already done
             @return: A list of the final generation of agents
             """
-            print(str(generations_left) + " Evolution generations remaining")
-            if generations_left <= 0:
-                return current_pool
-            winners = self.generation(current_pool, top_k_num)
-            next_gen = self.reproduce(winners)
-
-            for parent in winners:
-                if len(next_gen) >= agent_num:
-                    break
-                if generations_left - 1 > 0:
-                    parent.total_win_score = 0
-                next_gen.append(parent)
-
-            if len(next_gen) < agent_num:
-                for nm in range(len(next_gen), agent_num):
-                    next_gen.append(self.generate_random_agent())
-            elif len(next_gen) > agent_num:
-                next_gen = next_gen[0:agent_num]
-
-            if generations_left - 1 <= 0:
-                return winners
-
-            return evolution_runner(next_gen, generations_left-1)
-
+            for generation in range(first_generation, generation_num):
+                generations_left = generation_num - generation
+                print(str(generations_left) + " Evolution generations remaining")
+                generation_start = time()
+                winners = self.generation(current_pool, top_k_num)
+                self.generation_metrics.append({
+                    'generation': generation,
+                    'best_agent': winners[0].agent_name,
+                    'best_traits': list(winners[0].traits),
+                    'best_score': winners[0].total_win_score,
+                    'best_p90_ms': winners[0].latency.p90 / 1e6,
+                    'seconds': time() - generation_start,
+                })
+                next_gen = self.reproduce(winners)
+
+                for parent in winners:
+                    if len(next_gen) >= agent_num:
+                        break
+                    if generations_left - 1 > 0:
+                        parent.total_win_score = 0
+                    next_gen.append(parent)
+
+                if len(next_gen) < agent_num:
+                    for nm in range(len(next_gen), agent_num):
+                        next_gen.append(self.generate_random_agent())
+                elif len(next_gen) > agent_num:
+                    next_gen = next_gen[0:agent_num]
+
+                # The last generation ends the evolution with its winners
+                current_pool = next_gen if generations_left - 1 > 0 else winners
+                if self.checkpoint_path is not None:
+                    self.write_checkpoint(current_pool, generation + 1, parameters, round(time()) - start_time)
+            return current_pool
+
+        parameters = {'generation_num': generation_num, 'agent_num': agent_num, 'top_k_num': top_k_num}
         start_time = round(time())
 
-
-        pool = []
-        print("starting evolution")
-        # Generate the initial agent pool
-        for num in range(0, agent_num):
-            pool.append(self.generate_random_agent())
+        state = None
+        if resume and self.checkpoint_path is not None:
+            state = load_checkpoint(self.checkpoint_path)
+        if state is not None:
+            check_run(state, **parameters)
+            pool = state['population']
+            first_generation = state['generation']
+            start_time -= state['elapsed']
+            self.current_agent_number = state['agent_number']
+            self.generation_metrics = state['metrics']
+            self.cache_counts = state['cache_counts']
+            print("resuming evolution after generation " + str(first_generation))
+        else:
+            pool = []
+            first_generation = 0
+            self.generation_metrics = []
+            self.cache_counts = []
+            print("starting evolution")
+            # Generate the initial agent pool
+            for num in range(0, agent_num):
+                pool.append(self.generate_random_agent())
 
         # Run for the specified number of generations
-        final_gen = evolution_runner(pool, generation_num)
+        self.generation_number = first_generation
+        if self.archive_path is not None:
+            self.archive = ArchiveWriter(self.archive_path)
+            if state is not None and state['archive_games'] is not None:
+                self.archive.truncate(state['archive_games'])
+        if self.cache_path is not None:
+            self.cache = MatchCache(self.cache_path)
+        try:
+            final_gen = evolution_runner(pool, first_generation)
+        finally:
+            if self.archive is not None:
+                self.archive.close()
+                self.archive = None
+            if self.cache is not None:
+                self.cache.close()
+                self.cache = None
 
         # Perform fitness on final generation
         remaining = self.fitness(final_gen, top_k_num)
@@ -262,13 +349,35 @@ class GeneticProgram:
         print("Top agent name: " + top_agent.agent_name)
         print("Traits: " + str(top_agent.traits))
         print("Average move time: " + str(top_agent.average_time) + " milliseconds")
+        print("90th percentile move time: " + str(top_agent.latency.p90 / 1e6) + " milliseconds")
         print("Total competition score: " + str(top_agent.total_win_score))
+        print("Search: " + str(top_agent.search_stats.summary()))
         print("Evolution completed in " + str(end_time - start_time) + " seconds")
         return top_agent
 
+    def write_checkpoint(self, pool: List[GeneticAgent], generation: int, parameters: dict, elapsed: int) -> None:
+        """
+        Saves the state of the evolution after a generation to checkpoint_path, see GeneticProgram.checkpoint
+        @param pool: The agents of the next generation, or the winners of the last one
+        @param generation: The number of generations done
+        @param parameters: The parameters of evolution(), which a resumed run must have too
+        @param elapsed: Seconds the evolution has run for
+        @return: None
+        """
+        save_checkpoint(self.checkpoint_path, {
+            'parameters': parameters,
+            'generation': generation,
+            'population': pool,
+            'agent_number': self.current_agent_number,
+            'metrics': self.generation_metrics,
+            'cache_counts': self.cache_counts,
+            'archive_games': len(self.archive) if self.archive is not None else None,
+            'elapsed': elapsed,
+        })
+
 
 if __name__ == '__main__':
-    genetic = GeneticProgram()
+    genetic = GeneticProgram(workers=os.cpu_count())
 
     # The top_k_size should be about half the size of the agent pool
     genetic.evolution(2,4,2)
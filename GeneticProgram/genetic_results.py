@@ -11,15 +11,19 @@ import numpy as np
 from agent.simple_minimax_agent import SimpleMinimaxAgent
 from agent.base_agent import Agent
 from agent.genetic_agent import GeneticAgent
-from playground.evaluator import evaluate
+from playground.evaluator import evaluate, evaluate_pairs
 from typing import Optional, Tuple, List
 
 
 class GeneticProgram:
     current_agent_number = 0
 
-    def __init__(self):
-        pass
+    def __init__(self, workers: Optional[int] = None):
+        """
+        @param workers: Number of processes to play a generation's matches in. The matches are played one after
+        another if None.
+        """
+        self.workers = workers
 
     def generate_random_agent(self) -> GeneticAgent:
         """
@@ -156,17 +160,19 @@ class GeneticProgram:
 
         return child
 
-    def fitness(self, pool, top_k_num):
+    def fitness(self, pool, top_k_num, tie_break: str = 'p90'):
         """
         Takes in a list of agents and finds the top k agents in the list using the agents total
-        win score and if there is a tie then their average running time.
+        win score and if there is a tie then their move times.
         @param pool: A list of genetic agent to be evaluated for fitness
         @param top_k_num: The max number of agents to allow through
+        @param tie_break: 'p90' to prefer the agent whose moves take the least time 90% of the time (see
+        Agent.latency), 'mean' to prefer the lowest average move time
         @return: A list of the top k genetic agents from the given pool
         """
-        # pool.sort(key=lambda x: (x.total_win_score, x.average_time), reverse=True)
+        assert tie_break in ('p90', 'mean')
         print("Performing fitness")
-        pool.sort(key=lambda x: x.average_time)
+        pool.sort(key=(lambda x: x.latency.p90) if tie_break == 'p90' else (lambda x: x.average_time))
         pool.sort(key=lambda x: x.total_win_score, reverse=True)
         return pool[0:top_k_num]
 
@@ -181,24 +187,28 @@ class GeneticProgram:
 
         def generation_runner(player, competition):
             """
-            Plays one agents against all of the other agents
+            Pairs one agent with all of the other agents
             @param player: The main genetic agent being tested
             @param competition: The remaining agents in the pool
-            @return: None
+            @return: A list of (player, opponent) pairs
             """
             print("Starting competition with " + player.agent_name)
-            for opponent in competition:
-                player_score = evaluate(player, opponent, 6)
-                player.total_win_score += player_score
-                opponent.total_win_score += (1 - player_score)
-                player.total_genetic_rounds += 1
+            return [(player, opponent) for opponent in competition]
 
         finished_agents = []
+        pairs = []
         for num in range(0, len(pool)):
             current_agent = pool.pop()
-            generation_runner(current_agent, pool)
+            pairs.extend(generation_runner(current_agent, pool))
             finished_agents.append(current_agent)
 
+        # The matches may be played in parallel, the scores are added up in the same order as they were paired
+        scores = evaluate_pairs(pairs, 6, self.workers)
+        for (player, opponent), player_score in zip(pairs, scores):
+            player.total_win_score += player_score
+            opponent.total_win_score += (1 - player_score)
+            player.total_genetic_rounds += 1
+
         remaining = self.fitness(finished_agents, top_k_num)
 
         return remaining
@@ -266,6 +276,7 @@ class GeneticProgram:
         print("Top agent name: " + top_agent.agent_name)
         print("Traits: " + str(top_agent.traits))
         print("Average move time: " + str(top_agent.average_time) + " milliseconds")
+        print("90th percentile move time: " + str(top_agent.latency.p90 / 1e6) + " milliseconds")
         print("Total competition score: " + str(top_agent.total_win_score))
         print("Evolution completed in " + str(end_time - start_time) + " seconds")
         return top_agent
@@ -294,11 +305,60 @@ def make_agent(center, corner, side) -> GeneticAgent:
     return g1
 
 
+def rate_round_robin(agents: List[GeneticAgent], num_games: int, workers: Optional[int] = None,
+                     archive=None, cache=None, seed: Optional[int] = None) -> None:
+    """
+    Plays every pair of agents against each other and updates their TrueSkill ratings.
+    The matches may be played in parallel, the ratings are updated in the order the pairs were made.
+    @param agents: Agents with a rating attribute
+    @param num_games: Number of games per pair
+    @param workers: Number of processes to play the matches in, see evaluate_pairs()
+    @param archive: If given, the games are appended to this game.archive.ArchiveWriter
+    @param cache: If given, a playground.match_cache.MatchCache that answers the pairings it has seen before
+    @param seed: Seed the matches are played with, see evaluate_pairs(). Required with a cache kept in a file.
+    """
+    from itertools import combinations
+    from trueskill import rate_1vs1
+
+    pairs = list(combinations(agents, 2))
+    if cache is not None:
+        scores = cache.evaluate_pairs(pairs, num_games, workers, seed, archive=archive)
+    else:
+        scores = evaluate_pairs(pairs, num_games, workers, seed, archive=archive)
+    for (a1, a2), a1_score in zip(pairs, scores):
+        if a1_score >= 0.5:
+            x, y = rate_1vs1(a1.rating, a2.rating, drawn=a1_score == 0.5)
+            a1.rating, a2.rating = x, y
+        else:
+            x, y = rate_1vs1(a2.rating, a1.rating)
+            a1.rating, a2.rating = y, x
+
+
 if __name__ == '__main__':
+    import argparse
     import random
     from itertools import combinations
     from trueskill import Rating, quality_1vs1, rate_1vs1  # elo package owner recommended to use this
     from time import time
+    from game.archive import ArchiveWriter
+    from GeneticProgram.checkpoint import check_run, load_checkpoint, save_checkpoint
+    from playground.match_cache import MatchCache
+
+    parser = argparse.ArgumentParser(description='Evolves genetic agents rated with TrueSkill.')
+    parser.add_argument('--checkpoint', help='file the state of the run is saved to after every generation')
+    parser.add_argument('--resume', action='store_true',
+                        help='go on from the checkpoint of an interrupted run with the same arguments. '
+                             'Needs --checkpoint')
+    parser.add_argument('--archive', help='game archive to append every game to, see game.archive')
+    parser.add_argument('--cache', help='SQLite file of match results to reuse, see playground.match_cache. '
+                                        'Needs --seed')
+    parser.add_argument('--seed', type=int, help='seed the matches are played with')
+    parser.add_argument('--workers', type=int, help='number of processes to play the matches in')
+    args = parser.parse_args()
+    if args.cache is not None and args.seed is None:
+        parser.error('--cache needs --seed')
+    if args.resume and args.checkpoint is None:
+        parser.error('--resume needs --checkpoint')
 
     # p = SimpleMinimaxAgent(max_depth=5)
     # # print(evaluate(p, q, num_games=16))
@@ -308,30 +368,52 @@ if __name__ == '__main__':
     # generation = 0
     # gp = GeneticProgram().generate_random_agent()
     # gp.set_traits([])
-    agents: list[GeneticAgent] = [make_random_agent() for _ in range(10)]
-
-    # feed the values from a previous run or what you think it should be.
-    agents[0].set_traits(trait_assignment(0.8, 0.5, 0.35))
-    agents[1].set_traits(trait_assignment(0.22, 0.2, 0.17))
-    for generation in range(50):
+    parameters = {'generations': 50, 'agents': 10, 'num_games': 2, 'seed': args.seed}
+    archive = ArchiveWriter(args.archive) if args.archive is not None else None
+    cache = MatchCache(args.cache) if args.cache is not None else None
+    state = load_checkpoint(args.checkpoint) if args.resume else None
+    if state is not None:
+        check_run(state, **parameters)
+        agents: list[GeneticAgent] = state['population']
+        first_generation = state['generation']
+        GeneticProgram.current_agent_number = state['agent_number']
+        metrics = state['metrics']
+        if archive is not None and state['archive_games'] is not None:
+            archive.truncate(state['archive_games'])  # the games of the generation that was interrupted
+        print('Resuming after generation', first_generation - 1)
+    else:
+        agents: list[GeneticAgent] = [make_random_agent() for _ in range(parameters['agents'])]
+
+        # feed the values from a previous run or what you think it should be.
+        agents[0].set_traits(trait_assignment(0.8, 0.5, 0.35))
+        agents[1].set_traits(trait_assignment(0.22, 0.2, 0.17))
+        first_generation = 0
+        metrics = []
+    for generation in range(first_generation, parameters['generations']):
         start_time = time()
         random.shuffle(agents)
-        for a1, a2 in combinations(agents, 2):
-            a1_score = evaluate(a1, a2, num_games=2)
-            if a1_score >= 0.5:
-                x, y = rate_1vs1(a1.rating, a2.rating, drawn=a1_score == 0.5)
-                a1.rating, a2.rating = x, y
-            else:
-                x, y = rate_1vs1(a2.rating, a1.rating)
-                a1.rating, a2.rating = y, x
+        if archive is not None:
+            archive.set_extra(generation=generation)
+        rate_round_robin(agents, num_games=parameters['num_games'], workers=args.workers, archive=archive,
+                         cache=cache, seed=parameters['seed'])
+        hits = misses = None
+        if cache is not None:
+            hits, misses = cache.take_counts()
+            print('Generation', generation, 'match cache', hits, 'hits', misses, 'misses')
         agents.sort(key=lambda x: x.rating.mu, reverse=True)
         first = agents[0]
         second = agents[1]
         max_rating = first.rating.mu
+        mean_rating = sum([x.rating.mu for x in agents]) / len(agents)
         print('Generation', generation,
-              'mean', sum([x.rating.mu for x in agents]) / len(agents),
+              'mean', mean_rating,
               'max_rating', max_rating,
               'best_traits', trait_extraction(first.traits))
+        summary = first.search_stats.summary()
+        print('Generation', generation, 'best agent search:',
+              f"{summary['nodes_per_move']:.0f} nodes/move, {summary['nodes_per_second']:.0f} nodes/s, "
+              f"branching {summary['branching_factor']:.1f}, "
+              f"first move cutoffs {summary['first_move_cutoff_rate']:.0%}")
 
 
         first_traits = trait_extraction(first.traits)
@@ -353,9 +435,25 @@ if __name__ == '__main__':
 
         duration = time() - start_time
         print('Generation', generation, 'took', duration, 'seconds')
-
-    print('THE BEST', first)
-    print('SECOND BEST', second)
+        metrics.append({'generation': generation, 'mean_rating': mean_rating, 'max_rating': max_rating,
+                        'best_traits': first_traits, 'cache_hits': hits, 'cache_misses': misses,
+                        'seconds': duration})
+        if args.checkpoint is not None:
+            save_checkpoint(args.checkpoint, {
+                'parameters': parameters,
+                'generation': generation + 1,
+                'population': agents,
+                'agent_number': GeneticProgram.current_agent_number,
+                'metrics': metrics,
+                'archive_games': len(archive) if archive is not None else None,
+            })
+
+    if archive is not None:
+        archive.close()
+    if cache is not None:
+        cache.close()
+    print('THE BEST', agents[0])
+    print('SECOND BEST', agents[1])
 
 # Generation vs (mean score and max score) graph
 # Run 10 games with the best traits against minimax agent with depth 2 to 6
@@ -0,0 +1,81 @@
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+from GeneticProgram.checkpoint import load_checkpoint, save_checkpoint
+from GeneticProgram.genetic import GeneticProgram
+
+
+class Interrupted(Exception):
+    pass
+
+
+class ScoredProgram(GeneticProgram):
+    """
+    A program whose generations score the agents with the random module instead of playing games, and that can be
+    interrupted before a given generation
+    """
+
+    def __init__(self, checkpoint_path, stop_at=None):
+        super().__init__(checkpoint_path=checkpoint_path)
+        self.stop_at = stop_at
+
+    def generation(self, pool, top_k_num):
+        if self.generation_number == self.stop_at:
+            raise Interrupted
+        self.generation_number += 1
+        for agent in pool:
+            agent.total_win_score += sum(agent.traits) + random.random()
+        return self.fitness(list(pool), top_k_num)
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'evolution.ckpt')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_atomic(self):
+        random.seed(1)
+        save_checkpoint(self.path, {'generation': 1})
+        expected = random.random()
+        with self.assertRaises((pickle.PicklingError, AttributeError)):
+            save_checkpoint(self.path, {'generation': 2, 'population': lambda: None})
+        # the failed write left the last checkpoint as it was, and loading it puts the random module back
+        self.assertEqual(load_checkpoint(self.path)['generation'], 1)
+        self.assertEqual(random.random(), expected)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+        self.assertIsNone(load_checkpoint(self.path + '.missing'))
+
+    def test_resume(self):
+        random.seed(2)
+        top = ScoredProgram(None).evolution(6, 6, 3)
+        after = random.random()
+
+        random.seed(2)
+        with self.assertRaises(Interrupted):
+            ScoredProgram(self.path, stop_at=4).evolution(6, 6, 3)
+        random.seed(99)  # the checkpoint restores the random state
+        program = ScoredProgram(self.path)
+        resumed = program.evolution(6, 6, 3, resume=True)
+        self.assertEqual(resumed.agent_name, top.agent_name)
+        self.assertEqual(resumed.traits, top.traits)
+        self.assertEqual(resumed.total_win_score, top.total_win_score)
+        self.assertEqual(random.random(), after)
+        self.assertEqual([metrics['generation'] for metrics in program.generation_metrics], list(range(6)))
+        with self.assertRaises(ValueError):
+            ScoredProgram(self.path).evolution(6, 8, 3, resume=True)
+
+    def test_long_run(self):
+        # generations are a loop, a long run does not grow the stack
+        random.seed(3)
+        top = ScoredProgram(None).evolution(1200, 4, 2)
+        self.assertEqual(len(top.traits), 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
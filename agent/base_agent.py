@@ -1,3 +1,8 @@
+from typing import Callable, Optional
+
+from agent.latency import LatencyHistogram
+from agent.opening_book import OpeningBook
+from agent.search_stats import SearchStats
 from game.board import Board
 from trueskill import Rating
 
@@ -7,12 +12,28 @@ class Agent:
     Template for all agents to implement
     """
 
-    def __init__(self, agent_name=""):
+    def __init__(self, agent_name="", book_path: Optional[str] = None):
+        """
+        @param agent_name: Name of the agent
+        @param book_path: Opening book file to answer from while the game is still in it, see agent.opening_book
+        """
         self.agent_name = agent_name
         self.current_piece = None
         self.current_board = None
         self.opponent_piece = None
         self.rating = Rating()
+        self.opening_book = OpeningBook(book_path) if book_path else None
+        self.last_stats: Optional[SearchStats] = None  # the search of the last move, for agents that search
+        self.search_stats = SearchStats()  # the searches of all the moves since the last reset_stats()
+        # Called with the agent and the record after every move of a searching agent, see report_stats(). It is
+        # not sent along with copies of the agent that play in other processes.
+        self.on_stats: Optional[Callable[['Agent', SearchStats], None]] = None
+        self.latency = LatencyHistogram()  # time taken by every move since reset_stats(), see record_latency()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['on_stats'] = None
+        return state
 
     def play_move(self, board: Board):
         """
@@ -22,6 +43,36 @@ class Agent:
         """
         pass
 
+    def book_move(self, board: Board):
+        """
+        Looks the position up in the agent's opening book. Agents call it at the start of play_move() and only
+        search when it returns None.
+        @param board: The current board
+        @return: The book move for the position, or None if the agent has no book or the position is not in it
+        """
+        if self.opening_book is None:
+            return None
+        return self.opening_book.get_move(board)
+
+    def record_latency(self, nanoseconds: int) -> None:
+        """
+        Agents call it at the end of play_move() with the time the move took, measured with time.perf_counter_ns().
+        @param nanoseconds: The time taken by the move
+        @return: None
+        """
+        self.latency.record(nanoseconds)
+
+    def report_stats(self, stats: SearchStats) -> None:
+        """
+        Searching agents call it at the end of play_move() with the record of the move's search.
+        @param stats: The record of the move
+        @return: None
+        """
+        self.last_stats = stats
+        self.search_stats.merge(stats)
+        if self.on_stats is not None:
+            self.on_stats(self, stats)
+
     def set_current_piece(self, new_piece):
         """
         Sets the current player piece to the new given one.
@@ -73,6 +124,25 @@ class Agent:
         self.set_current_piece(None)
         self.set_current_board(None)
 
+    def reset_stats(self):
+        """
+        Clears the statistics the agent collects while playing (timings, turn counts, ...). Used on copies of the
+        agent that play games in other processes, so that only their new statistics are merged back.
+        Child agent classes that collect more statistics should overload it and call it.
+        @return: None
+        """
+        self.search_stats = SearchStats()
+        self.latency = LatencyHistogram()
+
+    def merge_stats(self, other):
+        """
+        Adds the statistics collected by :param other, a copy of this agent that played games elsewhere, to
+        this agent's statistics. Child agent classes that collect more statistics should overload it and call it.
+        @return: None
+        """
+        self.search_stats.merge(other.search_stats)
+        self.latency.merge(other.latency)
+
     def get_available_spaces(self):
         """
         Should be overloaded by child agent classes to add the needed functionality for their
@@ -1,15 +1,53 @@
-from time import time
-from copy import deepcopy
+from collections import Counter
+from random import Random
+from time import perf_counter, perf_counter_ns, process_time
 from typing import Optional, Tuple, List
+
+import numpy as np
+
 from agent.base_agent import Agent
+from agent.search_stats import SearchStats
+from agent.search import SearchTimeout, DEADLINE_CHECK_INTERVAL, order_first, LazySMP
+from agent.shared_transposition_table import SharedTranspositionTable
+from agent.transposition_table import TranspositionTable, EXACT, LOWER, UPPER
 from game.board import Board
 from game.subboard import SubBoard
 
+# Every 3x3 sub-board, indexed by SubBoard.state: row s holds the 9 cell values (1 for X, -1 for O, 0 for blank)
+# of the sub-board whose base-3 digits are s (digit 1 is X, digit 2 is O).
+ALL_STATES = np.array([0, 1, -1], dtype=np.int8)[np.arange(3 ** 9)[:, None] // 3 ** np.arange(9) % 3]
+
+# eval_game() depends on the index of the sub-board the last move was played in, which the Zobrist hash of the
+# board does not cover. Transposition table keys are the hash XOR the key of that index.
+CURRENT_BOARD_KEYS: List[int] = [Random(0xC0DE + index).getrandbits(64) for index in range(9)]
+
+
+def _any_line(cells: np.ndarray, lines: List[Tuple[int, int, int]], total: int) -> np.ndarray:
+    """
+    :return: For every row of :param cells, whether any of the given triples of squares sums to :param total
+    """
+    return np.logical_or.reduce([cells[:, a] + cells[:, b] + cells[:, c] == total for a, b, c in lines])
+
 
 class GeneticAgent(Agent):
 
-    def __init__(self, agent_name="", existing_traits=None):
-        super().__init__(agent_name)
+    def __init__(self, agent_name="", existing_traits=None, max_depth: int = 3,
+                 time_budget: Optional[float] = None, book_path: Optional[str] = None,
+                 tt_size: Optional[int] = None, workers: Optional[int] = None):
+        """
+        @param agent_name: Name of the agent
+        @param existing_traits: The list of 9 traits, one per square
+        @param max_depth: Number of plies to search
+        @param time_budget: Seconds to spend per move. If set, the agent deepens the search one ply at a time
+        (up to max_depth) and plays the best move of the last iteration that finished in time.
+        @param book_path: Opening book file to answer from while the game is still in it
+        @param tt_size: Maximum number of entries of the transposition table. No table is used if None.
+        The table is kept between moves of a game and cleared by end_game().
+        @param workers: Number of processes to search with (Lazy SMP, see agent.search.LazySMP). The processes
+        share a transposition table of tt_size entries (default 2^20) in shared memory, which is created with the
+        helper processes when a game starts and freed by end_game().
+        """
+        super().__init__(agent_name, book_path)
         if existing_traits is None:
             existing_traits = []
         self.traits = existing_traits
@@ -19,7 +57,26 @@ class GeneticAgent(Agent):
         self.total_genetic_rounds = 0
         self.total_turns = 0
         self.move_scores = []
-        self.average_time = 0
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.tt_size = tt_size
+        self.workers = workers
+        self.transposition_table = TranspositionTable(tt_size) if tt_size and not self.parallel else None
+        self._smp: Optional[LazySMP] = None
+        self._root_order: Optional[Random] = None  # shuffles the root moves of Lazy SMP helpers
+        self.completed_depth = 0  # depth of the last completed search
+        self._root_depth = max_depth  # depth of the current search
+        self._deadline: Optional[float] = None
+        self._nodes = 0
+        # Search statistics of the current move, see search_stats.SearchStats
+        self._searches = self._leaves = self._tt_probes = self._tt_hits = self._tt_cutoffs = 0
+        self._cutoffs = Counter()  # beta cutoffs by index of the move that caused them
+        self._max_ply = 0
+        self._pv = []  # principal variation of the previous iteration, searched first
+        self._pv_table = {}  # principal variation found below each ply of the current search
+        self._tables_key = None  # traits and pieces the lookup tables were built for
+        self._board_table: Optional[np.ndarray] = None
+        self._position_table: Optional[np.ndarray] = None
 
     def __repr__(self):
         return f'{self.agent_name} traits: {self.traits} rating: {self.rating}'
@@ -32,6 +89,7 @@ class GeneticAgent(Agent):
         @return: None
         """
         self.traits = new_traits
+        self._tables_key = None
 
     def set_specific_trait(self, trait_pos: int, new_trait: float) -> None:
         """
@@ -44,11 +102,12 @@ class GeneticAgent(Agent):
         """
 
         self.traits[trait_pos] = new_trait
+        self._tables_key = None
 
     def play_move(self, board: Board) -> None:
         """
         Run alpha-beta search on the current game board and find the best move for the agent to
-        make. Will also calculate the new average time to find a move.
+        make. Will also record the time taken by the move, see average_time.
         @param board: The current board that the agent will play on
         @return: None
         """
@@ -61,18 +120,60 @@ class GeneticAgent(Agent):
         self.current_piece = board.turn
         self.set_opponent_piece(self.current_piece)
 
-        start_time = round(time() * 1000)
+        start, start_cpu, start_nodes = perf_counter_ns(), process_time(), self._nodes
+        self._searches = self._leaves = self._tt_probes = self._tt_hits = self._tt_cutoffs = self._max_ply = 0
+        self._cutoffs.clear()
         self.total_turns += 1
 
-        # Find and play move
-        val, global_move, sub_move = self.alpha_beta(board, 0, True)
+        # Find and play move, from the opening book while the game is still in it
+        move = self.book_move(board)
+        if move is None:
+            val, global_move, sub_move = self.alpha_beta(board, 0, True)
+        else:
+            global_move, sub_move = move
+        elapsed = perf_counter_ns() - start
+        self.report_stats(self.move_stats(elapsed / 1e9, process_time() - start_cpu, self._nodes - start_nodes))
+        self.record_latency(elapsed)
         board.play(self.current_piece, global_move, sub_move)
 
-        # Calculate new average time
-        end_time = round(time() * 1000)
-        duration = end_time - start_time # in milliseconds
-        #total_games = (self.win_count + self.lose_count)
-        self.average_time = ((self.average_time * self.total_turns) + duration) / self.total_turns
+    def move_stats(self, wall_time: float, cpu_time: float, nodes: int) -> SearchStats:
+        """
+        @return: The statistics of the searches since the start of the move
+        """
+        cutoffs = [self._cutoffs[i] for i in range(max(self._cutoffs, default=-1) + 1)]
+        return SearchStats(1, self._searches, nodes, self._leaves, nodes - self._leaves - self._tt_cutoffs,
+                           cutoffs, self._tt_probes, self._tt_hits, self._max_ply, wall_time, cpu_time)
+
+    def reset_stats(self) -> None:
+        """
+        Clears the move timing and search statistics. See Agent.reset_stats()
+        @return: None
+        """
+        Agent.reset_stats(self)
+        self.total_turns = 0
+
+    def merge_stats(self, other: "GeneticAgent") -> None:
+        """
+        Adds the turns, move times and search statistics of a copy of this agent. See Agent.merge_stats()
+        @param other: The copy of this agent
+        @return: None
+        """
+        Agent.merge_stats(self, other)
+        self.total_turns += other.total_turns
+
+    @property
+    def average_time(self) -> float:
+        """
+        Average time taken by the agent's moves in milliseconds, from its move latency histogram (see
+        Agent.latency, which also has the percentiles)
+        """
+        return self.latency.mean / 1e6
+
+    def __getstate__(self):
+        # The lookup tables are large and quick to rebuild, so copies sent to other processes leave them out
+        state = Agent.__getstate__(self)
+        state.update(_tables_key=None, _board_table=None, _position_table=None, _smp=None)
+        return state
 
     def start_game(self, board: Board, piece: int) -> None:
         """
@@ -84,6 +185,56 @@ class GeneticAgent(Agent):
         @return: None
         """
         Agent.start_game(self, board, piece)
+        if self.parallel:
+            self.start_helpers()
+
+    def end_game(self) -> None:
+        """
+        Resets the agent after a game. Stops the Lazy SMP helpers and clears the transposition table.
+        @return: None
+        """
+        Agent.end_game(self)
+        if self._smp is not None:
+            self._smp.shutdown()
+            self._smp = None
+            self.transposition_table.unlink()
+            self.transposition_table = None
+        elif self.transposition_table is not None:
+            self.transposition_table.clear()
+
+    @property
+    def parallel(self) -> bool:
+        return self.workers is not None and self.workers > 1
+
+    def start_helpers(self) -> None:
+        """
+        Creates the shared transposition table and starts the Lazy SMP helper processes, if not running yet.
+        @return: None
+        """
+        if self._smp is None:
+            self.transposition_table = SharedTranspositionTable(self.tt_size or 1 << 20)
+            self._smp = LazySMP(self, self.workers)
+
+    def smp_search(self, board: Board, index: int, time_budget: Optional[float]) -> Tuple[
+            int, float, Optional[Tuple[Tuple[int, int], Tuple[int, int]]]]:
+        """
+        The part of a Lazy SMP search run by the process with the given index, see
+        SimpleMinimaxAgent.smp_search()
+        @param board: The position to search
+        @param index: 0 for the agent's own process, 1, 2, ... for the helpers
+        @param time_budget: Seconds to search for, None to search to max_depth
+        @return: The completed depth (0 if none), value and best move
+        """
+        self.current_piece = board.turn
+        self.set_opponent_piece(self.current_piece)
+        deadline = None if time_budget is None else perf_counter() + time_budget
+        self._root_order = Random(index) if index else None
+        try:
+            depth, (val, global_move, sub_move) = self.deepen(board, 0, deadline, 1 + index % 2, index == 0)
+            return depth, val, None if depth == 0 else (global_move, sub_move)
+        finally:
+            self._root_order = None
+            self.transposition_table.request_stop()
 
     def alpha_beta(self, board: Board, current_board: int, max_player: bool) -> Tuple[float, Tuple[int, int],
                                                                                       Tuple[int, int]]:
@@ -97,16 +248,125 @@ class GeneticAgent(Agent):
         square in the subboard where the move is played
         """
 
-        depth = 3
-        if self.current_piece == 1:
-            val, global_move, sub_move = self.maximize_value(board, current_board, depth, float("-inf"), float("inf"))
-        else:
-            val, global_move, sub_move = self.minimize_value(board, current_board, depth, float("-inf"), float("inf"))
+        if self.parallel:
+            self.start_helpers()
+            self.completed_depth, val, move = self._smp.search(self, board, self.time_budget)
+            return val, move[0], move[1]
+        if self.time_budget is None:
+            return self.search(board, current_board, self.max_depth)
+        return self.iterative_deepening(board, current_board, self.time_budget)
+
+    def search(self, board: Board, current_board: int, depth: int) -> Tuple[float, Tuple[int, int],
+                                                                            Tuple[int, int]]:
+        """
+        Runs one alpha-beta search from the root to the given depth
+        @param board: A board object the player will be using to decide their next move
+        @param current_board: The 1D index where the current subboard would be located in an array
+        @param depth: The number of plies to search
+        @return: A tuple that contains the value of the returned move(s),
+        the 2D coordinates of the subboard the move is played on, the 2D coordinates of the
+        square in the subboard where the move is played
+        """
+        self._root_depth = depth
+        self._pv_table = {}
+        self._horizon = 0  # the nodes whose score is not a finished game, see deepen()
+        self._searches += 1
+        self.build_tables()
+        try:
+            if self.current_piece == 1:
+                val, global_move, sub_move = self.maximize_value(board, current_board, depth, float("-inf"),
+                                                                 float("inf"), on_pv=True)
+            else:
+                val, global_move, sub_move = self.minimize_value(board, current_board, depth, float("-inf"),
+                                                                 float("inf"), on_pv=True)
+        finally:
+            self._max_ply = max(self._max_ply, max(self._pv_table, default=0))
+        self.completed_depth = depth
 
         return val, global_move, sub_move
 
+    def iterative_deepening(self, board: Board, current_board: int, time_budget: float) -> Tuple[
+            float, Tuple[int, int], Tuple[int, int]]:
+        """
+        Searches to depth 1, 2, 3, ... until the time budget has passed, max_depth is reached or the result
+        is proven. Each iteration searches the principal variation of the previous one first. The first
+        iteration always completes so there is always a move to play.
+        @param board: A board object the player will be using to decide their next move
+        @param current_board: The 1D index where the current subboard would be located in an array
+        @param time_budget: The number of seconds to search for
+        @return: The result of the deepest completed iteration, see search()
+        """
+        depth, result = self.deepen(board, current_board, perf_counter() + time_budget)
+        self.completed_depth = depth
+        return result
+
+    def deepen(self, board: Board, current_board: int, deadline: Optional[float], first_depth: int = 1,
+               complete_first: bool = True) -> Tuple[int, Tuple[float, Tuple[int, int], Tuple[int, int]]]:
+        """
+        The iterative deepening loop of iterative_deepening() and smp_search(). Stops early once an iteration
+        reaches the end of the game on every line, as a deeper search cannot change its result.
+        @param board: A board object the player will be using to decide their next move
+        @param current_board: The 1D index where the current subboard would be located in an array
+        @param deadline: perf_counter() time to stop at, None to search up to max_depth
+        @param first_depth: Depth of the first iteration
+        @param complete_first: Whether the first iteration ignores the deadline
+        @return: The completed depth (0 if none) and the result of that iteration, see search()
+        """
+        result = (0, (-1, -1), (-1, -1))
+        completed = 0
+        self._pv = []
+        depth = first_depth
+        while depth <= min(self.max_depth, board.n ** 4):
+            self._deadline = deadline if completed or not complete_first else None
+            try:
+                result = self.search(board, current_board, depth)
+            except SearchTimeout:
+                break
+            finally:
+                self._deadline = None
+            completed = depth
+            self._pv = self._pv_table.get(0, [])
+            if self._horizon == 0 or (deadline is not None and perf_counter() >= deadline):
+                # The heuristic scores overlap the +1 or -1 of a won game, so the result is only proven when
+                # every line searched ended the game and no stored result stood in for a subtree
+                break
+            depth += 1
+        self._pv = []
+        return completed, result
+
+    def _enter_node(self, ply: int) -> None:
+        self._pv_table[ply] = []
+        self._nodes += 1
+        if self._nodes % DEADLINE_CHECK_INTERVAL == 0:
+            if self._deadline is not None and perf_counter() > self._deadline:
+                raise SearchTimeout()
+            if self.parallel and self.transposition_table.stop_requested:
+                raise SearchTimeout()
+
+    def probe(self, board: Board, current_board_index: int, depth: int, alpha: float,
+              beta: float) -> Tuple[int, Optional[Tuple[float, Tuple[int, int], Tuple[int, int]]], Optional[tuple]]:
+        """
+        Looks the position up in the transposition table. It is probed before the moves are sorted, so a node
+        the stored result decides does not sort them.
+        @return: The position key, the result to return if the stored result decides this node, and the stored
+        best move to search first otherwise
+        """
+        key = board.zobrist_hash ^ CURRENT_BOARD_KEYS[current_board_index]
+        entry = self.transposition_table.probe(key)
+        self._tt_probes += 1
+        if entry is None:
+            return key, None, None
+        self._tt_hits += 1
+        _, entry_depth, score, bound, move = entry
+        if entry_depth >= depth:
+            if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                self._tt_cutoffs += 1
+                self._horizon += 1
+                return key, (score, *(move or ((-1, -1), (-1, -1)))), None
+        return key, None, move
+
     def maximize_value(self, board: Board, current_board_index: int, depth: int, alpha: float,
-                       beta: float) -> Tuple[float, Tuple[int, int], Tuple[int, int]]:
+                       beta: float, on_pv: bool = False) -> Tuple[float, Tuple[int, int], Tuple[int, int]]:
         """
         The maximize side of alpha-beta search. Will evaluate the prospective moves as the
         maximizing player. When the max search depth is reached then the current board will be
@@ -117,6 +377,8 @@ class GeneticAgent(Agent):
         @param depth: An int presenting the current search depth
         @param alpha: An int representing the alpha value in alpha-beta search
         @param beta: An in representing the beta value in alpha-beta search
+        @param on_pv: Whether the node is on the principal variation of the previous iteration, whose move is then
+        searched first. Only the root and the first child of a node on it are.
         @return: A tuple that contains the value of the returned move(s),
         the 2D coordinates of the subboard the move is played on, the 2D coordinates of the
         square in the subboard where the move is played
@@ -125,43 +387,70 @@ class GeneticAgent(Agent):
         v = float('-inf')
         best_board_move = (-1, -1)
         best_subboard_move = (-1, -1)
+        ply = self._root_depth - depth
+        self._enter_node(ply)
 
         if board.is_terminal():
+            self._leaves += 1
             return board.winner, best_board_move, best_subboard_move
 
         # perform depth check
         if depth <= 0:
+            self._leaves += 1
+            self._horizon += 1
             # Evaluate current board
             curr_eval = self.eval_game(board, current_board_index)
             return curr_eval, best_board_move, best_subboard_move
 
+        table = self.transposition_table
+        tt_move = None
+        if table is not None:
+            key, result, tt_move = self.probe(board, current_board_index, depth, alpha, beta)
+            if result is not None:
+                return result
+            original_alpha = alpha
         # This variable is here in case we want to add a heuristic to sort the successors before
         # evaluation
         available = self.sort_successors(board.get_legal_moves(), board, 1)
+        if ply == 0 and self._root_order is not None:
+            self._root_order.shuffle(available)
+        if tt_move is not None:
+            order_first(available, tt_move)
+        pv_move = self._pv[ply] if on_pv and ply < len(self._pv) else None
+        if pv_move is not None:
+            order_first(available, pv_move)
 
         # For each available space (limited to specific or all available space depending on last
         # move)
-        for brd, subs in available:
+        for index, (brd, subs) in enumerate(available):
             # Play piece
-            temp_board = deepcopy(board)
-            temp_board.play(1, brd, subs)
+            token = board.make_move(1, brd, subs)
             sub_index = brd[1] + 3 * brd[0] # Convert the 2D coordinates of the subboard to a 1D index
-            possible_v, global_move, sub_move = self.minimize_value(temp_board, sub_index,
-                                                                    depth-1, alpha, beta)
-            # Remove piece
+            try:
+                possible_v, global_move, sub_move = self.minimize_value(board, sub_index,
+                                                                        depth-1, alpha, beta, pv_move == (brd, subs))
+            finally:
+                # Remove piece
+                board.undo(token)
 
             if possible_v > v:
                 v = possible_v
                 best_board_move = brd
                 best_subboard_move = subs
+                self._pv_table[ply] = [(brd, subs)] + self._pv_table.get(ply + 1, [])
 
             if v >= beta:
+                self._cutoffs[index] += 1
+                if table is not None:
+                    table.store(key, depth, v, LOWER, (best_board_move, best_subboard_move))
                 return v, best_board_move, best_subboard_move
             alpha = max(v, alpha)
+        if table is not None:
+            table.store(key, depth, v, UPPER if v <= original_alpha else EXACT, (best_board_move, best_subboard_move))
         return v, best_board_move, best_subboard_move
 
     def minimize_value(self, board: Board, current_board_index: int, depth: int, alpha: float,
-                       beta: float) -> Tuple[float, Tuple[int, int], Tuple[int, int]]:
+                       beta: float, on_pv: bool = False) -> Tuple[float, Tuple[int, int], Tuple[int, int]]:
         """
         The minimize side of alpha-beta search. Will evaluate the prospective moves as the
         minimizing player. When the max search depth is reached then the current board will be
@@ -172,6 +461,8 @@ class GeneticAgent(Agent):
         @param depth: An int presenting the current search depth
         @param alpha: An int representing the alpha value in alpha-beta search
         @param beta: An in representing the beta value in alpha-beta search
+        @param on_pv: Whether the node is on the principal variation of the previous iteration, whose move is then
+        searched first. Only the root and the first child of a node on it are.
         @return: A tuple that contains the value of the returned move(s),
         the 2D coordinates of the subboard the move is played on, the 2D coordinates of the
         square in the subboard where the move is played
@@ -180,39 +471,66 @@ class GeneticAgent(Agent):
         v = float('inf')
         best_board_move = (-1, -1)
         best_subboard_move = (-1, -1)
+        ply = self._root_depth - depth
+        self._enter_node(ply)
 
         if board.is_terminal():
+            self._leaves += 1
             return board.winner, best_board_move, best_subboard_move
 
         # perform depth check
         if depth <= 0:
+            self._leaves += 1
+            self._horizon += 1
             # Evaluate current board
             curr_eval = self.eval_game(board, current_board_index)
             return curr_eval, best_board_move, best_subboard_move
 
+        table = self.transposition_table
+        tt_move = None
+        if table is not None:
+            key, result, tt_move = self.probe(board, current_board_index, depth, alpha, beta)
+            if result is not None:
+                return result
+            original_beta = beta
         # This variable is here in case we want to add a heuristic to sort the successors before
         # evaluation
         available = self.sort_successors(board.get_legal_moves(), board, -1)
+        if ply == 0 and self._root_order is not None:
+            self._root_order.shuffle(available)
+        if tt_move is not None:
+            order_first(available, tt_move)
+        pv_move = self._pv[ply] if on_pv and ply < len(self._pv) else None
+        if pv_move is not None:
+            order_first(available, pv_move)
 
         # For each available space (limited to specific or all available space depending on last
         # move)
-        for brd, subs in available:
+        for index, (brd, subs) in enumerate(available):
             # Play piece
-            temp_board = deepcopy(board)
-            temp_board.play(-1, brd, subs)
+            token = board.make_move(-1, brd, subs)
             sub_index = brd[1] + 3 * brd[0] # Convert the 2D coordinates of the subboard to a 1D index
-            possible_v, global_move, sub_move = self.maximize_value(temp_board, sub_index,
-                                                                    depth - 1, alpha, beta)
-            # Remove piece
+            try:
+                possible_v, global_move, sub_move = self.maximize_value(board, sub_index,
+                                                                        depth - 1, alpha, beta, pv_move == (brd, subs))
+            finally:
+                # Remove piece
+                board.undo(token)
 
             if possible_v < v:
                 v = possible_v
                 best_board_move = brd
                 best_subboard_move = subs
+                self._pv_table[ply] = [(brd, subs)] + self._pv_table.get(ply + 1, [])
 
             if v <= alpha:
+                self._cutoffs[index] += 1
+                if table is not None:
+                    table.store(key, depth, v, UPPER, (best_board_move, best_subboard_move))
                 return v, best_board_move, best_subboard_move
             beta = min(v, beta)
+        if table is not None:
+            table.store(key, depth, v, LOWER if v >= original_beta else EXACT, (best_board_move, best_subboard_move))
         return v, best_board_move, best_subboard_move
 
     def sort_successors(self, successors: List[Tuple[Tuple[int, int], Tuple[int, int]]], board: Board, current_piece:
@@ -227,27 +545,17 @@ class GeneticAgent(Agent):
         @return: A sorted list of the available legal moves
         """
 
-        def convert_to_list(grid: List[List[int]]) -> List[int]:
-            """
-            Converts the 2D array of subboards to a 1D list
-            @param grid: 2D array of subboards
-            @return: 1D list of subboards
-            """
-            array = []
-            for row in range(0, 3):
-                for col in range(0, 3):
-                    array.append(grid[row][col])
-            return array
-
         heuristic_list = []
 
         board_grid = board.get_grid()
+        position_table = self._position_table
+        piece = 0 if current_piece == 1 else 1
 
         for brd, subs in successors:
-            subboard = board_grid[brd[0]][brd[1]]
-            subboard_list = convert_to_list(subboard.get_grid())
+            state = board_grid[brd[0]][brd[1]].state
             sub_index = subs[1] + 3 * subs[0] # Convert the 2D coordinates of the subboard to a 1D index
-            eval = self.eval_pos(subboard_list, sub_index, current_piece)
+            # Same as self.eval_pos(<subboard as a list>, sub_index, current_piece)
+            eval = position_table[state, sub_index, piece]
             heuristic_list.append(tuple([brd, subs, eval]))
 
         heuristic_list.sort(key=lambda x: x[2], reverse=True)
@@ -321,40 +629,30 @@ class GeneticAgent(Agent):
         @return: A float representing the global board state's value
         """
 
-        def convert_to_list(grid: List[List[SubBoard]]) -> List[int]:
-            """
-            Converts the 2D array of subboards to a 1D list
-            @param grid: 2D array of subboards
-            @return: 1D list of subboards
-            """
-            array = []
-            for row in range(0, 3):
-                for col in range(0, 3):
-                    array.append(grid[row][col])
-            return array
-
         evaluation = 0
-        global_board = []
-        sub_list = convert_to_list(board.get_grid())
+        global_state = 0  # base-3 index of the sub-board winners, see SubBoard.state
+        board_grid = board.get_grid()
+        board_table = self._board_table
         board_win = board.winner
         if board_win is None:
             board_win = 0
 
-        for num, sub in enumerate(sub_list):
-            sub_list = convert_to_list(sub.get_grid())
+        for num in range(0, 9):
+            sub = board_grid[num // 3][num % 3]
             sub_win = sub.winner
             if sub_win is None:
                 sub_win = 0
-            eval_val = self.evaluate_board(sub_list, sub_win)
+            # Same as self.evaluate_board(<sub-board as a list>, sub_win)
+            eval_val = board_table[sub.state, sub_win + 1]
             evaluation += eval_val * 1.5 * self.traits[num]
             if current_board == num:
                 evaluation += eval_val * self.traits[num]
             temp_eval = sub_win
             evaluation -= temp_eval * self.traits[num]
-            global_board.append(temp_eval)
+            global_state += (0, 1, 2)[temp_eval] * 3 ** num  # digit 2 for an O (-1) win
 
         evaluation -= board_win
-        evaluation += self.evaluate_board(global_board, board_win)
+        evaluation += board_table[global_state, board_win + 1]
 
         return evaluation / 15
 
@@ -436,3 +734,81 @@ class GeneticAgent(Agent):
         evaluation -= winner
 
         return evaluation / 12
+
+    def build_tables(self) -> None:
+        """
+        Precomputes evaluate_board() for every sub-board state and winner and eval_pos() for every sub-board
+        state, square and piece, so that eval_game() and sort_successors() only need table lookups.
+        The tables depend on the traits and on the agent's pieces and are only rebuilt when those change.
+        @return: None
+        """
+        key = (tuple(self.traits), self.current_piece, self.opponent_piece)
+        if key == self._tables_key:
+            return
+        if self._tables_key is None or self._tables_key[0] != key[0]:
+            self._position_table = self.build_position_table()
+        self._board_table = self.build_board_table()
+        self._tables_key = key
+
+    def build_board_table(self) -> np.ndarray:
+        """
+        Vectorized evaluate_board() over all 3^9 sub-board states.
+        @return: An array where [state, winner + 1] is evaluate_board(<cells of state>, winner)
+        """
+        cells = ALL_STATES
+
+        def check_doubles(triple: List[int], piece_val: int) -> bool:
+            # Same as in evaluate_board(). It only compares the indices in triple, so it does not depend on the
+            # sub-board.
+            return ((triple[0] + triple[1] == -2 * self.current_piece and triple[2] == -1 * piece_val)
+                    or (triple[1] + triple[2] == -2 * self.current_piece and triple[0] == -1 * piece_val)
+                    or (triple[0] + triple[2] == -2 * self.current_piece and triple[1] == -1 * piece_val))
+
+        def eval_player(piece_val: int, eval_num: np.ndarray, sub: bool = True) -> np.ndarray:
+            sign = -1 if sub else 1
+            horizontal = _any_line(cells, [(0, 1, 2), (3, 4, 5), (6, 7, 8)], 2 * piece_val)
+            eval_num = np.where(horizontal, eval_num + sign * 6, eval_num)
+            vertical = _any_line(cells, [(0, 3, 6), (1, 4, 7), (2, 5, 8)], 2 * piece_val)
+            eval_num = np.where(vertical, eval_num + sign * 6, eval_num)
+            diagonal = _any_line(cells, [(0, 4, 8), (2, 4, 6)], 2 * piece_val)
+            eval_num = np.where(diagonal, eval_num + sign * 7, eval_num)
+            if check_doubles([0, 1, 2], piece_val) or check_doubles([3, 4, 5], piece_val) \
+                    or check_doubles([6, 7, 8], piece_val) \
+                    or check_doubles([0, 3, 6], piece_val) or check_doubles([1, 4, 7], piece_val) \
+                    or check_doubles([2, 5, 9], piece_val) \
+                    or check_doubles([0, 4, 8], self.opponent_piece) or check_doubles([2, 4, 6], piece_val):
+                eval_num = eval_num + sign * 9
+            return eval_num
+
+        evaluation = np.zeros(len(cells))
+        for num, val in enumerate(self.traits):
+            evaluation -= cells[:, num] * val
+        evaluation = eval_player(self.current_piece, evaluation)
+        evaluation = eval_player(self.opponent_piece, evaluation, False)
+
+        table = np.empty((len(cells), 3))
+        for winner in (-1, 0, 1):
+            table[:, winner + 1] = (evaluation - winner) / 12
+        return table
+
+    def build_position_table(self) -> np.ndarray:
+        """
+        Vectorized eval_pos() over all 3^9 sub-board states, squares and pieces.
+        @return: An array where [state, square, 0] is eval_pos(<cells of state>, square, 1) and
+        [state, square, 1] is eval_pos(<cells of state>, square, -1)
+        """
+        lines = [(0, 1, 2), (3, 4, 5), (6, 7, 8),  # same squares as check_board() in eval_pos()
+                 (0, 3, 6), (2, 4, 7), (3, 5, 8),
+                 (0, 4, 8), (2, 4, 6)]
+        table = np.empty((len(ALL_STATES), 9, 2))
+        for square in range(9):
+            for piece, player_piece in enumerate((1, -1)):
+                cells = ALL_STATES.copy()
+                cells[:, square] = player_piece
+                evaluation = np.full(len(cells), float(self.traits[square]))
+                evaluation = np.where(_any_line(cells, lines, 2 * player_piece), evaluation + 1, evaluation)
+                evaluation = np.where(_any_line(cells, lines, 3 * player_piece), evaluation + 5, evaluation)
+                cells[:, square] = -player_piece
+                evaluation = np.where(_any_line(cells, lines, -3 * player_piece), evaluation + 2, evaluation)
+                table[:, square, piece] = evaluation
+        return table
@@ -0,0 +1,120 @@
+from typing import Dict, List
+
+# Values below 2^SIGNIFICANT_BITS nanoseconds get a bucket each. Above, every power of two is split into
+# 2^(SIGNIFICANT_BITS - 1) buckets, so a value is known to within 1 / 2^(SIGNIFICANT_BITS - 1), under 1%.
+SIGNIFICANT_BITS = 8
+_HALF = 1 << (SIGNIFICANT_BITS - 1)
+# Largest value the histogram tells apart, about 78 hours. Longer moves are counted in the last bucket.
+MAX_VALUE = (1 << 48) - 1
+NUM_BUCKETS = (MAX_VALUE.bit_length() - SIGNIFICANT_BITS + 2) * _HALF
+
+
+def bucket_of(value: int) -> int:
+    """
+    :return: The bucket of a value of at most MAX_VALUE
+    """
+    shift = value.bit_length() - SIGNIFICANT_BITS
+    if shift <= 0:
+        return value
+    return shift * _HALF + (value >> shift)
+
+
+def bucket_limit(index: int) -> int:
+    """
+    :return: The largest value in the bucket
+    """
+    shift = index // _HALF - 1
+    if shift <= 0:
+        return index
+    return ((index - shift * _HALF + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    Move times in nanoseconds (time.perf_counter_ns()), kept in a fixed number of logarithmic buckets like
+    HdrHistogram: the percentiles are within 1% of the actual times whatever their range, in constant memory.
+    The count, total, min and max are exact. Histograms of copies of an agent that played elsewhere are added up
+    with merge().
+    """
+
+    def __init__(self):
+        self.counts: List[int] = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, nanoseconds: int) -> None:
+        self.counts[bucket_of(min(nanoseconds, MAX_VALUE))] += 1
+        if not self.count or nanoseconds < self.min:
+            self.min = nanoseconds
+        if nanoseconds > self.max:
+            self.max = nanoseconds
+        self.count += 1
+        self.total += nanoseconds
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        """
+        Adds the times recorded in :param other to this histogram.
+        """
+        if not other.count:
+            return
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.min = other.min if not self.count else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, percent: float) -> int:
+        """
+        :param percent: 0 to 100
+        :return: The time :percent % of the moves took at most, in nanoseconds. 0 if nothing was recorded.
+        """
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * percent // 100))  # the smallest rank covering percent % of the moves
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                if i == NUM_BUCKETS - 1:  # also holds the times above MAX_VALUE
+                    return self.max
+                return min(max(bucket_limit(i), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def p50(self) -> int:
+        return self.percentile(50)
+
+    @property
+    def p90(self) -> int:
+        return self.percentile(90)
+
+    @property
+    def p99(self) -> int:
+        return self.percentile(99)
+
+    def summary(self) -> Dict[str, float]:
+        """
+        :return: The number of moves and the mean, p50, p90, p99 and max times in milliseconds
+        """
+        return {'moves': self.count, 'mean_ms': self.mean / 1e6, 'p50_ms': self.p50 / 1e6,
+                'p90_ms': self.p90 / 1e6, 'p99_ms': self.p99 / 1e6, 'max_ms': self.max / 1e6}
+
+    def __getstate__(self):
+        # Only the used buckets are sent to other processes
+        state = self.__dict__.copy()
+        state['counts'] = {i: count for i, count in enumerate(self.counts) if count}
+        return state
+
+    def __setstate__(self, state):
+        counts = [0] * NUM_BUCKETS
+        for i, count in state['counts'].items():
+            counts[i] = count
+        self.__dict__.update(state, counts=counts)
@@ -0,0 +1,534 @@
+import random
+from math import log, sqrt
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from time import perf_counter, perf_counter_ns, process_time
+from typing import Dict, Optional, Tuple, List
+from agent.base_agent import Agent
+from agent.search import PONDER_MODES, PONDER_PREDICTED
+from agent.search_stats import SearchStats
+from game.board import Board
+from game.moves import encode_move, decode_move
+
+Move = Tuple[Tuple[int, int], Tuple[int, int]]
+
+# Number of simulations a pondering process runs between two checks for the opponent's reply
+PONDER_CHECK_INTERVAL = 16
+
+
+class Node:
+    """
+    A node of the search tree. It stands for the position reached by playing :move from its parent's position.
+    """
+    __slots__ = ('move', 'parent', 'player', 'key', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move: Optional[Move], parent: Optional['Node'], player: int, key: int,
+                 untried: List[Move]):
+        self.move = move
+        self.parent = parent
+        self.player = player  # the player who made :move, wins are counted for this player
+        self.key = key  # Board.zobrist_hash of the position
+        self.children: List[Node] = []
+        self.untried = untried  # legal moves that do not have a child yet
+        self.visits = 0
+        self.wins = 0.0  # +1 for a win, +0.5 for a draw of :player
+
+    def select_child(self, exploration: float) -> 'Node':
+        """
+        :return: The child with the highest UCT (upper confidence bound for trees) score
+        """
+        log_visits = log(self.visits)
+        return max(self.children, key=lambda c: c.wins / c.visits + exploration * sqrt(log_visits / c.visits))
+
+    def size(self) -> int:
+        """
+        :return: Number of nodes in the tree below and including this node
+        """
+        count, stack = 0, [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children)
+        return count
+
+    def shape(self) -> Tuple[int, int]:
+        """
+        :return: Number of nodes in the tree below and including this node, and how many of them have children
+        """
+        count, expanded, stack = 0, 0, [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            if node.children:
+                expanded += 1
+                stack.extend(node.children)
+        return count, expanded
+
+
+class MCTSAgent(Agent):
+    """
+    Monte Carlo tree search with UCT selection and random playouts.
+    The tree is kept between moves: after the opponent replies, the subtree of that reply (found through
+    board.last_move) becomes the new root, so the simulations of the previous turn are reused.
+    With several workers the search is root-parallel, see RootParallelMCTS. With pondering the tree keeps
+    growing in a helper process while the opponent thinks, see MCTSPonder.
+    """
+
+    def __init__(self, name="MCTS Agent", iterations: int = 1000, time_budget: Optional[float] = None,
+                 exploration: float = sqrt(2), book_path: Optional[str] = None, workers: Optional[int] = None,
+                 ponder: Optional[str] = None):
+        """
+        @param name: Name of the agent
+        @param iterations: Number of simulations per move, used if no time budget is given
+        @param time_budget: Seconds to spend per move. Overrides iterations.
+        @param exploration: The UCT exploration constant, higher values explore more
+        @param book_path: Opening book file to answer from while the game is still in it
+        @param workers: Number of processes growing a tree each move, including the agent's own. The helper
+        processes are started by start_game(), or by the first move if it was not called, and stopped by
+        end_game().
+        @param ponder: Keep growing the tree while the opponent thinks: PONDER_ALL grows it for all the replies,
+        PONDER_PREDICTED only below the most visited one. None not to ponder. The pondering process is started
+        and stopped like the workers.
+        """
+        assert ponder in PONDER_MODES
+        super().__init__(name, book_path)
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.exploration = exploration
+        self.workers = workers
+        self.ponder = ponder
+        self.root: Optional[Node] = None
+        self.tree_size = 0
+        self._helpers: Optional[RootParallelMCTS] = None
+        self._ponder: Optional[MCTSPonder] = None
+        # iterations, simulations_per_second, max_depth and tree_size of the last move
+        self.last_move_stats = {}
+
+    @property
+    def parallel(self) -> bool:
+        return self.workers is not None and self.workers > 1
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['_helpers'] = state['_ponder'] = None  # the helper processes belong to this process
+        return state
+
+    def start_game(self, board, piece):
+        super().start_game(board, piece)
+        self.root = None
+        self.start_helpers(board)
+
+    def end_game(self):
+        super().end_game()
+        self.root = None
+        self.tree_size = 0
+        if self._helpers is not None:
+            self._helpers.shutdown()
+            self._helpers = None
+        if self._ponder is not None:
+            self._ponder.shutdown()
+            self._ponder = None
+
+    def start_helpers(self, board: Board) -> None:
+        """
+        Starts the root-parallel and pondering helper processes on the game of :board, if not running yet.
+        """
+        if self.parallel and self._helpers is None:
+            self._helpers = RootParallelMCTS(self, board, self.workers)
+        if self.ponder is not None and self._ponder is None:
+            self._ponder = MCTSPonder(self, board, self.ponder)
+
+    def play_move(self, board: Board):
+        assert not board.is_terminal()
+        self.start_helpers(board)  # in case start_game() was not called
+        move_start, start_cpu = perf_counter_ns(), process_time()
+        if self._ponder is not None:
+            pondered = self._ponder.stop(board)
+            if pondered is not None:
+                self.root = pondered
+                self.tree_size = pondered.size()
+        move = self.book_move(board)
+        if move is not None:
+            board.play(board.turn, *move)
+            self.root = None  # the tree is started again once the game leaves the book
+            self.tree_size = 0
+            self.last_move_stats = {'iterations': 0, 'simulations_per_second': 0, 'max_depth': 0, 'tree_size': 0}
+            elapsed = perf_counter_ns() - move_start
+            self.report_stats(SearchStats(1, wall_time=elapsed / 1e9, cpu_time=process_time() - start_cpu))
+            self.record_latency(elapsed)
+            self.played(board)
+            return
+        start = perf_counter()
+        if self._helpers is not None:
+            self._helpers.start_search(board, self.iterations, self.time_budget)
+        root = self.find_root(board)
+        iterations, max_depth = self.grow(board, root, start)
+        own_iterations, own_depth = iterations, max_depth
+        if self._helpers is not None:
+            move, helper_iterations, helper_depth = self._helpers.collect(board, root)
+            iterations += helper_iterations
+            max_depth = max(max_depth, helper_depth)
+            best = next((c for c in root.children if c.move == move), None)
+        else:
+            best = max(root.children, key=lambda c: c.visits)
+            move = best.move
+        duration = perf_counter() - start
+        nodes, expanded = root.shape()
+        # The tree is one search: its nodes, the playouts run from it and its average number of children
+        elapsed = perf_counter_ns() - move_start
+        self.report_stats(SearchStats(1, 1, nodes, own_iterations, expanded, max_depth=own_depth,
+                                      wall_time=elapsed / 1e9, cpu_time=process_time() - start_cpu))
+        self.record_latency(elapsed)
+
+        board.play(board.turn, *move)
+        if best is None:  # the other processes chose a move this tree has not tried
+            self.root = None
+            self.tree_size = 0
+        else:
+            best.parent = None  # drop the rest of the tree
+            self.root = best
+            self.tree_size = best.size()
+        self.last_move_stats = {
+            'iterations': iterations,
+            'simulations_per_second': iterations / duration if duration > 0 else float('inf'),
+            'max_depth': max_depth,
+            'tree_size': self.tree_size,
+        }
+        self.played(board)
+
+    def played(self, board: Board) -> None:
+        """
+        Tells the helper processes about the move the agent just played on :board, and starts pondering.
+        """
+        if self._helpers is not None:
+            self._helpers.sync.note(board)
+        if self._ponder is not None and not board.is_terminal():
+            self._ponder.start(board, self.root)
+
+    def grow(self, board: Board, root: Node, start: float) -> Tuple[int, int]:
+        """
+        Runs simulations from :root for the move's budget, time_budget seconds since :start or iterations.
+        @return: The number of simulations and the deepest tree node they reached
+        """
+        max_depth = 0
+        iterations = 0
+        while iterations < 1 or (perf_counter() - start < self.time_budget if self.time_budget is not None
+                                 else iterations < self.iterations):
+            max_depth = max(max_depth, self.simulate(board, root))
+            iterations += 1
+        return iterations, max_depth
+
+    def find_root(self, board: Board) -> Node:
+        """
+        Re-roots the tree at the opponent's reply if it was searched, otherwise starts a new tree.
+        @return: The node of the current position
+        """
+        root = self.root
+        if root is not None and root.key == board.zobrist_hash:  # the tree came back from pondering
+            return root
+        if root is not None and board.last_move is not None:
+            for child in root.children:
+                if child.move == board.last_move and child.key == board.zobrist_hash:
+                    child.parent = None
+                    self.root = child
+                    self.tree_size = child.size()
+                    return child
+        self.root = Node(board.last_move, None, -board.turn, board.zobrist_hash, board.get_legal_moves())
+        self.tree_size = 1
+        return self.root
+
+    def follow(self, move: Move, key: int) -> None:
+        """
+        Moves the root of the tree to the child reached by :move, or drops the tree if it has no such child.
+        @param key: Zobrist hash of the position after the move
+        """
+        root = self.root
+        self.root = None
+        self.tree_size = 0
+        if root is not None:
+            for child in root.children:
+                if child.move == move and child.key == key:
+                    child.parent = None
+                    self.root = child
+                    self.tree_size = child.size()
+                    return
+
+    def simulate(self, board: Board, root: Node) -> int:
+        """
+        Runs one iteration: selection, expansion, a random playout and backpropagation.
+        The board is restored before returning.
+        @return: The depth of the tree node the iteration reached
+        """
+        node = root
+        tokens = []
+        depth = 0
+
+        # Selection
+        while not node.untried and node.children:
+            node = node.select_child(self.exploration)
+            tokens.append(board.make_move(board.turn, *node.move))
+            depth += 1
+
+        # Expansion
+        if node.untried and not board.is_terminal():
+            move = node.untried.pop(random.randrange(len(node.untried)))
+            player = board.turn
+            tokens.append(board.make_move(player, *move))
+            child = Node(move, node, player, board.zobrist_hash,
+                         [] if board.is_terminal() else board.get_legal_moves())
+            node.children.append(child)
+            self.tree_size += 1
+            node = child
+            depth += 1
+
+        # Playout
+        while not board.is_terminal():
+            tokens.append(board.make_move(board.turn, *random.choice(board.get_legal_moves())))
+        winner = board.winner
+        for token in reversed(tokens):
+            board.undo(token)
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1
+            elif winner == 0:
+                node.wins += 0.5
+            node = node.parent
+        return depth
+
+
+class _GameSync:
+    """
+    Keeps track of the moves of the game a helper process has not been sent yet. The helper follows the game
+    on its own board, so sending it the new moves (one byte each, see game.moves.encode_move) is enough.
+    """
+
+    def __init__(self, board: Board):
+        self.key: int = board.zobrist_hash  # hash of the helper's position
+        self.pending: List[Move] = []  # moves played since
+
+    def note(self, board: Board) -> None:
+        """
+        Records board.last_move if the helper does not have it yet. Called after every move the agent plays and
+        before it searches, which covers the opponent's reply as well.
+        """
+        if board.zobrist_hash != self.key and board.last_move not in self.pending[-1:]:
+            self.pending.append(board.last_move)
+
+    def take(self, board: Board) -> bytes:
+        """
+        :return: The encoded moves that take the helper to :board, which it is then assumed to be at
+        """
+        self.note(board)
+        moves = bytes(encode_move(board.n, move) for move in self.pending)
+        self.pending = []
+        self.key = board.zobrist_hash
+        return moves
+
+
+def _follow_moves(agent: MCTSAgent, board: Board, moves: bytes, key: int) -> bool:
+    """
+    Plays the encoded :moves on a helper's board, following them down the agent's tree.
+    @return: True if the board ends up at the position with hash :key, False if the helper is out of sync
+    """
+    for value in moves:
+        move = decode_move(board.n, value)
+        if board.is_terminal() or move not in board.get_legal_moves():
+            return False
+        board.play(board.turn, *move)
+        agent.follow(move, board.zobrist_hash)
+    return board.zobrist_hash == key
+
+
+def _mcts_worker(connection: Connection, agent: MCTSAgent, board_type: type, position: bytes) -> None:
+    """
+    Main loop of a RootParallelMCTS helper process. The process follows the game on its own copy of the board
+    and keeps its own tree, so only the moves played since the last search and the root statistics are sent.
+    Messages are ('search', moves, key, iterations, time_budget) and ('reset', position), None stops the process.
+    Positions are sent as board.to_bytes(), see game.codec.
+    A search is answered with (iterations, max depth, [(encoded move, visits, wins) of each root child]), or
+    with None if the position after the moves does not have the expected key, after which a reset is sent.
+    """
+    random.seed()  # forked processes start with the random state of their parent
+    board = board_type.from_bytes(position)
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        if message[0] == 'reset':
+            board = board_type.from_bytes(message[1])
+            agent.root = None
+            continue
+        _, moves, key, agent.iterations, agent.time_budget = message
+        if not _follow_moves(agent, board, moves, key):
+            connection.send(None)
+            continue
+        start = perf_counter()
+        root = agent.find_root(board)
+        iterations, max_depth = agent.grow(board, root, start)
+        connection.send((iterations, max_depth,
+                         [(encode_move(board.n, c.move), c.visits, c.wins) for c in root.children]))
+
+
+class RootParallelMCTS:
+    """
+    Root-parallel Monte Carlo tree search. Every process (the agent's own and workers - 1 helpers) grows an
+    independent tree from the current position with its own random playouts for the move's budget. The visit
+    counts and wins of the root moves are then added up over the trees and the most visited move is played.
+
+    The helpers are started once per game and follow it on their own board: each search only sends them the
+    moves played since the last one and the hash of the position to check they are in sync. Helpers also keep
+    their trees between moves like MCTSAgent does.
+    """
+
+    def __init__(self, agent: MCTSAgent, board: Board, workers: int):
+        """
+        @param agent: The agent to search for, copied to the helpers
+        @param board: The board of the game, sent to the helpers once
+        @param workers: Number of processes searching, including the agent's own
+        """
+        self.connections: List[Connection] = []
+        self.processes: List[Process] = []
+        for _ in range(workers - 1):
+            parent, child = Pipe()
+            process = Process(target=_mcts_worker, args=(child, agent, type(board), board.to_bytes()), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self.sync = _GameSync(board)
+
+    def start_search(self, board: Board, iterations: int, time_budget: Optional[float]) -> None:
+        """
+        Starts the helpers searching :board. The opponent's reply is taken from board.last_move.
+        """
+        moves = self.sync.take(board)
+        for connection in self.connections:
+            connection.send(('search', moves, board.zobrist_hash, iterations, time_budget))
+
+    def collect(self, board: Board, root: Node) -> Tuple[Move, int, int]:
+        """
+        Waits for the helpers started by start_search() and merges their root statistics with those of :root.
+        Helpers that were out of sync are sent the board to catch up for the next move.
+        @return: The most visited move over all the trees (ties go to the most wins), the number of helper
+        simulations and their max depth
+        """
+        totals: Dict[Move, Tuple[int, float]] = {c.move: (c.visits, c.wins) for c in root.children}
+        iterations = max_depth = 0
+        for connection in self.connections:
+            result = connection.recv()
+            if result is None:
+                connection.send(('reset', board.to_bytes()))
+                continue
+            iterations += result[0]
+            max_depth = max(max_depth, result[1])
+            for value, visits, wins in result[2]:
+                move = decode_move(board.n, value)
+                total_visits, total_wins = totals.get(move, (0, 0.0))
+                totals[move] = (total_visits + visits, total_wins + wins)
+        return max(totals, key=totals.get), iterations, max_depth
+
+    def shutdown(self) -> None:
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for process in self.processes:
+            process.join()
+
+
+def _ponder_worker(connection: Connection, agent: MCTSAgent, board_type: type, position: bytes) -> None:
+    """
+    Main loop of a MCTSPonder helper process. Messages are ('ponder', moves, key, tree, mode), ('stop', moves,
+    key) and ('reset', position), None stops the process. A ponder message hands over the agent's tree for the
+    position after its move, which grows until the stop message brings the opponent's reply. The stop
+    message is answered with (in sync, subtree of the reply or None).
+    """
+    random.seed()  # forked processes start with the random state of their parent
+    board = board_type.from_bytes(position)
+    synced = False
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        if message[0] == 'reset':
+            board = board_type.from_bytes(message[1])
+            synced = True
+            continue
+        if message[0] == 'stop':
+            _, moves, key = message
+            synced = synced and _follow_moves(agent, board, moves, key)
+            root, agent.root = agent.root, None
+            connection.send((synced, root if synced else None))
+            continue
+
+        _, moves, key, tree, mode = message
+        agent.root = None
+        synced = _follow_moves(agent, board, moves, key)
+        if not synced:
+            continue
+        agent.root = tree
+        root = agent.find_root(board)
+        tokens = []
+        if mode == PONDER_PREDICTED and root.children:
+            root = max(root.children, key=lambda c: c.visits)
+            tokens.append(board.make_move(board.turn, *root.move))
+        while not connection.poll():
+            for _ in range(PONDER_CHECK_INTERVAL):
+                agent.simulate(board, root)
+        for token in reversed(tokens):
+            board.undo(token)
+
+
+class MCTSPonder:
+    """
+    Pondering for MCTSAgent. After the agent has moved, its tree is sent to a helper process that keeps
+    simulating from the new position while the opponent thinks, for all the replies or only below the one the
+    tree expects. When the agent has to move again, the helper follows the actual reply and sends back the
+    subtree below it, which the agent continues from.
+
+    The helper is started once per game and follows it on its own board like the RootParallelMCTS helpers.
+    """
+
+    def __init__(self, agent: MCTSAgent, board: Board, mode: str):
+        """
+        @param agent: The agent to ponder for, copied to the helper
+        @param board: The board of the game, sent to the helper once
+        @param mode: PONDER_PREDICTED or PONDER_ALL
+        """
+        self.mode: str = mode
+        self.connection, child = Pipe()
+        self.process = Process(target=_ponder_worker, args=(child, agent, type(board), board.to_bytes()),
+                               daemon=True)
+        self.process.start()
+        child.close()
+        self.sync = _GameSync(board)
+        self.pondering = False
+
+    def start(self, board: Board, root: Optional[Node]) -> None:
+        """
+        Starts pondering on :board, the position after the agent's move, continuing the agent's tree :root.
+        """
+        self.connection.send(('ponder', self.sync.take(board), board.zobrist_hash, root, self.mode))
+        self.pondering = True
+
+    def stop(self, board: Board) -> Optional[Node]:
+        """
+        Stops pondering now that the opponent has replied on :board.
+        @return: The pondered tree of the position, None if there was no pondering or it did not reach the reply
+        """
+        if not self.pondering:
+            self.sync.note(board)
+            return None
+        self.pondering = False
+        self.connection.send(('stop', self.sync.take(board), board.zobrist_hash))
+        synced, root = self.connection.recv()
+        if not synced:
+            self.connection.send(('reset', board.to_bytes()))
+        return root
+
+    def shutdown(self) -> None:
+        self.connection.send(None)
+        self.connection.close()
+        self.process.join()
@@ -0,0 +1,162 @@
+"""
+Opening book: the moves a strong (slow) agent picks in the first plies of the game, computed once offline and
+looked up by the agents during play.
+
+The book is a binary file made of a header followed by fixed size records sorted by position key:
+<ul>
+<li> header: magic b'UTTTBOOK', format version (uint16), board size n (uint16), number of records (uint32) </li>
+<li> record: position key (uint64), move (uint16) stored as sub_board * n * n + cell </li>
+</ul>
+all little-endian. Positions are stored in canonical form (see game.symmetry), so the 8 symmetric versions of
+a position share one record and are searched once when building the book.
+OpeningBook memory-maps the file and binary searches it, so only the pages it touches are read.
+
+Build a book with: python -m agent.opening_book book.bin [--plies 2] [--depth 5] [--engine bitboard]
+"""
+import argparse
+import mmap
+import struct
+from copy import deepcopy
+from typing import Dict, Optional, Tuple
+
+from game.board import Board
+from game.moves import encode_move, decode_move
+from game.symmetry import canonical_form, transform_move, INVERSE
+
+Move = Tuple[Tuple[int, int], Tuple[int, int]]
+
+MAGIC = b'UTTTBOOK'
+VERSION = 2
+HEADER = struct.Struct('<8sHHI')
+RECORD = struct.Struct('<QH')
+KEY = struct.Struct('<Q')
+
+
+class OpeningBook:
+    """
+    Read-only view of an opening book file. Lookups take O(log n) and read a handful of records.
+    Copies sent to other processes reopen the file instead of pickling its contents.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError(f'{path} is not an opening book')
+        magic, version, self.n, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an opening book')
+        if version != VERSION:
+            raise ValueError(f'{path} has book format version {version}, expected {VERSION}')
+        if len(self._map) != HEADER.size + self.count * RECORD.size:
+            raise ValueError(f'{path} is truncated')
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def __len__(self):
+        return self.count
+
+    def close(self) -> None:
+        self._map.close()
+
+    def probe(self, key: int) -> Optional[Move]:
+        """
+        :param key: Key of the position's canonical form, see game.symmetry.canonical_form()
+        :return: The book move for the canonical position or None if it is not in the book
+        """
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(self._map, HEADER.size + mid * RECORD.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.count:
+            return None
+        found, move = RECORD.unpack_from(self._map, HEADER.size + lo * RECORD.size)
+        return decode_move(self.n, move) if found == key else None
+
+    def get_move(self, board) -> Optional[Move]:
+        """
+        :return: The book move for the board's position if it is in the book and legal there, otherwise None
+        """
+        if board.n != self.n:
+            return None
+        key, transform = canonical_form(board)
+        move = self.probe(key)
+        if move is None:
+            return None
+        move = transform_move(move, INVERSE[transform], self.n)
+        if move not in board.get_legal_moves():  # guard against hash collisions
+            return None
+        return move
+
+
+def write_book(path: str, n: int, entries: Dict[int, Move]) -> None:
+    """
+    Writes an opening book file.
+    :param path: File to write
+    :param n: Size of the board the moves are for
+    :param entries: Book move for each canonical position key
+    """
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n, len(entries)))
+        for key in sorted(entries):
+            f.write(RECORD.pack(key, encode_move(n, entries[key])))
+
+
+def build_book(agent, plies: int, board_type: type = Board, verbose: bool = False) -> Dict[int, Move]:
+    """
+    Asks :agent for its move in every position reachable in fewer than :plies moves. Positions reached by
+    several move orders, and symmetric positions, are searched once.
+    :param agent: Any agent. It searches a copy of each position, so the agent can play the move on it.
+    :param plies: Number of plies the book covers
+    :param board_type: Game engine to search on
+    :param verbose: Print progress
+    :return: The book move for each canonical position key
+    """
+    entries: Dict[int, Move] = {}
+
+    def visit(board, ply: int):
+        key, transform = canonical_form(board)
+        if board.is_terminal() or key in entries:
+            return
+        position = deepcopy(board)
+        agent.start_game(position, position.turn)
+        agent.play_move(position)
+        agent.end_game()
+        entries[key] = transform_move(position.last_move, transform, board.n)
+        if verbose and len(entries) % 100 == 0:
+            print(len(entries), 'positions searched')
+        if ply + 1 < plies:
+            for move in board.get_legal_moves():
+                token = board.make_move(board.turn, *move)
+                visit(board, ply + 1)
+                board.undo(token)
+
+    visit(board_type(), 0)
+    return entries
+
+
+if __name__ == '__main__':
+    from time import perf_counter
+    from agent.simple_minimax_agent import SimpleMinimaxAgent
+    from game.perft import ENGINES
+
+    parser = argparse.ArgumentParser(description='Builds an opening book with SimpleMinimaxAgent.')
+    parser.add_argument('output', help='book file to write')
+    parser.add_argument('--plies', type=int, default=2, help='number of plies the book covers')
+    parser.add_argument('--depth', type=int, default=5, help='search depth for each book position')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='bitboard', help='game engine to search on')
+    args = parser.parse_args()
+
+    start = perf_counter()
+    book = build_book(SimpleMinimaxAgent(max_depth=args.depth, tt_size=1 << 18), args.plies, ENGINES[args.engine],
+                      verbose=True)
+    write_book(args.output, 3, book)
+    print(f'Wrote {len(book)} positions to {args.output} in {perf_counter() - start:.1f}s')
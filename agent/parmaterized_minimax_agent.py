@@ -1,4 +1,3 @@
-from copy import deepcopy
 from typing import Optional
 from agent.base_agent import Agent
 from game.board import Board
@@ -6,13 +5,15 @@ from game.board import Board
 
 class ParameterizedMinimaxAgent(Agent):
 
-    def __init__(self, name="Parameterized Minimax Agent", max_depth=float('inf')):
-        super().__init__(name)
+    def __init__(self, name="Parameterized Minimax Agent", max_depth=float('inf'), book_path: Optional[str] = None):
+        super().__init__(name, book_path)
         self.max_depth = max_depth
 
     def play_move(self, board):
         assert not board.is_terminal()
-        move = self.minimax_search(board)
+        move = self.book_move(board)
+        if move is None:
+            move = self.minimax_search(board)
         ((x, y), (i, j)) = move
         board.play(board.turn, (x, y), (i, j))
 
@@ -29,14 +30,13 @@ class ParameterizedMinimaxAgent(Agent):
             return board.winner, None
         if depth >= self.max_depth:
             for (x, y), (i, j) in board.get_legal_moves():
-                board_copy = deepcopy(board)
-                board_copy.play(1, (x, y), (i, j))
+                board.undo(board.make_move(1, (x, y), (i, j)))
             return self.evaluate(board, False)
         v, move = -float('inf'), None
         for (x, y), (i, j) in board.get_legal_moves():
-            board_copy = deepcopy(board)
-            board_copy.play(1, (x, y), (i, j))
-            v2, a2 = self.min_value(board_copy, alpha, beta, depth + 1)
+            token = board.make_move(1, (x, y), (i, j))
+            v2, a2 = self.min_value(board, alpha, beta, depth + 1)
+            board.undo(token)
             if v2 > v:
                 v, move = v2, ((x, y), (i, j))
                 alpha = max(alpha, v)
@@ -52,9 +52,9 @@ class ParameterizedMinimaxAgent(Agent):
             return self.evaluate(board, False)
         v, move = float('inf'), None
         for (x, y), (i, j) in board.get_legal_moves():
-            board_copy = deepcopy(board)
-            board_copy.play(-1, (x, y), (i, j))
-            v2, a2 = self.max_value(board_copy, alpha, beta, depth + 1)
+            token = board.make_move(-1, (x, y), (i, j))
+            v2, a2 = self.max_value(board, alpha, beta, depth + 1)
+            board.undo(token)
             if v2 < v:
                 v, move = v2, ((x, y), (i, j))
                 beta = min(beta, v)
@@ -63,10 +63,9 @@ class ParameterizedMinimaxAgent(Agent):
         return v, move
 
     def evaluate(self, board: Board, maximizing: bool) -> tuple[float, Optional[tuple[tuple[int, int], tuple[int, int]]]]:
-        board_copy = deepcopy(board)
         best = -float('inf') if maximizing else float('inf'), None
         for ((x, y), (i, j)) in board.get_legal_moves():
-            board_copy.play(board.turn, (x, y), (i, j))
+            board.undo(board.make_move(board.turn, (x, y), (i, j)))
 
 
 
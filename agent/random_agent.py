@@ -1,6 +1,7 @@
 from agent.base_agent import Agent
 from game.board import Board
 from random import sample
+from time import perf_counter_ns
 
 
 class RandomAgent(Agent):
@@ -13,7 +14,9 @@ class RandomAgent(Agent):
 
     def play_move(self, board: Board):
         assert not board.is_terminal()
+        start = perf_counter_ns()
         legal_moves = board.get_legal_moves()
         move = sample(legal_moves, 1)[0]
         ((x, y), (i, j)) = move
         board.play(board.turn, (x, y), (i, j))
+        self.record_latency(perf_counter_ns() - start)
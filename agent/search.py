@@ -0,0 +1,144 @@
+"""
+Helpers shared by the search agents.
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+Move = Tuple[Tuple[int, int], Tuple[int, int]]
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when its deadline has passed. Iterative deepening catches it and falls back to the
+    result of the last completed iteration.
+    """
+    pass
+
+
+# Number of nodes searched between two deadline checks
+DEADLINE_CHECK_INTERVAL = 64
+
+# What an agent searches on the opponent's time, see Ponder
+PONDER_PREDICTED = 'predicted'  # the position after the reply the agent's own search expects
+PONDER_ALL = 'all'  # the position the opponent has to move in, which covers all the replies
+PONDER_MODES = (None, PONDER_PREDICTED, PONDER_ALL)
+
+
+def order_first(moves: list, move) -> None:
+    """
+    Moves :param move to the front of :param moves if it is one of them.
+    """
+    if move in moves:
+        moves.remove(move)
+        moves.insert(0, move)
+
+
+# The agent of a helper process of LazySMP, set once when the process starts
+_helper_agent = None
+
+
+def _init_helper(agent) -> None:
+    global _helper_agent
+    _helper_agent = agent
+
+
+def _run_helper(board_type: type, position: bytes, index: int,
+                time_budget: Optional[float]) -> Tuple[int, float, Optional[Move]]:
+    return _helper_agent.smp_search(board_type.from_bytes(position), index, time_budget)
+
+
+def _run_ponder(board_type: type, position: bytes, piece: int) -> Tuple[int, float, Optional[Move]]:
+    return _helper_agent.ponder_search(board_type.from_bytes(position), piece)
+
+
+class LazySMP:
+    """
+    Lazy SMP parallel search. The agent's own process and workers - 1 helper processes all search the same root
+    with iterative deepening and share the agent's SharedTranspositionTable. They only cooperate through the
+    table: each finds positions the others have already searched, so together they get deeper than one process.
+    Helpers start at staggered depths and in a different root move order so they do not all search the same
+    nodes at the same time. When one process finishes, the others are stopped through the table's stop flag
+    and the deepest completed result is played.
+
+    Agents using it implement smp_search(board, index, time_budget) -> (completed depth, value, move) for the
+    process with the given index (0 for the agent's own process).
+    The helper processes are started once and get a copy of the agent, so they should be started once per game.
+    """
+
+    def __init__(self, agent, workers: int):
+        """
+        @param agent: The agent to search for. Its transposition_table must be a SharedTranspositionTable.
+        @param workers: Number of processes searching, including the agent's own
+        """
+        self.workers: int = workers
+        self.pool = ProcessPoolExecutor(max_workers=workers - 1, initializer=_init_helper, initargs=(agent,))
+
+    def search(self, agent, board, time_budget: Optional[float]) -> Tuple[int, float, Optional[Move]]:
+        """
+        @param agent: The agent the helpers were started for
+        @param board: The position to search
+        @param time_budget: Seconds to search for, None to search to the agent's max_depth
+        @return: The (completed depth, value, move) of the process that got the deepest
+        """
+        table = agent.transposition_table
+        table.reset_stop()
+        position = board.to_bytes()  # see game.codec
+        futures = [self.pool.submit(_run_helper, type(board), position, index, time_budget)
+                   for index in range(1, self.workers)]
+        try:
+            best = agent.smp_search(board, 0, time_budget)
+        finally:
+            table.request_stop()
+            results = [future.result() for future in futures]
+        for result in results:
+            if result[0] > best[0]:
+                best = result
+        return best
+
+    def shutdown(self) -> None:
+        self.pool.shutdown()
+
+
+class Ponder:
+    """
+    Pondering: searching on the opponent's time. After the agent has moved, a helper process searches the
+    position the opponent is thinking in (or the one after the reply the agent expects) until the agent's next
+    move, storing what it finds in the agent's SharedTranspositionTable. When the reply arrives, the agent's
+    own search finds the positions after it already searched, fully or to some depth, in the table.
+
+    Agents using it implement ponder_search(board, piece) -> (completed depth, value, move), a search for the
+    side playing :piece that runs until the table's stop flag is set. The helper process is started like those
+    of LazySMP.
+    """
+
+    def __init__(self, agent):
+        """
+        @param agent: The agent to search for. Its transposition_table must be a SharedTranspositionTable.
+        """
+        self.pool = ProcessPoolExecutor(max_workers=1, initializer=_init_helper, initargs=(agent,))
+        self.future: Optional[Future] = None
+
+    def start(self, agent, board, piece: int) -> None:
+        """
+        Starts searching :board in the background. The board may be played on right after this returns.
+        @param piece: The agent's piece. The helper's copy of the agent may be older than the game, so it is
+        told which side it searches for with every position.
+        """
+        self.stop(agent)
+        agent.transposition_table.reset_stop()
+        self.future = self.pool.submit(_run_ponder, type(board), board.to_bytes(), piece)
+
+    def stop(self, agent) -> Optional[Tuple[int, float, Optional[Move]]]:
+        """
+        Stops the background search, if one is running, and waits for it.
+        @return: The (completed depth, value, move) of the background search or None if none was running
+        """
+        if self.future is None:
+            return None
+        agent.transposition_table.request_stop()
+        result = self.future.result()
+        self.future = None
+        return result
+
+    def shutdown(self) -> None:
+        self.pool.shutdown()
@@ -0,0 +1,106 @@
+from typing import Dict, List, Optional
+
+
+class SearchStats:
+    """
+    What the search of one move did, or the sum over many moves (see merge()).
+    Agents report a record after every move to Agent.report_stats(), which keeps it as agent.last_stats, adds it to
+    agent.search_stats and passes it to agent.on_stats. Only the work of the agent's own process is counted, not
+    that of Lazy SMP, root-parallel or pondering helpers.
+    """
+
+    def __init__(self, moves: int = 0, searches: int = 0, nodes: int = 0, leaf_evals: int = 0,
+                 expanded: int = 0, cutoffs: Optional[List[int]] = None, tt_probes: int = 0, tt_hits: int = 0,
+                 max_depth: int = 0, wall_time: float = 0.0, cpu_time: float = 0.0):
+        """
+        :param moves: Number of moves the record covers
+        :param searches: Number of searches from the root, one per iteration of iterative deepening
+        :param nodes: Number of positions visited
+        :param leaf_evals: Number of positions scored without searching further: terminal positions and positions
+        at the depth limit, or the random playouts of MCTS
+        :param expanded: Number of positions whose moves were searched
+        :param cutoffs: cutoffs[i] is the number of beta cutoffs caused by the i-th move searched in a position
+        :param tt_probes: Number of transposition table lookups
+        :param tt_hits: Number of lookups that found the position
+        :param max_depth: Deepest ply reached
+        :param wall_time: Seconds taken
+        :param cpu_time: CPU seconds used by the agent's process
+        """
+        self.moves = moves
+        self.searches = searches
+        self.nodes = nodes
+        self.leaf_evals = leaf_evals
+        self.expanded = expanded
+        self.cutoffs = cutoffs if cutoffs is not None else []
+        self.tt_probes = tt_probes
+        self.tt_hits = tt_hits
+        self.max_depth = max_depth
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+
+    @property
+    def branching_factor(self) -> float:
+        """
+        Average number of moves searched per expanded position. Every visited position but the roots of the
+        searches was reached from an expanded one.
+        """
+        return (self.nodes - self.searches) / self.expanded if self.expanded else 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """
+        Share of the cutoffs caused by the first move searched, the usual measure of move ordering
+        """
+        total = sum(self.cutoffs)
+        return self.cutoffs[0] / total if total else 0.0
+
+    @property
+    def tt_hit_rate(self) -> float:
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.wall_time if self.wall_time > 0 else 0.0
+
+    def merge(self, other: 'SearchStats') -> None:
+        """
+        Adds :param other to this record. Counts and times add up, max_depth is the deepest of both.
+        """
+        self.moves += other.moves
+        self.searches += other.searches
+        self.nodes += other.nodes
+        self.leaf_evals += other.leaf_evals
+        self.expanded += other.expanded
+        if len(other.cutoffs) > len(self.cutoffs):
+            self.cutoffs.extend([0] * (len(other.cutoffs) - len(self.cutoffs)))
+        for i, count in enumerate(other.cutoffs):
+            self.cutoffs[i] += count
+        self.tt_probes += other.tt_probes
+        self.tt_hits += other.tt_hits
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.wall_time += other.wall_time
+        self.cpu_time += other.cpu_time
+
+    def summary(self) -> Dict[str, float]:
+        """
+        :return: The record per move, for reports that compare agents
+        """
+        moves = max(self.moves, 1)
+        return {
+            'moves': self.moves,
+            'nodes_per_move': self.nodes / moves,
+            'leaf_evals_per_move': self.leaf_evals / moves,
+            'nodes_per_second': self.nodes_per_second,
+            'branching_factor': self.branching_factor,
+            'first_move_cutoff_rate': self.first_move_cutoff_rate,
+            'tt_hit_rate': self.tt_hit_rate,
+            'max_depth': self.max_depth,
+            'wall_ms_per_move': self.wall_time * 1000 / moves,
+            'cpu_ms_per_move': self.cpu_time * 1000 / moves,
+        }
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__, cutoffs=list(self.cutoffs))
+
+    def __repr__(self):
+        return 'SearchStats(' + ', '.join(f'{name}={value!r}' for name, value in self.__dict__.items()) + ')'
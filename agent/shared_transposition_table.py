@@ -0,0 +1,162 @@
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+from agent.transposition_table import Entry
+from game.moves import encode_move, decode_move, Move
+
+NO_MOVE = 0xFFFF
+MAX_DEPTH = 0xFF  # stored depths are capped, MAX_DEPTH stands for a search to the end of the game
+VALID = 1 << 26  # set in every stored entry, so that no entry is all zeros like an empty slot
+
+
+def _pack(depth: float, bound: int, move_value: int) -> int:
+    # bits 0-7: depth, 8-9: bound, 10-25: move, 26: VALID
+    depth = MAX_DEPTH if depth >= MAX_DEPTH else int(depth)
+    return depth | bound << 8 | move_value << 10 | VALID
+
+
+def _unpack(meta: int) -> Tuple[float, int, int]:
+    depth = meta & 0xFF
+    return float('inf') if depth == MAX_DEPTH else depth, meta >> 8 & 0b11, meta >> 10 & 0xFFFF
+
+
+class SharedTranspositionTable:
+    """
+    A transposition table in shared memory that several processes read and write at the same time.
+    Same interface and replacement scheme as TranspositionTable (a depth-preferred and an always-replace slot per
+    bucket), but without locks: each slot holds three 64-bit words, key ^ meta ^ score, meta (depth, bound and
+    move) and score. A reader only accepts an entry whose words XOR back to the key it looks for, so an entry torn
+    by two processes writing at once reads as a miss instead of as a wrong result.
+
+    The first word of the block is a stop flag used by the parallel search to tell the helper processes to stop.
+
+    Copies made by pickling attach to the same memory. The process that created the table should call unlink()
+    when done with it.
+    """
+
+    def __init__(self, max_entries: int = 1 << 20, n: int = 3, name: Optional[str] = None):
+        """
+        @param max_entries: Maximum number of entries
+        @param n: Size of the board, used to store moves compactly
+        @param name: Name of an existing table to attach to. A new table is created if None.
+        """
+        self.n: int = n
+        self.num_buckets: int = max(1, max_entries // 2)
+        size = (1 + 6 * self.num_buckets) * 8
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+        else:
+            self._shm = _attach(name)
+            self._owner = False
+        self.name: str = self._shm.name
+        # Slot s takes words 1 + 3 * s to 3 + 3 * s. Slot 2 * bucket is the depth-preferred slot of a bucket,
+        # slot 2 * bucket + 1 the always-replace one. Indexing a memoryview gives Python ints directly, which
+        # is several times faster than indexing a NumPy array for single words. Scores are read and written as
+        # doubles through a second view, and as their bits through the first one to check the entry.
+        self._words = self._shm.buf.cast('Q')
+        self._scores = self._shm.buf.cast('d')
+        self._moves: Tuple[Move, ...] = tuple(decode_move(n, value) for value in range(n ** 4))
+        if self._owner:
+            self.clear()
+
+    def __getstate__(self):
+        return {'max_entries': 2 * self.num_buckets, 'n': self.n, 'name': self.name}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_entries'], state['n'], state['name'])
+
+    def __len__(self):
+        return int(np.count_nonzero(np.frombuffer(self._shm.buf, dtype=np.uint64)[2::3]))
+
+    def _matches(self, i: int, key: int) -> bool:
+        words = self._words
+        meta = words[i + 1]
+        return meta != 0 and words[i] ^ meta ^ words[i + 2] == key
+
+    def _write(self, i: int, key: int, meta: int, score: float) -> None:
+        words = self._words
+        self._scores[i + 2] = score
+        words[i + 1] = meta
+        words[i] = key ^ meta ^ words[i + 2]
+
+    def probe(self, key: int) -> Optional[Entry]:
+        """
+        :param key: Zobrist hash of the position
+        :return: The stored (key, depth, score, bound, move) entry for the position or None
+        """
+        i = 1 + 6 * (key % self.num_buckets)
+        if not self._matches(i, key):
+            i += 3
+            if not self._matches(i, key):
+                return None
+        meta = self._words[i + 1]
+        depth = meta & 0xFF
+        move_value = meta >> 10 & 0xFFFF
+        return (key, float('inf') if depth == MAX_DEPTH else depth, self._scores[i + 2], meta >> 8 & 0b11,
+                None if move_value == NO_MOVE else self._moves[move_value])
+
+    def store(self, key: int, depth: float, score: float, bound: int, move: Optional[Move]) -> None:
+        """
+        Stores a search result. See TranspositionTable.store()
+        """
+        meta = _pack(depth, bound, NO_MOVE if move is None else encode_move(self.n, move))
+        words, i = self._words, 1 + 6 * (key % self.num_buckets)
+        check, deep_meta, deep_score = words[i], words[i + 1], words[i + 2]
+        deep_key = check ^ deep_meta ^ deep_score
+        if not deep_meta or deep_key == key or depth >= _unpack(deep_meta)[0]:
+            if deep_meta and deep_key != key:
+                # keep the replaced entry as the recent one
+                words[i + 3], words[i + 4], words[i + 5] = check, deep_meta, deep_score
+            elif self._matches(i + 3, key):
+                words[i + 4] = 0  # do not keep a stale copy of the position
+            self._write(i, key, meta, score)
+        else:
+            self._write(i + 3, key, meta, score)
+
+    def clear(self) -> None:
+        """
+        Removes all the entries and clears the stop flag.
+        """
+        np.frombuffer(self._shm.buf, dtype=np.uint64)[:] = 0
+
+    @property
+    def stop_requested(self) -> bool:
+        return bool(self._words[0])
+
+    def request_stop(self) -> None:
+        self._words[0] = 1
+
+    def reset_stop(self) -> None:
+        self._words[0] = 0
+
+    def close(self) -> None:
+        """
+        Detaches this process from the table.
+        """
+        self._words.release()
+        self._scores.release()
+        self._words = self._scores = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """
+        Detaches and frees the shared memory. Only the process that created the table should call it.
+        """
+        self.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Attaches to an existing block. Where possible the block is kept away from the resource tracker, which only
+    the creating process should use to free it. Before Python 3.13 it cannot be: processes started by
+    multiprocessing share their parent's tracker, so the block is still only freed once.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # track was added in Python 3.13
+        return shared_memory.SharedMemory(name=name)
@@ -1,61 +1,378 @@
-from copy import deepcopy
+from collections import Counter
+from time import perf_counter, perf_counter_ns, process_time
 from typing import Optional
 from agent.base_agent import Agent
+from agent.search_stats import SearchStats
+from agent.search import SearchTimeout, DEADLINE_CHECK_INTERVAL, order_first, LazySMP, Ponder, PONDER_MODES, \
+    PONDER_PREDICTED
+from agent.shared_transposition_table import SharedTranspositionTable
+from agent.transposition_table import TranspositionTable, EXACT, LOWER, UPPER
 from game.board import Board
-from random import sample
+from random import sample, Random
 
 
 class SimpleMinimaxAgent(Agent):
 
-    def __init__(self, name="Simple Minimax Agent", max_depth=float('inf')):
-        super().__init__(name)
+    def __init__(self, name="Simple Minimax Agent", max_depth=float('inf'), tt_size: Optional[int] = None,
+                 time_budget: Optional[float] = None, book_path: Optional[str] = None, workers: Optional[int] = None,
+                 ponder: Optional[str] = None):
+        """
+        @param name: Name of the agent
+        @param max_depth: Number of plies to search
+        @param tt_size: Maximum number of entries of the transposition table. No table is used if None.
+        The table is kept between moves of a game and cleared by end_game().
+        @param time_budget: Seconds to spend per move. If set, the agent deepens the search one ply at a time
+        (up to max_depth) and plays the best move of the last iteration that finished in time.
+        @param book_path: Opening book file to answer from while the game is still in it
+        @param workers: Number of processes to search with (Lazy SMP, see agent.search.LazySMP). The processes
+        share a transposition table of tt_size entries (default 2^20) in shared memory, which is created with the
+        helper processes when a game starts (or at the first move if start_game() is not called) and freed by
+        end_game().
+        @param ponder: Search in a helper process while the opponent thinks (see agent.search.Ponder):
+        PONDER_PREDICTED to search the position after the expected reply, PONDER_ALL to search all the replies,
+        None not to. The helper shares the table with the agent like the Lazy SMP helpers do.
+        """
+        assert ponder in PONDER_MODES
+        super().__init__(name, book_path)
         self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.tt_size = tt_size
+        self.workers = workers
+        self.ponder = ponder
+        self.transposition_table = TranspositionTable(tt_size) if tt_size and not self.shared else None
+        self._smp: Optional[LazySMP] = None
+        self._ponder: Optional[Ponder] = None
+        self._stop_on_flag = False  # whether the search stops when the shared table's stop flag is set
+        self._root_order: Optional[Random] = None  # shuffles the root moves of Lazy SMP helpers
+        self.depth_limit = max_depth  # depth of the current search
+        self.completed_depth = 0  # depth of the last completed iteration
+        self._deadline: Optional[float] = None
+        self._nodes = 0
+        # Search statistics of the current move, see search_stats.SearchStats
+        self._searches = self._leaves = self._tt_probes = self._tt_hits = self._tt_cutoffs = 0
+        self._cutoffs = Counter()  # beta cutoffs by index of the move that caused them
+        self._max_ply = 0
+        self._pv = []  # principal variation of the previous iteration, searched first
+        self._pv_table = {}  # principal variation found below each ply of the current search
+        self.principal_variation = []  # moves expected from the root of the last completed search
 
     def play_move(self, board):
         assert not board.is_terminal()
-        move = self.minimax_search(board)
+        if self.shared:
+            self.start_helpers()  # in case start_game() was not called
+        if self._ponder is not None:
+            self._ponder.stop(self)
+        start, start_cpu, start_nodes = perf_counter_ns(), process_time(), self._nodes
+        self._searches = self._leaves = self._tt_probes = self._tt_hits = self._tt_cutoffs = self._max_ply = 0
+        self._cutoffs.clear()
+        self.principal_variation = []
+        move = self.book_move(board)
+        if move is None:
+            if self.parallel:
+                move = self.parallel_search(board)
+            elif self.time_budget is None:
+                move = self.minimax_search(board)
+            else:
+                move = self.iterative_deepening(board, self.time_budget)
+        elapsed = perf_counter_ns() - start
+        self.report_stats(self.move_stats(elapsed / 1e9, process_time() - start_cpu, self._nodes - start_nodes))
+        self.record_latency(elapsed)
         ((x, y), (i, j)) = move
         board.play(board.turn, (x, y), (i, j))
+        if self._ponder is not None and not board.is_terminal():
+            self.start_pondering(board, move)
+
+    def move_stats(self, wall_time: float, cpu_time: float, nodes: int) -> SearchStats:
+        """
+        :return: The statistics of the searches since the start of the move
+        """
+        cutoffs = [self._cutoffs[i] for i in range(max(self._cutoffs, default=-1) + 1)]
+        return SearchStats(1, self._searches, nodes, self._leaves, nodes - self._leaves - self._tt_cutoffs,
+                           cutoffs, self._tt_probes, self._tt_hits, self._max_ply, wall_time, cpu_time)
+
+    @property
+    def parallel(self) -> bool:
+        return self.workers is not None and self.workers > 1
+
+    @property
+    def shared(self) -> bool:
+        """
+        Whether the agent searches with helper processes, and so uses a shared transposition table
+        """
+        return self.parallel or self.ponder is not None
+
+    def start_game(self, board, piece):
+        super().start_game(board, piece)
+        if self.shared:
+            self.start_helpers()
+
+    def end_game(self):
+        super().end_game()
+        if self._ponder is not None:
+            self._ponder.stop(self)
+            self._ponder.shutdown()
+            self._ponder = None
+        if self._smp is not None:
+            self._smp.shutdown()
+            self._smp = None
+        if isinstance(self.transposition_table, SharedTranspositionTable):
+            self.transposition_table.unlink()
+            self.transposition_table = None
+        elif self.transposition_table is not None:
+            self.transposition_table.clear()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['_smp'] = state['_ponder'] = None  # the helper processes belong to this process
+        return state
+
+    def start_helpers(self) -> None:
+        """
+        Creates the shared transposition table and starts the Lazy SMP and pondering helper processes, if not
+        running yet.
+        """
+        if self.transposition_table is None:
+            self.transposition_table = SharedTranspositionTable(self.tt_size or 1 << 20)
+        if self.parallel and self._smp is None:
+            self._smp = LazySMP(self, self.workers)
+        if self.ponder is not None and self._ponder is None:
+            self._ponder = Ponder(self)
+
+    def start_pondering(self, board: Board, move: tuple[tuple[int, int], tuple[int, int]]) -> None:
+        """
+        Starts the pondering search after the agent played :move on :board.
+        """
+        piece = -board.turn  # the agent just moved
+        pv = self.principal_variation
+        if self.ponder == PONDER_PREDICTED and len(pv) > 1 and pv[0] == move and pv[1] in board.get_legal_moves():
+            token = board.make_move(board.turn, *pv[1])
+            try:
+                if not board.is_terminal():
+                    self._ponder.start(self, board, piece)
+                    return
+            finally:
+                board.undo(token)
+        self._ponder.start(self, board, piece)
+
+    def parallel_search(self, board: Board) -> tuple[tuple[int, int], tuple[int, int]]:
+        """
+        Searches with self.workers processes, see agent.search.LazySMP.
+        @return: The best move of the deepest search that completed
+        """
+        self.start_helpers()
+        self.completed_depth, value, move = self._smp.search(self, board, self.time_budget)
+        return move
+
+    def smp_search(self, board: Board, index: int, time_budget: Optional[float]) -> tuple[
+            int, float, Optional[tuple[tuple[int, int], tuple[int, int]]]]:
+        """
+        The part of a Lazy SMP search run by the process with the given index, also used for pondering.
+        Process 0 searches like iterative_deepening(). Helpers (index > 0) start one ply deeper on odd indices,
+        shuffle the root moves and may be stopped before completing any iteration. Every process stops when the
+        table's stop flag is set and sets it when done, so the first process to finish stops the others.
+        @return: The completed depth (0 if none), value and best move
+        """
+        deadline = None if time_budget is None else perf_counter() + time_budget
+        self._root_order = Random(index) if index else None
+        self._stop_on_flag = True
+        try:
+            return self.deepen(board, deadline, 1 + index % 2, complete_first=index == 0)
+        finally:
+            self._root_order = None
+            self._stop_on_flag = False
+            self.transposition_table.request_stop()
+
+    def ponder_search(self, board: Board, piece: int) -> tuple[
+            int, float, Optional[tuple[tuple[int, int], tuple[int, int]]]]:
+        """
+        The search run by the pondering helper process, see agent.search.Ponder. A position with the opponent to
+        move is searched one ply deeper, so the positions after each reply are searched to max_depth.
+        @param piece: The agent's piece
+        @return: The completed depth (0 if none), value and best move
+        """
+        max_depth = self.max_depth
+        if board.turn != piece:
+            self.max_depth += 1
+        try:
+            return self.smp_search(board, 0, None)
+        finally:
+            self.max_depth = max_depth
 
     def minimax_search(self, board: Board) -> tuple[int, int]:
-        if board.turn == 1:
-            value, move = self.max_value(board)
-        else:
-            value, move = self.min_value(board)
+        value, move = self.search(board, self.max_depth)
         return move
 
-    def max_value(self, board: Board, alpha=-float('inf'), beta=float('inf'), depth=0) -> tuple[
+    def search(self, board: Board, depth_limit) -> tuple[
+        float, Optional[tuple[tuple[int, int], tuple[int, int]]]]:
+        """
+        Runs one alpha-beta search from the root to :depth_limit plies.
+        @return: The value of the position and the best move
+        """
+        self.depth_limit = depth_limit
+        self._pv_table = {}
+        self._searches += 1
+        try:
+            value, move = self.max_value(board, on_pv=True) if board.turn == 1 else self.min_value(board, on_pv=True)
+        finally:
+            self._max_ply = max(self._max_ply, max(self._pv_table, default=0))
+        self.principal_variation = self._pv_table.get(0, [])
+        return value, move
+
+    def iterative_deepening(self, board: Board, time_budget: float) -> tuple[tuple[int, int], tuple[int, int]]:
+        """
+        Searches to depth 1, 2, 3, ... until :time_budget seconds have passed, a win or loss is proven or
+        max_depth is reached. Each iteration searches the principal variation of the previous one first.
+        The first iteration always completes so there is always a move to play.
+        @return: The best move of the deepest completed iteration
+        """
+        self.completed_depth, value, move = self.deepen(board, perf_counter() + time_budget)
+        return move
+
+    def deepen(self, board: Board, deadline: Optional[float], first_depth: int = 1,
+               complete_first: bool = True) -> tuple[int, float, Optional[tuple[tuple[int, int], tuple[int, int]]]]:
+        """
+        The iterative deepening loop of iterative_deepening() and smp_search().
+        @param deadline: perf_counter() time to stop at, None to search up to max_depth
+        @param first_depth: Depth of the first iteration
+        @param complete_first: Whether the first iteration ignores the deadline
+        @return: The completed depth (0 if none), value and best move of the deepest completed iteration
+        """
+        best = (0, 0, None)
+        self._pv = []
+        depth = first_depth
+        while depth <= min(self.max_depth, board.n ** 4):
+            self._deadline = deadline if best[2] is not None or not complete_first else None
+            try:
+                value, move = self.search(board, depth)
+            except SearchTimeout:
+                break
+            finally:
+                self._deadline = None
+            best = (depth, value, move)
+            self._pv = self._pv_table.get(0, [])
+            if value in (1, -1) or (deadline is not None and perf_counter() >= deadline):
+                break  # leaves past the depth limit score 0, so +1 or -1 is a proven result
+            depth += 1
+        self._pv = []
+        return best
+
+    def probe(self, board: Board, depth: int, alpha: float, beta: float, moves: list) -> tuple[
+        int, Optional[tuple[float, Optional[tuple[tuple[int, int], tuple[int, int]]]]]]:
+        """
+        Looks the position up in the transposition table and moves the stored best move to the front of :moves.
+        @return: The position key and, if the stored result decides this node, the (value, move) to return
+        """
+        key = board.zobrist_hash
+        entry = self.transposition_table.probe(key)
+        self._tt_probes += 1
+        if entry is None:
+            return key, None
+        self._tt_hits += 1
+        _, entry_depth, score, bound, move = entry
+        if entry_depth >= self.depth_limit - depth:
+            if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                self._tt_cutoffs += 1
+                return key, (score, move)
+        order_first(moves, move)
+        return key, None
+
+    def _enter_node(self, depth: int) -> None:
+        self._pv_table[depth] = []
+        self._nodes += 1
+        if self._nodes % DEADLINE_CHECK_INTERVAL == 0:
+            if self._deadline is not None and perf_counter() > self._deadline:
+                raise SearchTimeout()
+            if self._stop_on_flag and self.transposition_table.stop_requested:
+                raise SearchTimeout()
+
+    def max_value(self, board: Board, alpha=-float('inf'), beta=float('inf'), depth=0, on_pv: bool = False) -> tuple[
         float, Optional[tuple[tuple[int, int], tuple[int, int]]]]:
+        """
+        @param on_pv: Whether the node is on the principal variation of the previous iteration, whose move is then
+        searched first. Only the root and the first child of a node on it are.
+        """
+        self._enter_node(depth)
         if board.is_terminal():
+            self._leaves += 1
             return board.winner, None
-        if depth >= self.max_depth:
+        if depth >= self.depth_limit:
+            self._leaves += 1
             return 0, sample(board.get_legal_moves(), 1)[0]
+        table = self.transposition_table
+        # Moves are only put in a list when they get reordered, otherwise a cutoff stops generating them
+        pv_move = self._pv[depth] if on_pv and depth < len(self._pv) else None
+        moves = board.get_legal_moves() if table is not None or pv_move is not None else board.iter_legal_moves()
+        if depth == 0 and self._root_order is not None:
+            self._root_order.shuffle(moves)
+        if table is not None:
+            key, result = self.probe(board, depth, alpha, beta, moves)
+            if result is not None:
+                return result
+            original_alpha = alpha
+        if pv_move is not None:
+            order_first(moves, pv_move)
         v, move = -float('inf'), None
-        for (x, y), (i, j) in board.get_legal_moves():
-            board_copy = deepcopy(board)
-            board_copy.play(1, (x, y), (i, j))
-            v2, a2 = self.min_value(board_copy, alpha, beta, depth + 1)
+        for index, ((x, y), (i, j)) in enumerate(moves):
+            token = board.make_move(1, (x, y), (i, j))
+            try:
+                v2, a2 = self.min_value(board, alpha, beta, depth + 1, pv_move == ((x, y), (i, j)))
+            finally:
+                board.undo(token)
             if v2 > v:
                 v, move = v2, ((x, y), (i, j))
                 alpha = max(alpha, v)
+                self._pv_table[depth] = [move] + self._pv_table.get(depth + 1, [])
             if v >= beta:
+                self._cutoffs[index] += 1
+                if table is not None:
+                    table.store(key, self.depth_limit - depth, v, LOWER, move)
                 return v, move
+        if table is not None:
+            table.store(key, self.depth_limit - depth, v, UPPER if v <= original_alpha else EXACT, move)
         return v, move
 
-    def min_value(self, board: Board, alpha=-float('inf'), beta=float('inf'), depth=0) -> tuple[
+    def min_value(self, board: Board, alpha=-float('inf'), beta=float('inf'), depth=0, on_pv: bool = False) -> tuple[
         float, Optional[tuple[tuple[int, int], tuple[int, int]]]]:
+        """
+        @param on_pv: Whether the node is on the principal variation of the previous iteration, whose move is then
+        searched first. Only the root and the first child of a node on it are.
+        """
+        self._enter_node(depth)
         if board.is_terminal():
+            self._leaves += 1
             return board.winner, None
-        if depth >= self.max_depth:
+        if depth >= self.depth_limit:
+            self._leaves += 1
             return 0, sample(board.get_legal_moves(), 1)[0]
+        table = self.transposition_table
+        # Moves are only put in a list when they get reordered, otherwise a cutoff stops generating them
+        pv_move = self._pv[depth] if on_pv and depth < len(self._pv) else None
+        moves = board.get_legal_moves() if table is not None or pv_move is not None else board.iter_legal_moves()
+        if depth == 0 and self._root_order is not None:
+            self._root_order.shuffle(moves)
+        if table is not None:
+            key, result = self.probe(board, depth, alpha, beta, moves)
+            if result is not None:
+                return result
+            original_beta = beta
+        if pv_move is not None:
+            order_first(moves, pv_move)
         v, move = float('inf'), None
-        for (x, y), (i, j) in board.get_legal_moves():
-            board_copy = deepcopy(board)
-            board_copy.play(-1, (x, y), (i, j))
-            v2, a2 = self.max_value(board_copy, alpha, beta, depth + 1)
+        for index, ((x, y), (i, j)) in enumerate(moves):
+            token = board.make_move(-1, (x, y), (i, j))
+            try:
+                v2, a2 = self.max_value(board, alpha, beta, depth + 1, pv_move == ((x, y), (i, j)))
+            finally:
+                board.undo(token)
             if v2 < v:
                 v, move = v2, ((x, y), (i, j))
                 beta = min(beta, v)
+                self._pv_table[depth] = [move] + self._pv_table.get(depth + 1, [])
             if v <= alpha:
+                self._cutoffs[index] += 1
+                if table is not None:
+                    table.store(key, self.depth_limit - depth, v, UPPER, move)
                 return v, move
+        if table is not None:
+            table.store(key, self.depth_limit - depth, v, LOWER if v >= original_beta else EXACT, move)
         return v, move
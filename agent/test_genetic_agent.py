@@ -0,0 +1,28 @@
+import random
+import unittest
+
+from agent.genetic_agent import GeneticAgent, ALL_STATES
+
+
+class TestGeneticAgentTables(unittest.TestCase):
+    def test_tables_match_evaluation(self):
+        rng = random.Random(6)
+        states = rng.sample(range(len(ALL_STATES)), 300) + [0, len(ALL_STATES) - 1]
+        for piece in (1, -1):
+            agent = GeneticAgent('test', [rng.uniform(-1, 1) for _ in range(9)])
+            agent.current_piece = piece
+            agent.set_opponent_piece(piece)
+            agent.build_tables()
+            for state in states:
+                cells = [int(cell) for cell in ALL_STATES[state]]
+                for winner in (-1, 0, 1):
+                    self.assertAlmostEqual(agent._board_table[state, winner + 1],
+                                           agent.evaluate_board(list(cells), winner))
+                for square in range(9):
+                    for index, player_piece in enumerate((1, -1)):
+                        self.assertAlmostEqual(agent._position_table[state, square, index],
+                                               agent.eval_pos(list(cells), square, player_piece))
+
+
+if __name__ == '__main__':
+    unittest.main()
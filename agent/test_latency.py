@@ -0,0 +1,68 @@
+import pickle
+import random
+import unittest
+
+from agent.latency import LatencyHistogram, bucket_of, bucket_limit, MAX_VALUE, NUM_BUCKETS, SIGNIFICANT_BITS
+
+
+class TestBuckets(unittest.TestCase):
+    def test_small_values_are_exact(self):
+        for value in range(1 << SIGNIFICANT_BITS):
+            self.assertEqual(bucket_limit(bucket_of(value)), value)
+
+    def test_limits(self):
+        # every bucket holds the values from just above the limit of the previous one to its own limit
+        previous = -1
+        for index in range(NUM_BUCKETS):
+            limit = bucket_limit(index)
+            self.assertGreater(limit, previous)
+            self.assertEqual(bucket_of(previous + 1), index)
+            self.assertEqual(bucket_of(limit), index)
+            self.assertLessEqual(limit - previous - 1, limit / 100)
+            previous = limit
+        self.assertEqual(previous, MAX_VALUE)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(22)
+        # from microseconds to minutes
+        self.times = [int(10 ** rng.uniform(3, 11)) for _ in range(5000)]
+        self.histogram = LatencyHistogram()
+        for value in self.times:
+            self.histogram.record(value)
+
+    def test_percentiles(self):
+        times = sorted(self.times)
+        for percent in (1, 10, 50, 90, 99, 99.9, 100):
+            actual = times[int(max(1, -(-len(times) * percent // 100))) - 1]
+            self.assertAlmostEqual(self.histogram.percentile(percent), actual, delta=actual / 100)
+        self.assertEqual(self.histogram.percentile(100), max(self.times))
+        self.assertAlmostEqual(self.histogram.percentile(0), min(self.times), delta=min(self.times) / 100)
+        self.assertEqual((self.histogram.count, self.histogram.total), (len(self.times), sum(self.times)))
+        self.assertEqual(LatencyHistogram().percentile(50), 0)
+
+    def test_out_of_range(self):
+        self.histogram.record(MAX_VALUE * 2)
+        self.assertEqual(self.histogram.percentile(100), MAX_VALUE * 2)
+        self.assertEqual(self.histogram.counts[-1], 1)
+
+    def test_merge(self):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        for i, value in enumerate(self.times):
+            (first if i % 3 else second).record(value)
+        first.merge(second)
+        first.merge(LatencyHistogram())
+        self.assertEqual(first.__dict__, self.histogram.__dict__)
+        empty = LatencyHistogram()
+        empty.merge(second)
+        self.assertEqual((empty.min, empty.max, empty.count), (second.min, second.max, second.count))
+
+    def test_pickle(self):
+        copy = pickle.loads(pickle.dumps(self.histogram))
+        self.assertEqual(copy.__dict__, self.histogram.__dict__)
+        self.assertEqual(copy.summary(), self.histogram.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
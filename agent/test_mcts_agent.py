@@ -0,0 +1,147 @@
+import random
+import time
+import unittest
+
+from agent.search import PONDER_ALL
+from agent.mcts_agent import MCTSAgent, Node, RootParallelMCTS, _GameSync, _follow_moves
+from game.board import Board
+from game.moves import encode_move
+
+
+class TestTreeReuse(unittest.TestCase):
+    def setUp(self):
+        random.seed(8)
+        self.board = Board()
+        self.agent = MCTSAgent(iterations=300)
+        self.agent.start_game(self.board, self.board.turn)
+
+    def tearDown(self):
+        self.agent.end_game()
+
+    def test_reply_keeps_subtree(self):
+        self.agent.play_move(self.board)
+        played = self.agent.root
+        self.assertIsNone(played.parent)
+        self.assertEqual(played.move, self.board.last_move)
+        self.assertEqual(self.agent.tree_size, played.size())
+        reply = max(played.children, key=lambda c: c.visits)
+        size, visits = reply.size(), reply.visits
+        self.board.play(self.board.turn, *reply.move)
+
+        root = self.agent.find_root(self.board)
+        self.assertIs(root, reply)
+        self.assertIsNone(root.parent)
+        self.assertEqual((root.size(), root.visits), (size, visits))
+        self.assertEqual(self.agent.tree_size, size)
+
+    def test_unsearched_reply_starts_new_tree(self):
+        self.agent.iterations = 20  # fewer than the first moves, so the move played has no children yet
+        self.agent.play_move(self.board)
+        searched = {child.move for child in self.agent.root.children}
+        reply = next(move for move in self.board.get_legal_moves() if move not in searched)
+        self.board.play(self.board.turn, *reply)
+
+        root = self.agent.find_root(self.board)
+        self.assertEqual((root.visits, root.children, self.agent.tree_size), (0, [], 1))
+        self.assertEqual(root.key, self.board.zobrist_hash)
+
+    def test_follow(self):
+        self.agent.play_move(self.board)
+        child = self.agent.root.children[0]
+        token = self.board.make_move(self.board.turn, *child.move)
+        key = self.board.zobrist_hash
+        self.board.undo(token)
+        self.agent.follow(child.move, key)
+        self.assertIs(self.agent.root, child)
+        self.agent.follow(child.move, key)  # not a move of the new root
+        self.assertIsNone(self.agent.root)
+        self.assertEqual(self.agent.tree_size, 0)
+
+
+class FakeHelper:
+    """
+    Stands in for the connection to a helper process, answering a search with a fixed result.
+    """
+
+    def __init__(self, result):
+        self.result = result
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def recv(self):
+        return self.result
+
+
+class TestRootParallel(unittest.TestCase):
+    def test_visits_are_added_up(self):
+        board = Board()
+        first, second, third = board.get_legal_moves()[:3]
+        root = Node(None, None, -board.turn, board.zobrist_hash, [])
+        for move, visits, wins in ((first, 10, 6.0), (second, 6, 4.0)):
+            child = Node(move, root, board.turn, 0, [])
+            child.visits, child.wins = visits, wins
+            root.children.append(child)
+        search = RootParallelMCTS(MCTSAgent(), board, 1)
+        search.connections = [
+            FakeHelper((30, 4, [(encode_move(board.n, second), 3, 2.0), (encode_move(board.n, first), 1, 0.0)])),
+            FakeHelper((20, 6, [(encode_move(board.n, second), 2, 1.0), (encode_move(board.n, third), 4, 3.0)])),
+            FakeHelper(None),  # out of sync: skipped and sent the board
+        ]
+        # first: 10 + 1 = 11 visits, second: 6 + 3 + 2 = 11 visits and more wins, third: 4 visits
+        self.assertEqual(search.collect(board, root), (second, 50, 6))
+        self.assertEqual(search.connections[2].sent, [('reset', board.to_bytes())])
+
+    def test_helpers_search(self):
+        random.seed(16)
+        board = Board()
+        agent = MCTSAgent(iterations=40, workers=2)
+        try:
+            for _ in range(3):  # the helper is started by the first move and follows the game after
+                agent.play_move(board)
+                self.assertEqual(agent.last_move_stats['iterations'], 80)
+                board.play(board.turn, *random.choice(board.get_legal_moves()))
+        finally:
+            agent.end_game()
+
+
+class TestPonder(unittest.TestCase):
+    def test_started_by_first_move(self):
+        random.seed(17)
+        board = Board()
+        agent = MCTSAgent(iterations=40, ponder=PONDER_ALL)  # start_game() is not called
+        try:
+            agent.play_move(board)
+            self.assertTrue(agent._ponder.pondering)
+            board.play(board.turn, *random.choice(board.get_legal_moves()))
+            time.sleep(0.2)
+            pondered = agent._ponder.stop(board)
+            self.assertEqual(pondered.key, board.zobrist_hash)
+            self.assertGreater(pondered.visits, 0)
+        finally:
+            agent.end_game()
+        self.assertIsNone(agent._ponder)
+
+
+class TestGameSync(unittest.TestCase):
+    def test_sends_moves_since_last_search(self):
+        rng = random.Random(16)
+        board = Board()
+        helper = Board.from_bytes(board.to_bytes())
+        sync = _GameSync(board)
+        agent = MCTSAgent()
+        for _ in range(4):
+            board.play(board.turn, *rng.choice(board.get_legal_moves()))  # the agent's move
+            sync.note(board)
+            sync.note(board)  # noting the same move twice records it once
+            board.play(board.turn, *rng.choice(board.get_legal_moves()))  # the opponent's reply
+            moves = sync.take(board)
+            self.assertEqual(len(moves), 2)
+            self.assertTrue(_follow_moves(agent, helper, moves, board.zobrist_hash))
+        self.assertEqual(sync.take(board), b'')
+        self.assertFalse(_follow_moves(agent, helper, b'', board.zobrist_hash ^ 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+from agent.opening_book import OpeningBook, write_book, build_book, HEADER, MAGIC, VERSION
+from agent.random_agent import RandomAgent
+from game.board import Board
+from game.symmetry import TRANSFORMS, canonical_form, transform_move
+
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'book.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open_book(self) -> OpeningBook:
+        book = OpeningBook(self.path)
+        self.addCleanup(book.close)
+        return book
+
+    def test_round_trip(self):
+        random.seed(13)
+        entries = build_book(RandomAgent(), 2)
+        write_book(self.path, 3, entries)
+        book = self.open_book()
+        self.assertEqual((book.n, len(book)), (3, len(entries)))
+        for key, move in entries.items():
+            self.assertEqual(book.probe(key), move)
+        self.assertIsNone(book.probe(max(entries) + 1))
+        self.assertIsNone(book.probe(min(entries) - 1))
+        copy = pickle.loads(pickle.dumps(book))
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.probe(min(entries)), entries[min(entries)])
+
+    def test_symmetric_positions(self):
+        rng = random.Random(13)
+        boards = [Board() for _ in TRANSFORMS]
+        for _ in range(5):
+            move = rng.choice(boards[0].get_legal_moves())
+            for t, board in enumerate(boards):
+                board.play(board.turn, *transform_move(move, t))
+        move = rng.choice(boards[0].get_legal_moves())
+        key, transform = canonical_form(boards[0])
+        write_book(self.path, 3, {key: transform_move(move, transform)})
+        book = self.open_book()
+        for t, board in enumerate(boards):
+            self.assertEqual(book.get_move(board), transform_move(move, t))
+        self.assertIsNone(book.get_move(Board()))
+
+    def test_bad_files(self):
+        write_book(self.path, 3, {1: ((0, 0), (1, 1)), 2: ((2, 2), (0, 1))})
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for name, content in (('truncated', data[:-1]), ('header only', data[:HEADER.size - 1]),
+                              ('wrong version', HEADER.pack(MAGIC, VERSION + 1, 3, 2) + data[HEADER.size:]),
+                              ('wrong magic', b'NOTABOOK' + data[8:])):
+            with self.subTest(name):
+                with open(self.path, 'wb') as f:
+                    f.write(content)
+                with self.assertRaises(ValueError):
+                    OpeningBook(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from agent.search import PONDER_PREDICTED, PONDER_ALL
+from agent.simple_minimax_agent import SimpleMinimaxAgent
+from game.board import Board
+
+
+class TestPonder(unittest.TestCase):
+    def ponder_depth(self, mode: str) -> int:
+        # start_game() is not called, so the agent does not know its piece when the helper process is started
+        agent = SimpleMinimaxAgent(max_depth=2, ponder=mode)
+        try:
+            agent.play_move(Board())
+            self.assertEqual(len(agent.principal_variation), 2)
+            agent._ponder.future.result()  # a search to max_depth ends by itself
+            return agent._ponder.stop(agent)[0]
+        finally:
+            agent.end_game()
+
+    def test_predicted_reply(self):
+        # the reply is already played, so the agent's next position is searched to max_depth
+        self.assertEqual(self.ponder_depth(PONDER_PREDICTED), 2)
+
+    def test_all_replies(self):
+        # the opponent is to move, one more ply searches the position after each reply to max_depth
+        self.assertEqual(self.ponder_depth(PONDER_ALL), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from agent.search_stats import SearchStats
+
+
+class TestSearchStats(unittest.TestCase):
+    def test_merge(self):
+        stats = SearchStats(1, 2, 100, 60, 40, [10, 2], 50, 20, 4, 0.5, 0.25)
+        stats.merge(SearchStats(2, 3, 200, 150, 60, [20, 4, 1], 30, 10, 6, 1.0, 0.75))
+        self.assertEqual(stats.as_dict(), SearchStats(3, 5, 300, 210, 100, [30, 6, 1], 80, 30, 6, 1.5, 1.0).as_dict())
+        stats.merge(SearchStats(1, 1, 10, 5, 5, [3], max_depth=2))  # fewer cutoff indices, shallower
+        self.assertEqual(stats.cutoffs, [33, 6, 1])
+        self.assertEqual(stats.max_depth, 6)
+
+    def test_merge_into_empty(self):
+        other = SearchStats(1, 1, 10, 6, 4, [3, 1], 5, 2, 3, 0.1, 0.1)
+        stats = SearchStats()
+        stats.merge(other)
+        self.assertEqual(stats.as_dict(), other.as_dict())
+        stats.merge(other)
+        self.assertEqual(other.cutoffs, [3, 1])  # the merged record is not changed
+
+    def test_summary(self):
+        summary = SearchStats(4, 8, 1000, 600, 248, [30, 10], 200, 50, 7, 2.0, 1.0).summary()
+        self.assertEqual(summary, {
+            'moves': 4,
+            'nodes_per_move': 250,
+            'leaf_evals_per_move': 150,
+            'nodes_per_second': 500,
+            'branching_factor': 4,  # (1000 nodes - 8 roots) / 248 expanded
+            'first_move_cutoff_rate': 0.75,
+            'tt_hit_rate': 0.25,
+            'max_depth': 7,
+            'wall_ms_per_move': 500,
+            'cpu_ms_per_move': 250,
+        })
+
+    def test_empty_summary(self):
+        summary = SearchStats().summary()
+        self.assertEqual(summary['moves'], 0)
+        self.assertTrue(all(value == 0 for value in summary.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
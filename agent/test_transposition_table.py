@@ -0,0 +1,131 @@
+import pickle
+import random
+import unittest
+
+from agent.genetic_agent import GeneticAgent
+from agent.shared_transposition_table import SharedTranspositionTable
+from agent.simple_minimax_agent import SimpleMinimaxAgent
+from agent.transposition_table import TranspositionTable, EXACT, LOWER, UPPER
+from game.board import Board
+
+
+def random_position(rng: random.Random, plies: int) -> Board:
+    board = Board()
+    for _ in range(plies):
+        if board.is_terminal():
+            break
+        board.play(board.turn, *rng.choice(board.get_legal_moves()))
+    return board
+
+
+class TestTranspositionTable(unittest.TestCase):
+    table_type = TranspositionTable
+
+    def make_table(self, max_entries):
+        return self.table_type(max_entries)
+
+    def check_replacement(self, table):
+        n = table.num_buckets
+        a, b, c = 5, 5 + n, 5 + 2 * n  # three positions of the same bucket
+        move = ((0, 0), (1, 1))
+        table.store(a, 3, 0.5, EXACT, move)
+        table.store(b, 1, -0.5, LOWER, None)  # shallower: goes to the always-replace slot
+        self.assertEqual(table.probe(a), (a, 3, 0.5, EXACT, move))
+        self.assertEqual(table.probe(b), (b, 1, -0.5, LOWER, None))
+        table.store(c, 5, 1, UPPER, move)  # deeper: takes the depth-preferred slot, a becomes the recent one
+        self.assertEqual(table.probe(c)[1], 5)
+        self.assertEqual(table.probe(a)[1], 3)
+        self.assertIsNone(table.probe(b))
+        table.store(b, 2, 0, EXACT, None)  # shallower than c: replaces the recent slot whatever its depth
+        self.assertIsNone(table.probe(a))
+        self.assertEqual(table.probe(b)[1], 2)
+        table.store(c, 1, 0, EXACT, None)  # the same position replaces its own entry even when shallower
+        self.assertEqual(table.probe(c)[1], 1)
+        self.assertEqual(len(table), 2)
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertIsNone(table.probe(c))
+
+    def check_size(self, table, max_entries):
+        rng = random.Random(1)
+        for _ in range(200):
+            table.store(rng.getrandbits(64), rng.randrange(10), 0, EXACT, None)
+            self.assertLessEqual(len(table), max_entries)
+        self.assertEqual(len(table), max_entries)
+
+    def test_replacement(self):
+        self.check_replacement(self.make_table(16))
+
+    def test_size(self):
+        self.check_size(self.make_table(8), 8)
+
+
+class TestSharedTranspositionTable(TestTranspositionTable):
+    table_type = SharedTranspositionTable
+
+    def make_table(self, max_entries):
+        table = self.table_type(max_entries)
+        self.addCleanup(table.unlink)
+        return table
+
+    def test_torn_slot(self):
+        table = self.make_table(16)
+        key = 3
+        table.store(key, 2, 0.25, EXACT, ((1, 1), (0, 2)))
+        self.assertEqual(table.probe(key), (key, 2, 0.25, EXACT, ((1, 1), (0, 2))))
+        i = 1 + 6 * (key % table.num_buckets)
+        table._scores[i + 2] = 0.5  # another process wrote the score but not yet the rest of the slot
+        self.assertIsNone(table.probe(key))
+        table.store(key, 2, 0.5, EXACT, None)
+        table._words[i + 1] ^= 1 << 10  # and its move
+        self.assertIsNone(table.probe(key))
+
+    def test_stop_flag(self):
+        table = self.make_table(16)
+        other = pickle.loads(pickle.dumps(table))  # attached to the same memory, as in a helper process
+        self.addCleanup(other.close)
+        self.assertFalse(other.stop_requested)
+        table.store(0, 1, 0, EXACT, None)
+        self.assertFalse(other.stop_requested)
+        table.request_stop()
+        self.assertTrue(other.stop_requested)
+        self.assertIsNotNone(other.probe(0))  # the flag is not a slot
+        other.reset_stop()
+        self.assertFalse(table.stop_requested)
+        table.request_stop()
+        other.clear()
+        self.assertFalse(table.stop_requested)
+        self.assertEqual(len(table), 0)
+
+
+class TestSearchWithTable(unittest.TestCase):
+    def test_simple_minimax(self):
+        # at a fixed depth the table only saves work, the search finds the same value and root move
+        rng = random.Random(2)
+        for _ in range(30):
+            board = random_position(rng, rng.randrange(40))
+            if board.is_terminal():
+                continue
+            plain = SimpleMinimaxAgent(max_depth=4)
+            cached = SimpleMinimaxAgent(max_depth=4, tt_size=1 << 14)
+            self.assertEqual(cached.search(board, 4), plain.search(board, 4))
+            self.assertGreater(cached._tt_probes, 0)
+
+    def test_genetic(self):
+        rng = random.Random(3)
+        traits = [rng.uniform(0, 1) for _ in range(9)]
+        for _ in range(20):
+            board = random_position(rng, rng.randrange(40))
+            if board.is_terminal():
+                continue
+            results = []
+            for agent in (GeneticAgent('plain', traits), GeneticAgent('cached', traits, tt_size=1 << 14)):
+                agent.current_piece = board.turn
+                agent.set_opponent_piece(board.turn)
+                results.append(agent.search(board, 0, 3))
+            self.assertEqual(results[1], results[0])
+            self.assertGreater(agent._tt_probes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+from typing import Optional, Tuple, List
+
+# Bound types of a stored score
+EXACT = 0  # the score is the value of the position
+LOWER = 1  # the search failed high, the value is at least the score
+UPPER = 2  # the search failed low, the value is at most the score
+
+# (key, depth, score, bound, best move)
+Entry = Tuple[int, float, float, int, Optional[Tuple[Tuple[int, int], Tuple[int, int]]]]
+
+
+class TranspositionTable:
+    """
+    A fixed size table of search results keyed by Board.zobrist_hash.
+    Keys are mapped to buckets of two slots:
+    <ul>
+    <li> a depth-preferred slot that keeps the deepest search seen for the bucket </li>
+    <li> an always-replace slot that keeps the most recent shallower search </li>
+    </ul>
+    so deep results survive a flood of shallow ones while recent positions still get cached.
+    The table never holds more than max_entries entries.
+    """
+
+    def __init__(self, max_entries: int = 1 << 20):
+        self.num_buckets: int = max(1, max_entries // 2)
+        self.deep: List[Optional[Entry]] = [None] * self.num_buckets
+        self.recent: List[Optional[Entry]] = [None] * self.num_buckets
+
+    def __getstate__(self):
+        # Copies sent to other processes start empty
+        return {'num_buckets': self.num_buckets}
+
+    def __setstate__(self, state):
+        self.num_buckets = state['num_buckets']
+        self.clear()
+
+    def __len__(self):
+        return sum(entry is not None for entry in self.deep) + sum(entry is not None for entry in self.recent)
+
+    def probe(self, key: int) -> Optional[Entry]:
+        """
+        :param key: Zobrist hash of the position
+        :return: The stored (key, depth, score, bound, move) entry for the position or None
+        """
+        i = key % self.num_buckets
+        entry = self.deep[i]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self.recent[i]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key: int, depth: float, score: float, bound: int,
+              move: Optional[Tuple[Tuple[int, int], Tuple[int, int]]]) -> None:
+        """
+        Stores a search result.
+        :param key: Zobrist hash of the position
+        :param depth: Remaining depth the position was searched to
+        :param score: Score found by the search
+        :param bound: EXACT, LOWER or UPPER
+        :param move: Best move found, used to order moves when the position is searched again
+        """
+        i = key % self.num_buckets
+        entry = (key, depth, score, bound, move)
+        deep = self.deep[i]
+        if deep is None or deep[0] == key or depth >= deep[1]:
+            if deep is not None and deep[0] != key:
+                self.recent[i] = deep  # the replaced entry is still the most recent one for the bucket
+            elif self.recent[i] is not None and self.recent[i][0] == key:
+                self.recent[i] = None  # do not keep a stale copy of the position
+            self.deep[i] = entry
+        else:
+            self.recent[i] = entry
+
+    def clear(self) -> None:
+        """
+        Removes all the entries.
+        """
+        self.deep = [None] * self.num_buckets
+        self.recent = [None] * self.num_buckets
@@ -18,6 +18,10 @@ class Board:
         # Keep a track of last move because the next legal move depends on it.
         self.last_move: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
         self.turn: int = 1  # X always starts
+        # Kept up to date by play() and undo() so the status checks do not have to look at every sub-board.
+        self._decided: int = 0  # bit x * n + y is set when sub-board (x, y) is terminal
+        self._open: int = n * n  # number of sub-boards that are not terminal
+        self._filled: int = 0  # number of non-blank cells on the whole board
 
     def get_html(self):
         """
@@ -56,7 +60,7 @@ class Board:
         Checks if the board is full by checking if all the sub-boards are full.
         :return: True if all sub-boards are full
         """
-        return all(x.is_board_full() for x in sum(self.grid, []))
+        return self._filled == self.n ** 4
 
     def play(self, player: int, board_position: Tuple[int, int], sub_board_position: Tuple[int, int]) -> Optional[int]:
         """
@@ -71,7 +75,12 @@ class Board:
         x, y = board_position
         assert self.winner is None  # can not make a move after the game is ended
         assert self.turn == player
-        sub_board_winner = self.grid[x][y].play(player, sub_board_position)
+        sub_board = self.grid[x][y]
+        sub_board_winner = sub_board.play(player, sub_board_position)
+        self._filled += 1
+        if sub_board.is_terminal():
+            self._decided |= 1 << (x * self.n + y)
+            self._open -= 1
         self.last_move = (board_position, sub_board_position)
         self.turn *= -1  # change turns from +1 -> -1 and -1 -> +1
         if sub_board_winner is not None:  # sub-board has a result! check if board has a result.
@@ -82,6 +91,35 @@ class Board:
                 self.winner = 0
                 return 0  # draw
 
+    def make_move(self, player: int, board_position: Tuple[int, int], sub_board_position: Tuple[int, int]) -> Tuple:
+        """
+        Same as play() but returns an undo token instead of the outcome, so that search can walk the game
+        tree on a single board: make_move() a child, search it, then undo(token) to get the parent back.
+
+        :param player: 1 for X, -1 for O
+        :param board_position: Co-ordinates of the main board
+        :param sub_board_position: Co-ordinates of the position in the sub-board for the given main board.
+        :return: Token to pass to undo(). The outcome is available as self.winner.
+        """
+        token = (board_position, sub_board_position, self.last_move)
+        self.play(player, board_position, sub_board_position)
+        return token
+
+    def undo(self, token: Tuple) -> None:
+        """
+        Takes back the move that returned :param token. Moves must be undone in the reverse order they were made.
+        Restores winner, turn, last_move and the sub-board exactly as they were before make_move().
+        """
+        (x, y), sub_board_position, last_move = token
+        self.grid[x][y].undo(sub_board_position)
+        self._filled -= 1
+        if self._decided >> (x * self.n + y) & 1:  # the sub-board was open before the move
+            self._decided &= ~(1 << (x * self.n + y))
+            self._open += 1
+        self.last_move = last_move
+        self.turn *= -1
+        self.winner = None  # moves can only be made while the game is running
+
     def _process_count(self, player: int, position: Tuple[int, int]) -> int:
         i, j = position
         configs = [[(i, j - 1), '←', (i, j + 1), '→'],
@@ -119,7 +157,7 @@ class Board:
                         for x in range(self.n) for y in range(self.n)], [])
 
         (_, _), (x, y) = self.last_move  # get the position in the sub-board for the last move
-        if not self.grid[x][y].is_terminal():
+        if not self._decided >> (x * self.n + y) & 1:
             return [((x, y), (i, j)) for (i, j) in self.grid[x][y].get_legal_moves()]
 
         # If a player is sent to play on a terminal board, then that player may play in any other board.
@@ -131,4 +169,4 @@ class Board:
         Checks if the game has ended by checking if there is a winner if all boards are terminal
         :return: True if the game has ended
         """
-        return self.winner is not None or all([x.is_terminal() for x in sum(self.grid, [])])
\ No newline at end of file
+        return self.winner is not None or self._open == 0
\ No newline at end of file
@@ -3,7 +3,7 @@ from base_agent import Agent
 from simple_minimax_agent import SimpleMinimaxAgent
 #from agent.genetic_agent import GeneticAgent
 #from GeneticProgram.genetic import GeneticProgram
-from board import Board
+from game.board import Board  # the board the genetic agents of the package search on
 
 
 def play(x_player: Agent, o_player: Agent) -> Optional[Agent]:
@@ -8,13 +8,20 @@ from time import time
 from genetic_agent import GeneticAgent
 from compressed_genetic import CompressedGeneticAgent
 from evaluator import evaluate
+from GeneticProgram.checkpoint import check_run, load_checkpoint, save_checkpoint
 from typing import Optional, Tuple, List
 
 
 class GeneticProgram:
 
-    def __init__(self):
+    def __init__(self, checkpoint_path: Optional[str] = None):
+        """
+        @param checkpoint_path: If given, the state of the evolution is saved to this file after every generation
+        and evolution(resume=True) goes on from it, see GeneticProgram.checkpoint
+        """
         self.current_agent_number = 0
+        self.checkpoint_path = checkpoint_path
+        self.generation_metrics: List[dict] = []  # best agent and duration of every generation
 
     def generate_random_agent(self) -> GeneticAgent:
         """
@@ -198,59 +205,90 @@ class GeneticProgram:
 
         return remaining
 
-    def evolution(self, generation_num, agent_num, top_k_num) -> GeneticAgent:
+    def evolution(self, generation_num, agent_num, top_k_num, resume: bool = False) -> Tuple[GeneticAgent, int]:
         """
         Perform evolution over the specified number of generations and return the top agent after evolution
         @param generation_num: The number of generations the evolution process should occur over
         @param agent_num: The number of agents that should be in each generation
         @param top_k_num: The max number of agents from each generation to accept into the parent pool
-        @return: The top genetic agent after evolution has concluded
+        @param resume: Go on from the checkpoint at checkpoint_path, if there is one, instead of starting over. The
+        run must have the same parameters as the one that saved it, and then goes on as that run would have.
+        @return: The top genetic agent after evolution has concluded and the seconds the evolution took
         """
 
-        def evolution_runner(current_pool, generations_left):
+        def evolution_runner(current_pool, first_generation):
             """
-            A recursive function that actually runs the evolution process for the specified
-            number of generations
+            Runs the evolution process from the given generation until the specified number of generations
             @param current_pool: A list of genetic agents that represents the current generation
             of agents
-            @param generations_left: The number of remaining generations before evolutions concludes
+            @param first_generation: The number of generations that are already done
             @return: A list of the final generation of agents
             """
-            print(str(generations_left) + " Evolution generations remaining")
-            if generations_left <= 0:
-                return current_pool
-            winners = self.generation(current_pool, top_k_num)
-            next_gen = self.reproduce(winners)
-
-            for parent in winners:
-                if len(next_gen) >= agent_num:
-                    break
-                if generations_left - 1 > 0:
-                    parent.total_win_score = 0
-                next_gen.append(parent)
-
-            if len(next_gen) < agent_num:
-                for nm in range(len(next_gen), agent_num):
-                    next_gen.append(self.generate_random_agent())
-            elif len(next_gen) > agent_num:
-                next_gen = next_gen[0:agent_num]
-
-            if generations_left - 1 <= 0:
-                return winners
-
-            return evolution_runner(next_gen, generations_left-1)
-
+            for generation in range(first_generation, generation_num):
+                generations_left = generation_num - generation
+                print(str(generations_left) + " Evolution generations remaining")
+                generation_start = time()
+                winners = self.generation(current_pool, top_k_num)
+                self.generation_metrics.append({
+                    'generation': generation,
+                    'best_agent': winners[0].agent_name,
+                    'best_traits': list(winners[0].traits),
+                    'best_score': winners[0].total_win_score,
+                    'seconds': time() - generation_start,
+                })
+                next_gen = self.reproduce(winners)
+
+                for parent in winners:
+                    if len(next_gen) >= agent_num:
+                        break
+                    if generations_left - 1 > 0:
+                        parent.total_win_score = 0
+                    next_gen.append(parent)
+
+                if len(next_gen) < agent_num:
+                    for nm in range(len(next_gen), agent_num):
+                        next_gen.append(self.generate_random_agent())
+                elif len(next_gen) > agent_num:
+                    next_gen = next_gen[0:agent_num]
+
+                # The last generation ends the evolution with its winners
+                current_pool = next_gen if generations_left - 1 > 0 else winners
+                if self.checkpoint_path is not None:
+                    save_checkpoint(self.checkpoint_path, {
+                        'parameters': parameters,
+                        'generation': generation + 1,
+                        'population': current_pool,
+                        'agent_number': self.current_agent_number,
+                        'metrics': self.generation_metrics,
+                        'elapsed': round(time()) - start_time,
+                    })
+            return current_pool
+
+        parameters = {'generation_num': generation_num, 'agent_num': agent_num, 'top_k_num': top_k_num}
         start_time = round(time())
 
-
-        pool = []
-        print("starting evolution")
-        # Generate the initial agent pool
-        for num in range(0, agent_num):
-            pool.append(self.generate_random_agent())
+        state = None
+        if resume and self.checkpoint_path is not None:
+            state = load_checkpoint(self.checkpoint_path)
+        if state is not None:
+            check_run(state, **parameters)
+            pool = state['population']
+            first_generation = state['generation']
+            start_time -= state['elapsed']
+            self.current_agent_number = state['agent_number']
+            self.generation_metrics = state['metrics']
+            print("resuming evolution after generation " + str(first_generation))
+        else:
+            pool = []
+            first_generation = 0
+            self.generation_metrics = []
+            print("starting evolution")
+            # Generate the initial agent pool
+            for num in range(0, agent_num):
+                pool.append(self.generate_random_agent())
 
         # Run for the specified number of generations
-        final_gen = evolution_runner(pool, generation_num)
+        final_gen = evolution_runner(pool, first_generation)
 
         # Perform fitness on final generation
         remaining = self.fitness(final_gen, top_k_num)
@@ -1,5 +1,4 @@
 from time import time
-from copy import deepcopy
 from typing import Optional, Tuple, List
 from base_agent import Agent
 from board import Board
@@ -140,12 +139,12 @@ class GeneticAgent(Agent):
         # move)
         for brd, subs in available:
             # Play piece
-            temp_board = deepcopy(board)
-            temp_board.play(1, brd, subs)
+            token = board.make_move(1, brd, subs)
             sub_index = brd[1] + 3 * brd[0] # Convert the 2D coordinates of the subboard to a 1D index
-            possible_v, global_move, sub_move = self.minimize_value(temp_board, sub_index,
+            possible_v, global_move, sub_move = self.minimize_value(board, sub_index,
                                                                     depth-1, alpha, beta)
             # Remove piece
+            board.undo(token)
 
             if possible_v > v:
                 v = possible_v
@@ -195,12 +194,12 @@ class GeneticAgent(Agent):
         # move)
         for brd, subs in available:
             # Play piece
-            temp_board = deepcopy(board)
-            temp_board.play(-1, brd, subs)
+            token = board.make_move(-1, brd, subs)
             sub_index = brd[1] + 3 * brd[0] # Convert the 2D coordinates of the subboard to a 1D index
-            possible_v, global_move, sub_move = self.maximize_value(temp_board, sub_index,
+            possible_v, global_move, sub_move = self.maximize_value(board, sub_index,
                                                                     depth - 1, alpha, beta)
             # Remove piece
+            board.undo(token)
 
             if possible_v < v:
                 v = possible_v
@@ -1,13 +1,23 @@
 from genetic import GeneticProgram
-import sys
+import argparse
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the evolution of compressed genetic agents.')
+    parser.add_argument('gen_num', type=int, help='number of generations')
+    parser.add_argument('agent_num', type=int, help='number of agents in each generation')
+    parser.add_argument('top_k_num', type=int, help='number of agents kept from each generation')
+    parser.add_argument('--checkpoint', help='file the state of the evolution is saved to after every generation')
+    parser.add_argument('--resume', action='store_true',
+                        help='go on from the checkpoint of an interrupted run with the same arguments. '
+                             'Needs --checkpoint')
+    args = parser.parse_args()
+    if args.resume and args.checkpoint is None:
+        parser.error('--resume needs --checkpoint')
+    gen_num = args.gen_num
+    agent_num = args.agent_num
+    top_k_num = args.top_k_num
 
-    gen_num = int(sys.argv[1])
-    agent_num = int(sys.argv[2])
-    top_k_num = int(sys.argv[3])
-
-    gen = GeneticProgram()
+    gen = GeneticProgram(checkpoint_path=args.checkpoint)
 
     print(gen_num)
     print(agent_num)
@@ -15,7 +25,7 @@ if __name__ == '__main__':
 
     print("Working")
 
-    top_agent, duration = gen.evolution(gen_num, agent_num, top_k_num)
+    top_agent, duration = gen.evolution(gen_num, agent_num, top_k_num, resume=args.resume)
     genetic_file = open("top_agent_stats.txt", "w")
     agent_info = ""
     agent_info += "Top agent name: " + top_agent.agent_name + "\n"
@@ -1,4 +1,3 @@
-from copy import deepcopy
 from typing import Optional, Tuple
 from base_agent import Agent
 from board import Board
@@ -31,9 +30,9 @@ class SimpleMinimaxAgent(Agent):
             return 0, board.get_legal_moves()[0]  # todo we can do better here?
         v, move = -float('inf'), None
         for (x, y), (i, j) in board.get_legal_moves():
-            board_copy = deepcopy(board)
-            board_copy.play(1, (x, y), (i, j))
-            v2, a2 = self.min_value(board_copy, alpha, beta, depth + 1)
+            token = board.make_move(1, (x, y), (i, j))
+            v2, a2 = self.min_value(board, alpha, beta, depth + 1)
+            board.undo(token)
             if v2 > v:
                 v, move = v2, ((x, y), (i, j))
                 alpha = max(alpha, v)
@@ -49,9 +48,9 @@ class SimpleMinimaxAgent(Agent):
             return 0, board.get_legal_moves()[0]  # todo we can do better here?
         v, move = float('inf'), None
         for (x, y), (i, j) in board.get_legal_moves():
-            board_copy = deepcopy(board)
-            board_copy.play(-1, (x, y), (i, j))
-            v2, a2 = self.max_value(board_copy, alpha, beta, depth + 1)
+            token = board.make_move(-1, (x, y), (i, j))
+            v2, a2 = self.max_value(board, alpha, beta, depth + 1)
+            board.undo(token)
             if v2 < v:
                 v, move = v2, ((x, y), (i, j))
                 beta = min(beta, v)
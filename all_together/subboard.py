@@ -18,6 +18,7 @@ class SubBoard:
         self.n: int = n
         self.grid = np.array([[0 for _ in range(n)] for __ in range(n)], dtype=np.byte)
         self.winner: Optional[int] = None
+        self.filled: int = 0  # number of non-blank cells
 
     def __repr__(self):
         return f'{self.grid}'
@@ -26,13 +27,14 @@ class SubBoard:
         return self.grid
 
     def is_board_full(self) -> bool:
-        return np.count_nonzero(self.grid) == (self.n ** 2)
+        return self.filled == self.n * self.n
 
     def play(self, player: int, position: Tuple[int, int]) -> Optional[int]:
         i, j = position
         assert self.grid[i][j] == 0  # can play only on blank cells
         assert self.winner is None  # can not play on a board after it's won
         self.grid[i][j] = player
+        self.filled += 1
         if self.is_winner(player, position):
             self.winner = player
             return self.winner
@@ -40,6 +42,17 @@ class SubBoard:
             self.winner = 0
             return 0  # draw
 
+    def undo(self, position: Tuple[int, int]) -> None:
+        """
+        Takes back the move at :param position. Only the most recent move of a sub-board can be undone,
+        and a board can only have been played on while it had no winner, so the winner is cleared.
+        """
+        i, j = position
+        assert self.grid[i][j] != 0
+        self.grid[i][j] = 0
+        self.filled -= 1
+        self.winner = None
+
     def process_count(self, player: int, position: Tuple[int, int]) -> int:
         i, j = position
         configs = [[(i, j - 1), '←', (i, j + 1), '→'],
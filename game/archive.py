@@ -0,0 +1,334 @@
+"""
+Append-only archive of played games of the 3x3 game.
+An archive is two files: the games themselves and, next to them with INDEX_SUFFIX appended, the offset of every
+game in the first file as a little-endian uint64.
+The archive file starts with MAGIC and then holds one record per game:
+<ul>
+<li> 1 byte: the number of plies </li>
+<li> 1 byte per ply: the move as sub_board * 9 + cell (see game.moves.encode_move) </li>
+<li> 4 bytes: the length of the metadata, little-endian </li>
+<li> the metadata: UTF-8 JSON with the agents, the result, the time of every move and whatever the caller adds </li>
+</ul>
+ArchiveWriter appends games, GameArchive memory-maps both files to stream games or read any one of them without
+loading the rest, and GameRecord.replay() rebuilds the board at any ply of a game.
+
+Run with: python -m game.archive games.uga
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+
+from game.board import Board
+from game.moves import Move, encode_move, decode_move
+
+MAGIC = b'UTTTGAR1'
+INDEX_SUFFIX = '.idx'
+_LENGTH = struct.Struct('<I')
+_OFFSET = struct.Struct('<Q')
+
+
+class GameRecord:
+    """
+    One archived game: its moves from the empty board and its metadata.
+    The metadata of games read from an archive is only decoded when it is first used.
+    """
+
+    def __init__(self, moves: bytes, metadata: Optional[dict] = None, raw_metadata: Optional[bytes] = None):
+        """
+        :param moves: The moves, one encoded move per byte
+        :param metadata: The metadata, see describe_game()
+        :param raw_metadata: The metadata as stored in the archive, decoded instead of :metadata when first used
+        """
+        self.moves = moves
+        self._metadata = metadata
+        self._raw_metadata = raw_metadata
+
+    @classmethod
+    def from_moves(cls, moves: List[Move], metadata: Optional[dict] = None) -> 'GameRecord':
+        return cls(bytes(encode_move(3, move) for move in moves), metadata)
+
+    @property
+    def metadata(self) -> dict:
+        if self._metadata is None:
+            self._metadata = json.loads(self._raw_metadata) if self._raw_metadata else {}
+        return self._metadata
+
+    @property
+    def result(self) -> Optional[int]:
+        """
+        :return: The winner stored in the metadata: 1 for X, -1 for O, 0 for a draw
+        """
+        return self.metadata.get('result')
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def get_moves(self) -> List[Move]:
+        return [decode_move(3, value) for value in self.moves]
+
+    def replay(self, ply: Optional[int] = None, board_type: type = Board):
+        """
+        :param ply: Number of moves to play, all of them if None. Negative values count from the end.
+        :param board_type: Game engine to play on, Board or BitBoard
+        :return: The board after the first :ply moves of the game
+        """
+        board = board_type()
+        for value in self.moves[:ply]:
+            board.play(board.turn, *decode_move(3, value))
+        return board
+
+    def to_bytes(self) -> bytes:
+        metadata = self._raw_metadata if self._metadata is None else \
+            json.dumps(self._metadata, separators=(',', ':')).encode()
+        metadata = metadata or b''
+        return bytes((len(self.moves),)) + self.moves + _LENGTH.pack(len(metadata)) + metadata
+
+
+def describe_agent(agent) -> dict:
+    """
+    :return: What the archive keeps about an agent: its name, class and traits if it has any
+    """
+    description = {'name': agent.agent_name, 'type': type(agent).__name__}
+    traits = getattr(agent, 'traits', None)
+    if traits is not None:
+        description['traits'] = list(traits)
+    return description
+
+
+def describe_game(x_player, o_player, winner: int, times: List[float], **extra) -> dict:
+    """
+    :param x_player: Agent playing X
+    :param o_player: Agent playing O
+    :param winner: 1 for X, -1 for O, 0 for a draw
+    :param times: Seconds taken by every move
+    :param extra: Anything else to keep with the game, such as the generation or the seed
+    :return: The metadata of the game
+    """
+    return dict(x=describe_agent(x_player), o=describe_agent(o_player), result=winner,
+                times=[round(t * 1000, 3) for t in times], **extra)
+
+
+def _scan(data, start: int) -> Tuple[List[int], int]:
+    """
+    Walks the records of the archive :data from :start.
+    :return: (the offsets of the complete records, the end of the last complete record)
+    """
+    offsets = []
+    position = start
+    while position < len(data):
+        plies = data[position]
+        end = position + 1 + plies + _LENGTH.size
+        if end > len(data):
+            break
+        end += _LENGTH.unpack_from(data, end - _LENGTH.size)[0]
+        if end > len(data):
+            break
+        offsets.append(position)
+        position = end
+    return offsets, position
+
+
+class ArchiveWriter:
+    """
+    Appends games to an archive, creating it if needed. Every game is written to the archive and then its offset
+    to the index, so a crash leaves at most the last game out of the index. The writer adds such games back to
+    the index, and drops a last game that was only partly written, when it opens the archive again.
+    Also works as a context manager that closes the files.
+    """
+
+    def __init__(self, path: str, **extra):
+        """
+        :param path: The archive file, the index is path + INDEX_SUFFIX
+        :param extra: Metadata added to every game appended from now on, see set_extra()
+        """
+        self.path = path
+        self.extra = extra
+        index_path = path + INDEX_SUFFIX
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(MAGIC)
+            open(index_path, 'wb').close()
+        self._recover(path, index_path)
+        self._data = open(path, 'ab')
+        self._index = open(index_path, 'ab')
+        self._position = self._data.tell()
+
+    @staticmethod
+    def _recover(path: str, index_path: str) -> None:
+        # Only the games from the last indexed one on are read, the archive before them is known to be complete
+        index_size = os.path.getsize(index_path) if os.path.exists(index_path) else 0
+        index_size -= index_size % _OFFSET.size
+        last = None
+        if index_size:
+            with open(index_path, 'rb') as f:
+                f.seek(index_size - _OFFSET.size)
+                last = _OFFSET.unpack(f.read(_OFFSET.size))[0]
+        start = len(MAGIC) if last is None else last
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a game archive')
+            f.seek(start)
+            tail = f.read()
+        offsets, end = _scan(tail, 0)
+        if last is not None:
+            offsets = offsets[1:]
+        with open(index_path, 'ab') as f:
+            f.truncate(index_size)
+            f.write(b''.join(_OFFSET.pack(start + offset) for offset in offsets))
+        if start + end < os.path.getsize(path):
+            os.truncate(path, start + end)
+
+    def set_extra(self, **extra) -> None:
+        """
+        Replaces the metadata added to every game, e.g. set_extra(generation=3)
+        """
+        self.extra = extra
+
+    def append(self, record: GameRecord) -> None:
+        if self.extra:
+            record.metadata.update(self.extra)
+        data = record.to_bytes()
+        self._data.write(data)
+        self._data.flush()
+        self._index.write(_OFFSET.pack(self._position))
+        self._index.flush()
+        self._position += len(data)
+
+    def extend(self, records: List[GameRecord]) -> None:
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return self._index.tell() // _OFFSET.size
+
+    def truncate(self, num_games: int) -> None:
+        """
+        Drops every game after the first :num_games, e.g. the games of a generation that was interrupted before a
+        run was resumed from its last checkpoint.
+        """
+        if num_games >= len(self):
+            return
+        with open(self.path + INDEX_SUFFIX, 'rb') as f:
+            f.seek(num_games * _OFFSET.size)
+            end = _OFFSET.unpack(f.read(_OFFSET.size))[0]
+        self._index.truncate(num_games * _OFFSET.size)
+        self._index.seek(0, os.SEEK_END)
+        self._data.truncate(end)
+        self._data.seek(0, os.SEEK_END)
+        self._position = end
+
+    def close(self) -> None:
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __getstate__(self):
+        raise TypeError('ArchiveWriter cannot be sent to other processes, send the games back to it instead')
+
+
+class GameArchive:
+    """
+    Reads an archive through memory maps of both of its files. games[i] reads game i and iterating streams all of
+    them; neither loads more than the game it returns. The archive is read as it was when it was opened.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._files = []
+        self._maps = []
+        self._data = self._map(path)
+        if self._data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a game archive')
+        index_path = path + INDEX_SUFFIX
+        if os.path.exists(index_path) and os.path.getsize(index_path):
+            self._offsets = memoryview(self._map(index_path))
+            self._offsets = self._offsets[:len(self._offsets) - len(self._offsets) % _OFFSET.size].cast('Q')
+        else:
+            self._offsets = _scan(self._data, len(MAGIC))[0]  # no index yet: walk the whole archive once
+
+    def _map(self, path: str) -> mmap.mmap:
+        f = open(path, 'rb')
+        self._files.append(f)
+        self._maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return self._maps[-1]
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def moves(self, i: int) -> bytes:
+        """
+        :return: The encoded moves of game :i, without decoding its metadata
+        """
+        offset = self._offsets[i]
+        return self._data[offset + 1:offset + 1 + self._data[offset]]
+
+    def __getitem__(self, i: int) -> GameRecord:
+        if i < 0:
+            i += len(self)
+        offset = self._offsets[i]
+        end = offset + 1 + self._data[offset]
+        length = _LENGTH.unpack_from(self._data, end)[0]
+        return GameRecord(self._data[offset + 1:end], raw_metadata=self._data[end + 4:end + 4 + length])
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def replay(self, i: int, ply: Optional[int] = None, board_type: type = Board):
+        """
+        :return: The board after the first :ply moves of game :i, see GameRecord.replay()
+        """
+        return GameRecord(self.moves(i)).replay(ply, board_type)
+
+    def close(self) -> None:
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        for m in self._maps:
+            m.close()
+        for f in self._files:
+            f.close()
+
+    def __enter__(self) -> 'GameArchive':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def rebuild_index(path: str) -> int:
+    """
+    Writes the index of an archive again by walking through it, e.g. after the index was lost.
+    :return: The number of games in the archive
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not a game archive')
+    offsets, _ = _scan(data, len(MAGIC))
+    with open(path + INDEX_SUFFIX, 'wb') as f:
+        f.write(b''.join(_OFFSET.pack(offset) for offset in offsets))
+    return len(offsets)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarizes a game archive.')
+    parser.add_argument('path', help='archive file')
+    parser.add_argument('--rebuild-index', action='store_true', help='write the index again before reading')
+    args = parser.parse_args()
+    if args.rebuild_index:
+        rebuild_index(args.path)
+    with GameArchive(args.path) as archive:
+        results = Counter(record.result for record in archive)
+        plies = sum(len(archive.moves(i)) for i in range(len(archive)))
+        print(f'{len(archive)} games, X wins {results[1]}, O wins {results[-1]}, draws {results[0]}, '
+              f'{plies / max(len(archive), 1):.1f} plies on average')
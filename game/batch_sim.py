@@ -0,0 +1,138 @@
+"""
+Batched random playouts in NumPy.
+play_random_games() plays K games of uniformly random moves at once. The games are stored as arrays, nine X
+and nine O cell masks per game like BitBoard, and every step plays one ply in all the running games with a
+few vectorized operations: legal moves are masked in through a bit lookup table, one is picked at random per
+game, and wins are found in WIN_TABLE. The rules are the same as Board's, including which sub-board the next
+move is sent to.
+
+Run with: python -m game.batch_sim [--games 100000] [--seed N]
+"""
+import argparse
+from time import perf_counter
+from typing import Optional, Tuple
+
+import numpy as np
+
+from game.bitboard import FULL, WIN_TABLE
+
+# BITS[mask][c] is True if bit c of the 9-bit mask is set
+BITS: np.ndarray = np.array([[mask >> c & 1 for c in range(9)] for mask in range(FULL + 1)], dtype=bool)
+WINS: np.ndarray = np.array(WIN_TABLE, dtype=bool)
+CELLS: np.ndarray = np.arange(9)
+
+
+def play_random_games(num_games: int, seed: Optional[int] = None, start=None,
+                      record_moves: bool = False) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Plays :num_games games with uniformly random moves for both players.
+    :param num_games: Number of games
+    :param seed: Seed of the random generator, for reproducible games
+    :param start: Position to play the games from, a Board or BitBoard of the 3x3 game. The empty board if None.
+    :param record_moves: Also return the moves of every game
+    :return: (outcomes, lengths, moves). outcomes[g] is the winner of game g: 1 for X, -1 for O and 0 for a
+    draw. lengths[g] is the number of plies it took from the start position. moves[g][ply] is the move
+    played at ply, as sub_board * 9 + cell (see game.moves.encode_move), and -1 after the end of the game.
+    moves is None unless :record_moves is set.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.zeros((num_games, 9), dtype=np.int16)  # X cells of each sub-board
+    o = np.zeros((num_games, 9), dtype=np.int16)  # O cells of each sub-board
+    macro_x = np.zeros(num_games, dtype=np.int16)  # sub-boards won by X
+    macro_o = np.zeros(num_games, dtype=np.int16)  # sub-boards won by O
+    macro_draw = np.zeros(num_games, dtype=np.int16)  # sub-boards filled without a winner
+    forced = np.full(num_games, 9, dtype=np.int64)  # sub-board the next move is forced into, 9 for a free move
+    turn = np.ones(num_games, dtype=np.int8)
+    winner = np.zeros(num_games, dtype=np.int8)
+    lengths = np.zeros(num_games, dtype=np.int64)
+    moves = np.full((num_games, 81), -1, dtype=np.int8) if record_moves else None
+    active = np.arange(num_games)
+
+    if start is not None:
+        assert start.n == 3
+        _set_start(start, x, o, macro_x, macro_o, macro_draw, forced, turn)
+        if start.is_terminal():
+            winner[:] = start.winner
+            active = active[:0]
+
+    rows = np.arange(num_games)
+    while active.size:
+        g = active
+        a = rows[:g.size]
+        xs, os = x[g], o[g]
+        decided = macro_x[g] | macro_o[g] | macro_draw[g]
+        f = forced[g]
+
+        # Legal moves: empty cells of the forced sub-board, or of every open sub-board for a free move
+        legal = BITS[FULL & ~(xs | os)]
+        legal &= np.where((f < 9)[:, None], CELLS == f[:, None], ~BITS[decided])[:, :, None]
+        legal = legal.reshape(-1, 81)
+        pick = (rng.random(g.size) * legal.sum(axis=1)).astype(np.int64)
+        move = (legal.cumsum(axis=1) > pick[:, None]).argmax(axis=1)
+        k, c = move // 9, move % 9
+
+        # Play the moves
+        is_x = turn[g] == 1
+        sub_bit = (1 << k).astype(np.int16)
+        mover = np.where(is_x, xs[a, k], os[a, k]) | (1 << c).astype(np.int16)
+        other = np.where(is_x, os[a, k], xs[a, k])
+        x[g, k] = np.where(is_x, mover, other)
+        o[g, k] = np.where(is_x, other, mover)
+        won = WINS[mover]
+        drawn = ~won & ((mover | other) == FULL)
+        mover_macro = np.where(is_x, macro_x[g], macro_o[g]) | np.where(won, sub_bit, 0).astype(np.int16)
+        macro_x[g] = np.where(is_x, mover_macro, macro_x[g])
+        macro_o[g] = np.where(is_x, macro_o[g], mover_macro)
+        macro_draw[g] |= np.where(drawn, sub_bit, 0).astype(np.int16)
+        # Like Board, a sub-board that was just drawn counts for the mover when looking for a line
+        game_won = (won & WINS[mover_macro]) | (drawn & WINS[mover_macro | sub_bit])
+        decided = macro_x[g] | macro_o[g] | macro_draw[g]
+
+        winner[g] = np.where(game_won, turn[g], 0)
+        forced[g] = np.where(BITS[decided, c], 9, c)
+        turn[g] = -turn[g]
+        if moves is not None:
+            moves[g, lengths[g]] = move
+        lengths[g] += 1
+        active = g[~(game_won | (decided == FULL))]  # a game without a winner is drawn once all are decided
+    return winner, lengths, moves
+
+
+def _set_start(board, x, o, macro_x, macro_o, macro_draw, forced, turn) -> None:
+    """
+    Copies the position of :board into every game of the arrays.
+    """
+    grid = board.get_grid()
+    for k in range(9):
+        sub_board = grid[k // 3][k % 3]
+        cells = sub_board.get_grid()
+        for c in range(9):
+            if cells[c // 3][c % 3] == 1:
+                x[:, k] |= 1 << c
+            elif cells[c // 3][c % 3] == -1:
+                o[:, k] |= 1 << c
+        if sub_board.winner == 1:
+            macro_x |= 1 << k
+        elif sub_board.winner == -1:
+            macro_o |= 1 << k
+        elif sub_board.winner == 0:
+            macro_draw |= 1 << k
+    if board.last_move is not None:
+        (_, _), (i, j) = board.last_move
+        if not grid[i][j].is_terminal():
+            forced[:] = 3 * i + j
+    turn[:] = board.turn
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plays random games in batches and reports the speed.')
+    parser.add_argument('--games', type=int, default=100000, help='number of games')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random generator')
+    args = parser.parse_args()
+
+    start = perf_counter()
+    outcomes, lengths, _ = play_random_games(args.games, args.seed)
+    duration = perf_counter() - start
+    print(f'{args.games} games in {duration:.2f}s, {args.games / duration * 60:,.0f} games per minute')
+    print(f'X wins {np.mean(outcomes == 1):.1%}, O wins {np.mean(outcomes == -1):.1%}, '
+          f'draws {np.mean(outcomes == 0):.1%}, {lengths.mean():.1f} plies on average')
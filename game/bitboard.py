@@ -0,0 +1,302 @@
+from typing import Optional, Tuple, List, Iterator
+
+from game import codec
+from game.moves import get_move_table
+from game.zobrist import get_keys
+
+# Cell (i, j) of a 3x3 grid is stored in bit 3 * i + j.
+LINES: Tuple[int, ...] = (0b000000111, 0b000111000, 0b111000000,  # rows
+                          0b001001001, 0b010010010, 0b100100100,  # columns
+                          0b100010001, 0b001010100)  # diagonals
+FULL: int = 0b111111111
+
+# WIN_TABLE[mask] is True if the 9-bit mask contains a complete line.
+WIN_TABLE: Tuple[bool, ...] = tuple(any(mask & line == line for line in LINES) for mask in range(FULL + 1))
+
+# TERNARY[mask] is the mask read as a base-3 number, so a sub-board's SubBoard.state is
+# TERNARY[x_mask] + 2 * TERNARY[o_mask].
+TERNARY: Tuple[int, ...] = tuple(sum(3 ** k for k in range(9) if mask >> k & 1) for mask in range(FULL + 1))
+
+
+class BitSubBoard:
+    """
+    Read-only view of one sub-board of a BitBoard.
+    Mirrors the parts of SubBoard that the agents read: winner, get_grid() and the status checks.
+    """
+
+    def __init__(self, x_mask: int, o_mask: int, winner: Optional[int]):
+        self.n: int = 3
+        self.x_mask: int = x_mask
+        self.o_mask: int = o_mask
+        self.winner: Optional[int] = winner
+
+    @property
+    def state(self) -> int:
+        """
+        :return: Base-3 index of the cells, the same as SubBoard.state
+        """
+        return TERNARY[self.x_mask] + 2 * TERNARY[self.o_mask]
+
+    def __repr__(self):
+        return f'{self.get_grid()}'
+
+    def get_grid(self) -> List[List[int]]:
+        return [[1 if self.x_mask >> (3 * i + j) & 1 else (-1 if self.o_mask >> (3 * i + j) & 1 else 0)
+                 for j in range(3)] for i in range(3)]
+
+    def is_board_full(self) -> bool:
+        return self.x_mask | self.o_mask == FULL
+
+    def get_legal_moves(self) -> List[Tuple[int, int]]:
+        if self.winner is None:
+            empty = ~(self.x_mask | self.o_mask)
+            return [(i, j) for i in range(3) for j in range(3) if empty >> (3 * i + j) & 1]
+        return []
+
+    def is_terminal(self):
+        return self.winner is not None or self.is_board_full()
+
+    def get_html(self):
+        t = lambda x, y: 'X' if self.x_mask >> (3 * x + y) & 1 else ('O' if self.o_mask >> (3 * x + y) & 1 else '_')
+        return f"""<table>
+            <tr>
+                <td>{t(0, 0)}</td>
+                <td>{t(0, 1)}</td>
+                <td>{t(0, 2)}</td>
+            </tr>
+            <tr>
+                <td>{t(1, 0)}</td>
+                <td>{t(1, 1)}</td>
+                <td>{t(1, 2)}</td>
+            </tr>
+            <tr>
+                <td>{t(2, 0)}</td>
+                <td>{t(2, 1)}</td>
+                <td>{t(2, 2)}</td>
+            </tr>
+        </table>
+        """
+
+
+class BitBoard:
+    """
+    Bitboard implementation of the main board. Drop-in alternative to game.board.Board for the 3x3 game.
+    Each sub-board is a pair of 9-bit masks (one per player) and the main board is a pair of 9-bit macro
+    masks marking the sub-boards each player has won, plus a mask of drawn sub-boards.
+    Wins are detected with a single lookup in WIN_TABLE instead of walking the grid.
+    """
+
+    def __init__(self, n: int = 3):
+        assert n == 3  # the masks and WIN_TABLE only describe 3x3 grids
+        self.n: int = n
+        self.x_masks: List[int] = [0] * 9  # X cells of each sub-board, indexed by 3 * x + y
+        self.o_masks: List[int] = [0] * 9  # O cells of each sub-board
+        self.macro_x: int = 0  # sub-boards won by X
+        self.macro_o: int = 0  # sub-boards won by O
+        self.macro_draw: int = 0  # sub-boards filled without a winner
+        self.winner: Optional[int] = None  # set only after game is over. +1 for X, -1 for O, 0 for draw.
+        # Keep a track of last move because the next legal move depends on it.
+        self.last_move: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
+        self.turn: int = 1  # X always starts
+        # Sub-board the next move is forced into (3 * x + y), 9 when the player may play anywhere.
+        self._forced: int = 9
+        self._keys = get_keys(3)
+        self._hash: int = self._keys.forced[self._forced]
+        self._moves = get_move_table(3)
+
+    @property
+    def zobrist_hash(self) -> int:
+        """
+        64-bit Zobrist hash of the position. Uses the same keys as Board, so both engines agree on it.
+        """
+        return self._hash
+
+    def to_bytes(self) -> bytes:
+        """
+        :return: The position in the compact encoding of game.codec. See Board.to_bytes().
+        """
+        return codec.pack([codec.SPREAD[x] | codec.SPREAD[o] << 1 for x, o in zip(self.x_masks, self.o_masks)],
+                          self.last_move, self._forced, self.turn, self.winner)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BitBoard':
+        """
+        :param data: A position encoded by to_bytes(), of this class or another engine
+        :return: A new board with the position
+        """
+        masks, last_move, forced, turn, winner = codec.unpack(data)
+        board = cls()
+        keys = board._keys
+        h = keys.forced[forced] ^ (keys.turn if turn == -1 else 0)
+        for k, (x_mask, o_mask) in enumerate(masks):
+            board.x_masks[k], board.o_masks[k] = x_mask, o_mask
+            if WIN_TABLE[x_mask]:
+                board.macro_x |= 1 << k
+            elif WIN_TABLE[o_mask]:
+                board.macro_o |= 1 << k
+            elif x_mask | o_mask == FULL:
+                board.macro_draw |= 1 << k
+            for c in range(9):
+                if x_mask >> c & 1:
+                    h ^= keys.cells[k][c][0]
+                elif o_mask >> c & 1:
+                    h ^= keys.cells[k][c][1]
+        board.last_move, board._forced, board.turn, board.winner, board._hash = last_move, forced, turn, winner, h
+        return board
+
+    def get_html(self):
+        """
+        :return: HTML representation of the board. Kinda readable.
+        """
+        g = self.get_grid()
+        return f"""
+        <html>
+            <table border="all">
+                <tr>
+                    <td>{g[0][0].get_html()}</td>
+                    <td>{g[0][1].get_html()}</td>
+                    <td>{g[0][2].get_html()}</td>
+                </tr>
+                <tr>
+                    <td>{g[1][0].get_html()}</td>
+                    <td>{g[1][1].get_html()}</td>
+                    <td>{g[1][2].get_html()}</td>
+                </tr>
+                <tr>
+                    <td>{g[2][0].get_html()}</td>
+                    <td>{g[2][1].get_html()}</td>
+                    <td>{g[2][2].get_html()}</td>
+                </tr>
+            </table>
+        </html>"""
+
+    def get_grid(self) -> List[List[BitSubBoard]]:
+        """
+        :return: The entire board as read-only sub-board views. Can be used for tests and evaluation.
+        """
+        return [[BitSubBoard(self.x_masks[3 * x + y], self.o_masks[3 * x + y], self._sub_board_winner(3 * x + y))
+                 for y in range(3)] for x in range(3)]
+
+    def _sub_board_winner(self, k: int) -> Optional[int]:
+        bit = 1 << k
+        if self.macro_x & bit:
+            return 1
+        if self.macro_o & bit:
+            return -1
+        if self.macro_draw & bit:
+            return 0
+        return None
+
+    def _decided(self) -> int:
+        return self.macro_x | self.macro_o | self.macro_draw
+
+    def is_board_full(self) -> bool:
+        """
+        Checks if the board is full by checking if all the sub-boards are full.
+        :return: True if all sub-boards are full
+        """
+        return all(x | o == FULL for x, o in zip(self.x_masks, self.o_masks))
+
+    def play(self, player: int, board_position: Tuple[int, int], sub_board_position: Tuple[int, int]) -> Optional[int]:
+        """
+        Makes player's move at the given position and returns the outcome if the game ended.
+        Throws an error for an illegal move.
+
+        :param player: 1 for X, -1 for O
+        :param board_position: Co-ordinates of the main board
+        :param sub_board_position: Co-ordinates of the position in the sub-board for the given main board.
+        :return: 1 if X wins, -1 if O wins, 0 for draw, None if the game is not yet completed.
+        """
+        assert self.winner is None  # can not make a move after the game is ended
+        assert self.turn == player
+        k = 3 * board_position[0] + board_position[1]
+        c = 3 * sub_board_position[0] + sub_board_position[1]
+        sub_bit = 1 << k
+        bit = 1 << c
+        assert not self._decided() & sub_bit  # can not play on a decided board
+        assert not (self.x_masks[k] | self.o_masks[k]) & bit  # can play only on blank cells
+        self.last_move = (board_position, sub_board_position)
+        self.turn = -player
+        if player == 1:
+            mask = self.x_masks[k] = self.x_masks[k] | bit
+            if WIN_TABLE[mask]:
+                self.macro_x |= sub_bit
+                if WIN_TABLE[self.macro_x]:
+                    self.winner = 1
+            elif mask | self.o_masks[k] == FULL:
+                self.macro_draw |= sub_bit
+                if WIN_TABLE[self.macro_x | sub_bit]:  # Board counts the drawn sub-board for the mover
+                    self.winner = 1
+        else:
+            mask = self.o_masks[k] = self.o_masks[k] | bit
+            if WIN_TABLE[mask]:
+                self.macro_o |= sub_bit
+                if WIN_TABLE[self.macro_o]:
+                    self.winner = -1
+            elif mask | self.x_masks[k] == FULL:
+                self.macro_draw |= sub_bit
+                if WIN_TABLE[self.macro_o | sub_bit]:  # Board counts the drawn sub-board for the mover
+                    self.winner = -1
+        decided = self._decided()
+        # Nobody won the game. It is a draw once every sub-board is decided.
+        if self.winner is None and decided == FULL:
+            self.winner = 0
+        forced = 9 if decided >> c & 1 else c
+        keys = self._keys
+        self._hash ^= (keys.cells[k][c][(1 - player) >> 1] ^ keys.turn
+                       ^ keys.forced[self._forced] ^ keys.forced[forced])
+        self._forced = forced
+        return self.winner
+
+    def make_move(self, player: int, board_position: Tuple[int, int], sub_board_position: Tuple[int, int]) -> Tuple:
+        """
+        Same as play() but returns an undo token instead of the outcome. See Board.make_move().
+        """
+        token = (3 * board_position[0] + board_position[1], 1 << (3 * sub_board_position[0] + sub_board_position[1]),
+                 self.last_move, self.macro_x, self.macro_o, self.macro_draw, self._forced, self._hash)
+        self.play(player, board_position, sub_board_position)
+        return token
+
+    def undo(self, token: Tuple) -> None:
+        """
+        Takes back the move that returned :param token. Moves must be undone in the reverse order they were made.
+        """
+        k, bit, self.last_move, self.macro_x, self.macro_o, self.macro_draw, self._forced, self._hash = token
+        self.x_masks[k] &= ~bit
+        self.o_masks[k] &= ~bit
+        self.turn = -self.turn
+        self.winner = None  # moves can only be made while the game is running
+
+    def get_legal_moves(self) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+        if self._forced < 9:
+            k = self._forced
+            return list(self._moves.get(k, FULL & ~(self.x_masks[k] | self.o_masks[k])))
+
+        # At the start of the game, or when sent to a terminal board, the player may play in any open board.
+        decided = self._decided()
+        moves = []
+        for k in range(9):
+            if not decided >> k & 1:
+                moves.extend(self._moves.get(k, FULL & ~(self.x_masks[k] | self.o_masks[k])))
+        return moves
+
+    def iter_legal_moves(self) -> Iterator[Tuple[Tuple[int, int], Tuple[int, int]]]:
+        """
+        Yields the legal moves in the same order as get_legal_moves() without building a list.
+        Moves made on the board while iterating must be undone before the next move is taken.
+        """
+        if self._forced < 9:
+            k = self._forced
+            yield from self._moves.get(k, FULL & ~(self.x_masks[k] | self.o_masks[k]))
+            return
+        decided = self._decided()
+        for k in range(9):
+            if not decided >> k & 1:
+                yield from self._moves.get(k, FULL & ~(self.x_masks[k] | self.o_masks[k]))
+
+    def is_terminal(self):
+        """
+        Checks if the game has ended by checking if there is a winner if all boards are terminal
+        :return: True if the game has ended
+        """
+        return self.winner is not None or self._decided() == FULL
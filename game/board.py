@@ -1,6 +1,9 @@
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Iterator
 
+from game import codec
+from game.moves import get_move_table
 from game.subboard import SubBoard
+from game.zobrist import get_keys
 
 
 class Board:
@@ -13,11 +16,57 @@ class Board:
 
     def __init__(self, n: int = 3):
         self.n: int = n
-        self.grid: List[List[SubBoard]] = [[SubBoard(n) for _ in range(n)] for __ in range(n)]
+        self.grid: List[List[SubBoard]] = [[SubBoard(n, x * n + y) for y in range(n)] for x in range(n)]
         self.winner: Optional[int] = None  # set only after game is over. +1 for X, -1 for O, 0 for draw.
         # Keep a track of last move because the next legal move depends on it.
         self.last_move: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
         self.turn: int = 1  # X always starts
+        # Kept up to date by play() and undo() so the status checks do not have to look at every sub-board.
+        self._decided: int = 0  # bit x * n + y is set when sub-board (x, y) is terminal
+        self._open: int = n * n  # number of sub-boards that are not terminal
+        self._filled: int = 0  # number of non-blank cells on the whole board
+        self._moves = get_move_table(n)
+        # Sub-board the next move is forced into (x * n + y), n * n when the player may play anywhere.
+        self._forced: int = n * n
+        self._keys = get_keys(n)
+        self._hash: int = self._keys.forced[self._forced]
+
+    @property
+    def zobrist_hash(self) -> int:
+        """
+        64-bit Zobrist hash of the position: the pieces, the player to move and the sub-board the next move is
+        forced into (or a free move). Kept up to date by play() and undo(), see game.zobrist.
+        """
+        return self._hash
+
+    def to_bytes(self) -> bytes:
+        """
+        :return: The position in the compact encoding of game.codec, 24 bytes. Only for the 3x3 game.
+        """
+        assert self.n == 3
+        return codec.pack([codec.STATE_CODES[sub_board.state] for row in self.grid for sub_board in row],
+                          self.last_move, self._forced, self.turn, self.winner)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Board':
+        """
+        :param data: A position encoded by to_bytes(), of this class or another engine
+        :return: A new board with the position
+        """
+        masks, last_move, forced, turn, winner = codec.unpack(data)
+        board = cls(3)
+        sub_boards_hash = 0
+        for k, (x_mask, o_mask) in enumerate(masks):
+            sub_board = board.grid[k // 3][k % 3]
+            sub_board.set_cells(x_mask, o_mask)
+            board._filled += sub_board.filled
+            sub_boards_hash ^= sub_board.zobrist_hash
+            if sub_board.is_terminal():
+                board._decided |= 1 << k
+                board._open -= 1
+        board.last_move, board._forced, board.turn, board.winner = last_move, forced, turn, winner
+        board._hash = board._keys.forced[forced] ^ (board._keys.turn if turn == -1 else 0) ^ sub_boards_hash
+        return board
 
     def get_html(self):
         """
@@ -56,7 +105,7 @@ class Board:
         Checks if the board is full by checking if all the sub-boards are full.
         :return: True if all sub-boards are full
         """
-        return all(x.is_board_full() for x in sum(self.grid, []))
+        return self._filled == self.n ** 4
 
     def play(self, player: int, board_position: Tuple[int, int], sub_board_position: Tuple[int, int]) -> Optional[int]:
         """
@@ -71,9 +120,20 @@ class Board:
         x, y = board_position
         assert self.winner is None  # can not make a move after the game is ended
         assert self.turn == player
-        sub_board_winner = self.grid[x][y].play(player, sub_board_position)
+        sub_board = self.grid[x][y]
+        sub_board_hash = sub_board.zobrist_hash
+        sub_board_winner = sub_board.play(player, sub_board_position)
+        self._filled += 1
+        if sub_board.is_terminal():
+            self._decided |= 1 << (x * self.n + y)
+            self._open -= 1
         self.last_move = (board_position, sub_board_position)
         self.turn *= -1  # change turns from +1 -> -1 and -1 -> +1
+        i, j = sub_board_position
+        forced = self.n * self.n if self._decided >> (i * self.n + j) & 1 else i * self.n + j
+        self._hash ^= (sub_board_hash ^ sub_board.zobrist_hash ^ self._keys.turn
+                       ^ self._keys.forced[self._forced] ^ self._keys.forced[forced])
+        self._forced = forced
         if sub_board_winner is not None:  # sub-board has a result! check if board has a result.
             if self._is_winner(player, board_position):
                 self.winner = player
@@ -82,6 +142,35 @@ class Board:
                 self.winner = 0
                 return 0  # draw
 
+    def make_move(self, player: int, board_position: Tuple[int, int], sub_board_position: Tuple[int, int]) -> Tuple:
+        """
+        Same as play() but returns an undo token instead of the outcome, so that search can walk the game
+        tree on a single board: make_move() a child, search it, then undo(token) to get the parent back.
+
+        :param player: 1 for X, -1 for O
+        :param board_position: Co-ordinates of the main board
+        :param sub_board_position: Co-ordinates of the position in the sub-board for the given main board.
+        :return: Token to pass to undo(). The outcome is available as self.winner.
+        """
+        token = (board_position, sub_board_position, self.last_move, self._forced, self._hash)
+        self.play(player, board_position, sub_board_position)
+        return token
+
+    def undo(self, token: Tuple) -> None:
+        """
+        Takes back the move that returned :param token. Moves must be undone in the reverse order they were made.
+        Restores winner, turn, last_move, the hash and the sub-board exactly as they were before make_move().
+        """
+        (x, y), sub_board_position, last_move, self._forced, self._hash = token
+        self.grid[x][y].undo(sub_board_position)
+        self._filled -= 1
+        if self._decided >> (x * self.n + y) & 1:  # the sub-board was open before the move
+            self._decided &= ~(1 << (x * self.n + y))
+            self._open += 1
+        self.last_move = last_move
+        self.turn *= -1
+        self.winner = None  # moves can only be made while the game is running
+
     def _process_count(self, player: int, position: Tuple[int, int]) -> int:
         i, j = position
         configs = [[(i, j - 1), '←', (i, j + 1), '→'],
@@ -112,23 +201,39 @@ class Board:
         return result
 
     def get_legal_moves(self) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
-
-        # in the beginning of the game, all moves are legal
-        if self.last_move is None:
-            return sum([[((x, y), (i, j)) for i, j in self.grid[x][y].get_legal_moves()]
-                        for x in range(self.n) for y in range(self.n)], [])
-
-        (_, _), (x, y) = self.last_move  # get the position in the sub-board for the last move
-        if not self.grid[x][y].is_terminal():
-            return [((x, y), (i, j)) for (i, j) in self.grid[x][y].get_legal_moves()]
-
-        # If a player is sent to play on a terminal board, then that player may play in any other board.
-        return sum([[((x, y), (i, j)) for i, j in self.grid[x][y].get_legal_moves()]
-                    for x in range(self.n) for y in range(self.n)], [])
+        """
+        :return: A new list of the legal moves, sub-boards and cells in row-major order
+        """
+        forced = self._forced
+        if forced < self.n * self.n:
+            x, y = divmod(forced, self.n)
+            return list(self._moves.get(forced, self.grid[x][y].empty_mask))
+
+        # At the start of the game, or when sent to a terminal board, the player may play in any open board.
+        moves = []
+        for k in range(self.n * self.n):
+            if not self._decided >> k & 1:
+                moves.extend(self._moves.get(k, self.grid[k // self.n][k % self.n].empty_mask))
+        return moves
+
+    def iter_legal_moves(self) -> Iterator[Tuple[Tuple[int, int], Tuple[int, int]]]:
+        """
+        Yields the legal moves in the same order as get_legal_moves() without building a list, so a search that
+        cuts off early does not generate the remaining moves.
+        Moves made on the board while iterating must be undone before the next move is taken.
+        """
+        forced = self._forced
+        if forced < self.n * self.n:
+            x, y = divmod(forced, self.n)
+            yield from self._moves.get(forced, self.grid[x][y].empty_mask)
+            return
+        for k in range(self.n * self.n):
+            if not self._decided >> k & 1:
+                yield from self._moves.get(k, self.grid[k // self.n][k % self.n].empty_mask)
 
     def is_terminal(self):
         """
         Checks if the game has ended by checking if there is a winner if all boards are terminal
         :return: True if the game has ended
         """
-        return self.winner is not None or all([x.is_terminal() for x in sum(self.grid, [])])
+        return self.winner is not None or self._open == 0
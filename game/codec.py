@@ -0,0 +1,106 @@
+"""
+Compact encoding of positions of the 3x3 game, used to send positions between processes and to store them.
+A position takes SIZE = 24 bytes:
+<ul>
+<li> bytes 0-20: the 81 cells at 2 bits each (0 blank, 1 X, 2 O), cell c of sub-board k in bits 2 * (9 * k + c)
+     of the little-endian number </li>
+<li> byte 21: the last move as 9 * sub_board + cell (see game.moves.encode_move), 255 before the first move </li>
+<li> byte 22: the sub-board the next move is forced into, 9 for a free move </li>
+<li> byte 23: bit 0 set if O is to move, bits 1-2 the winner (0 none yet, 1 X, 2 O, 3 draw) </li>
+</ul>
+Board and BitBoard encode the same position to the same bytes, see Board.to_bytes() and Board.from_bytes().
+encode_batch() and decode_batch() convert many positions to and from one NumPy buffer of shape (N, SIZE), and
+cells_of() reads the cells of a whole buffer at once.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from game.moves import Move, encode_move, decode_move
+
+SIZE = 24
+CELL_BYTES = 21
+NO_MOVE = 255
+FREE = 9
+WINNER_CODES = {None: 0, 1: 1, -1: 2, 0: 3}
+WINNERS = (None, 1, -1, 0)
+
+# SPREAD[mask] moves bit c of a 9-bit mask to bit 2 * c, so the 2-bit cell codes of a sub-board are
+# SPREAD[x_mask] | SPREAD[o_mask] << 1
+SPREAD: Tuple[int, ...] = tuple(sum(1 << 2 * c for c in range(9) if mask >> c & 1) for mask in range(512))
+# STATE_CODES[state] are the cell codes of a sub-board from its base-3 SubBoard.state, whose digits are the same
+_DIGITS = np.arange(3 ** 9)[:, None] // 3 ** np.arange(9) % 3
+STATE_CODES: Tuple[int, ...] = tuple((_DIGITS << 2 * np.arange(9)).sum(axis=1).tolist())
+
+
+def pack(sub_boards: Sequence[int], last_move: Optional[Move], forced: int, turn: int,
+         winner: Optional[int]) -> bytes:
+    """
+    :param sub_boards: The 18-bit cell codes of each sub-board, SPREAD[x_mask] | SPREAD[o_mask] << 1
+    :param last_move: The last move played, None at the start of the game
+    :param forced: The sub-board the next move is forced into, 9 for a free move
+    :param turn: The player to move
+    :param winner: The winner, None while the game is running
+    :return: The SIZE bytes encoding of the position
+    """
+    cells = 0
+    for k in range(8, -1, -1):
+        cells = cells << 18 | sub_boards[k]
+    return cells.to_bytes(CELL_BYTES, 'little') + bytes((
+        NO_MOVE if last_move is None else encode_move(3, last_move),
+        forced,
+        (turn == -1) | WINNER_CODES[winner] << 1))
+
+
+def unpack(data: bytes) -> Tuple[List[Tuple[int, int]], Optional[Move], int, int, Optional[int]]:
+    """
+    Inverse of pack()
+    :return: ([(x_mask, o_mask) of each sub-board], last move, forced sub-board, turn, winner)
+    """
+    assert len(data) == SIZE
+    cells = int.from_bytes(data[:CELL_BYTES], 'little')
+    masks = []
+    for _ in range(9):
+        x_mask = o_mask = 0
+        for c in range(9):
+            code = cells >> 2 * c & 3
+            if code == 1:
+                x_mask |= 1 << c
+            elif code == 2:
+                o_mask |= 1 << c
+        masks.append((x_mask, o_mask))
+        cells >>= 18
+    last, forced, flags = data[CELL_BYTES:]
+    return (masks, None if last == NO_MOVE else decode_move(3, last), forced, -1 if flags & 1 else 1,
+            WINNERS[flags >> 1 & 3])
+
+
+def encode_batch(boards) -> np.ndarray:
+    """
+    :param boards: Boards or BitBoards
+    :return: A (len(boards), SIZE) uint8 buffer holding board.to_bytes() of each board in a row
+    """
+    return np.frombuffer(b''.join(board.to_bytes() for board in boards), dtype=np.uint8).reshape(-1, SIZE)
+
+
+def decode_batch(buffer: np.ndarray, board_type: type) -> list:
+    """
+    Inverse of encode_batch()
+    :param buffer: (N, SIZE) uint8 buffer, or any buffer of N * SIZE bytes
+    :param board_type: Board, BitBoard or any engine with from_bytes()
+    :return: The N boards
+    """
+    data = memoryview(np.ascontiguousarray(buffer, dtype=np.uint8)).cast('B')
+    return [board_type.from_bytes(bytes(data[i:i + SIZE])) for i in range(0, len(data), SIZE)]
+
+
+def cells_of(buffer: np.ndarray) -> np.ndarray:
+    """
+    Decodes the cells of many positions at once, without building boards.
+    :param buffer: (N, SIZE) uint8 buffer
+    :return: (N, 9, 9) int8 array, [n][k][c] being 1 for X, -1 for O and 0 for blank on cell c of sub-board k
+    """
+    data = np.asarray(buffer, dtype=np.uint8).reshape(-1, SIZE)[:, :CELL_BYTES]
+    codes = (data[:, :, None] >> np.arange(0, 8, 2, dtype=np.uint8)) & 3
+    codes = codes.reshape(len(data), 4 * CELL_BYTES)[:, :81].astype(np.int8)
+    return np.where(codes == 2, -1, codes).astype(np.int8).reshape(-1, 9, 9)
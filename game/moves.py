@@ -0,0 +1,68 @@
+"""
+Precomputed legal move tables shared by the game engines.
+The legal moves inside a sub-board only depend on which of its cells are empty, so for every sub-board and
+every empty-cell mask the moves are built once, as a tuple of move tuples in row-major order. Generating moves
+is then a table lookup that hands out the same (interned) tuples every time instead of allocating new ones.
+"""
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+Move = Tuple[Tuple[int, int], Tuple[int, int]]
+
+
+class MoveTable:
+    """
+    Legal moves of a sub-board by its empty-cell mask, bit i * n + j being set when cell (i, j) is empty.
+    Tables of the 3x3 game are filled up front (9 x 512 entries), larger boards fill theirs as masks come up.
+    Copies and pickles refer to the shared table of get_move_table() instead of duplicating it.
+    """
+
+    def __init__(self, n: int):
+        self.n: int = n
+        # cell_moves[k][c] is the move on cell c of sub-board k, the only tuple ever created for that move
+        self.cell_moves: List[List[Move]] = [[((k // n, k % n), (c // n, c % n)) for c in range(n * n)]
+                                             for k in range(n * n)]
+        self.tables: List[Dict[int, Tuple[Move, ...]]] = [{} for _ in range(n * n)]
+        if n <= 3:
+            for k in range(n * n):
+                for empty in range(1 << (n * n)):
+                    self.get(k, empty)
+
+    def get(self, k: int, empty: int) -> Tuple[Move, ...]:
+        """
+        :param k: Index of the sub-board, x * n + y
+        :param empty: Mask of the empty cells of the sub-board
+        :return: The moves on the empty cells, in row-major order
+        """
+        moves = self.tables[k].get(empty)
+        if moves is None:
+            cell_moves = self.cell_moves[k]
+            moves = self.tables[k][empty] = tuple(cell_moves[c] for c in range(self.n * self.n) if empty >> c & 1)
+        return moves
+
+    def __reduce__(self):
+        return get_move_table, (self.n,)
+
+
+def encode_move(n: int, move: Move) -> int:
+    """
+    :return: The move as a single number, sub_board * n * n + cell with both numbered row by row
+    """
+    (x, y), (i, j) = move
+    return (x * n + y) * n * n + i * n + j
+
+
+def decode_move(n: int, value: int) -> Move:
+    """
+    Inverse of encode_move()
+    """
+    k, c = divmod(value, n * n)
+    return (k // n, k % n), (c // n, c % n)
+
+
+@lru_cache(maxsize=None)
+def get_move_table(n: int) -> MoveTable:
+    """
+    :return: The shared move table for boards of size n
+    """
+    return MoveTable(n)
@@ -0,0 +1,122 @@
+"""
+Perft (performance test) for the game engines.
+perft(board, depth) counts the positions reached after exactly depth moves by walking the full game tree with
+make_move()/undo(). The counts only depend on the rules, so comparing them with the stored reference values
+catches move generation bugs, and the time taken gives the engine's raw speed in nodes per second.
+
+Run with: python -m game.perft [--engine board|bitboard] [--depth N]
+"""
+import argparse
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+from game.bitboard import BitBoard
+from game.board import Board
+
+Move = Tuple[Tuple[int, int], Tuple[int, int]]
+
+ENGINES: Dict[str, type] = {
+    'board': Board,
+    'bitboard': BitBoard,
+}
+
+# name -> (moves played from the empty board, {depth: perft count})
+POSITIONS: Dict[str, Tuple[List[Move], Dict[int, int]]] = {
+    'empty': ([], {1: 81, 2: 720, 3: 6336, 4: 55080, 5: 473256, 6: 4020960}),
+    'opening': ([((0, 0), (2, 1)), ((2, 1), (0, 1)), ((0, 1), (0, 1)), ((0, 1), (2, 0)), ((2, 0), (0, 2)),
+                 ((0, 2), (1, 1)), ((1, 1), (1, 1)), ((1, 1), (1, 0)), ((1, 0), (0, 0)), ((0, 0), (0, 2))],
+                {1: 8, 2: 63, 3: 489, 4: 3742, 5: 28361}),
+    # the next move is free: it was sent to sub-board (0, 0), which O has won
+    'free_move': ([((1, 1), (1, 2)), ((1, 2), (0, 2)), ((0, 2), (2, 0)), ((2, 0), (0, 0)), ((0, 0), (0, 1)),
+                   ((0, 1), (2, 2)), ((2, 2), (0, 1)), ((0, 1), (1, 2)), ((1, 2), (0, 0)), ((0, 0), (1, 1)),
+                   ((1, 1), (0, 0)), ((0, 0), (0, 0)), ((0, 0), (2, 0)), ((2, 0), (2, 1)), ((2, 1), (0, 1)),
+                   ((0, 1), (0, 1)), ((0, 1), (0, 0)), ((0, 0), (2, 2)), ((2, 2), (2, 1)), ((2, 1), (0, 0))],
+                  {1: 57, 2: 552, 3: 5246, 4: 48436, 5: 440446}),
+    # two sub-boards are decided
+    'late_game': ([((1, 2), (0, 1)), ((0, 1), (2, 1)), ((2, 1), (2, 1)), ((2, 1), (1, 1)), ((1, 1), (2, 0)),
+                   ((2, 0), (1, 0)), ((1, 0), (2, 1)), ((2, 1), (0, 0)), ((0, 0), (2, 0)), ((2, 0), (1, 2)),
+                   ((1, 2), (1, 1)), ((1, 1), (1, 0)), ((1, 0), (0, 0)), ((0, 0), (1, 1)), ((1, 1), (0, 2)),
+                   ((0, 2), (1, 2)), ((1, 2), (2, 1)), ((2, 1), (0, 2)), ((0, 2), (1, 1)), ((1, 1), (0, 0)),
+                   ((0, 0), (2, 2)), ((2, 2), (1, 0)), ((1, 0), (1, 2)), ((0, 2), (0, 2)), ((0, 2), (0, 0)),
+                   ((0, 0), (0, 1)), ((0, 1), (0, 0)), ((0, 0), (1, 2)), ((2, 0), (0, 2)), ((0, 2), (2, 2))],
+                  {1: 8, 2: 114, 3: 1350, 4: 16162, 5: 178544}),
+    # some lines end the game within the search, they are not counted past the end
+    'endgame': ([((0, 1), (2, 2)), ((2, 2), (0, 1)), ((0, 1), (1, 1)), ((1, 1), (0, 1)), ((0, 1), (1, 0)),
+                 ((1, 0), (2, 1)), ((2, 1), (2, 1)), ((2, 1), (2, 0)), ((2, 0), (1, 0)), ((1, 0), (0, 1)),
+                 ((0, 1), (1, 2)), ((1, 2), (0, 0)), ((0, 0), (2, 0)), ((2, 0), (2, 1)), ((2, 1), (1, 1)),
+                 ((1, 1), (0, 0)), ((0, 0), (2, 2)), ((2, 2), (1, 2)), ((1, 2), (1, 1)), ((1, 1), (2, 0)),
+                 ((2, 0), (0, 0)), ((0, 0), (0, 2)), ((0, 2), (0, 0)), ((0, 0), (0, 0)), ((0, 0), (0, 1)),
+                 ((2, 1), (1, 0)), ((1, 0), (1, 2)), ((1, 2), (0, 1)), ((1, 2), (0, 2)), ((0, 2), (1, 1)),
+                 ((1, 1), (1, 2)), ((1, 2), (1, 0)), ((1, 0), (2, 0)), ((2, 0), (0, 2)), ((0, 2), (2, 2)),
+                 ((2, 2), (1, 1)), ((1, 1), (2, 1)), ((2, 1), (2, 2)), ((2, 2), (0, 2)), ((0, 2), (1, 0)),
+                 ((1, 0), (0, 2)), ((0, 2), (0, 2)), ((0, 2), (2, 1)), ((2, 1), (0, 2)), ((0, 2), (0, 1)),
+                 ((1, 1), (2, 2)), ((2, 2), (2, 2)), ((2, 2), (0, 0)), ((0, 0), (1, 1)), ((1, 1), (1, 1)),
+                 ((2, 2), (2, 1)), ((2, 1), (0, 1)), ((0, 2), (1, 2)), ((1, 2), (2, 1))],
+                {1: 2, 2: 6, 3: 17, 4: 107, 5: 599}),
+}
+
+
+def perft(board, depth: int) -> int:
+    """
+    Counts the leaf nodes of the game tree below :board. Games that end before :depth moves are not counted.
+    The board is restored before returning.
+    :param board: Board, BitBoard or any engine with the same interface
+    :param depth: Number of moves to play
+    :return: Number of move sequences of length :depth
+    """
+    if depth == 0:
+        return 1
+    if board.is_terminal():
+        return 0
+    moves = board.get_legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for board_position, sub_board_position in moves:
+        token = board.make_move(board.turn, board_position, sub_board_position)
+        nodes += perft(board, depth - 1)
+        board.undo(token)
+    return nodes
+
+
+def setup(board_type: type, moves: List[Move]):
+    """
+    :return: A new board of :board_type with :moves played on it
+    """
+    board = board_type()
+    for board_position, sub_board_position in moves:
+        board.play(board.turn, board_position, sub_board_position)
+    return board
+
+
+def run(board_type: type, max_depth: int) -> bool:
+    """
+    Runs perft to :max_depth on every position of POSITIONS and prints the counts, timings and nodes per second.
+    :return: True if every count with a stored reference value matched it
+    """
+    ok = True
+    for name, (moves, expected) in POSITIONS.items():
+        board = setup(board_type, moves)
+        for depth in range(1, max_depth + 1):
+            start = perf_counter()
+            nodes = perft(board, depth)
+            duration = perf_counter() - start
+            reference = expected.get(depth)
+            if reference is None:
+                status = 'no reference'
+            elif reference == nodes:
+                status = 'ok'
+            else:
+                status = f'MISMATCH, expected {reference}'
+                ok = False
+            nps = nodes / duration if duration > 0 else float('inf')
+            print(f'{name:<10} depth {depth}: {nodes:>10} nodes {duration:8.3f}s {nps:>12.0f} nodes/s  {status}')
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Counts leaf nodes of the game tree to check and time an engine.')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='board', help='game engine to test')
+    parser.add_argument('--depth', type=int, default=4, help='maximum depth to search')
+    args = parser.parse_args()
+    raise SystemExit(0 if run(ENGINES[args.engine], args.depth) else 1)
@@ -1,7 +1,21 @@
+from functools import lru_cache
 from typing import Tuple, Optional, List
 
 import numpy as np
 
+from game.zobrist import get_keys, piece_index
+
+
+@lru_cache(maxsize=None)
+def get_lines(n: int) -> Tuple[int, ...]:
+    """
+    :return: The rows, columns and diagonals of an n x n grid as masks, bit i * n + j standing for cell (i, j)
+    """
+    rows = [sum(1 << (i * n + j) for j in range(n)) for i in range(n)]
+    columns = [sum(1 << (i * n + j) for i in range(n)) for j in range(n)]
+    diagonals = [sum(1 << (i * n + i) for i in range(n)), sum(1 << (i * n + n - 1 - i) for i in range(n))]
+    return tuple(rows + columns + diagonals)
+
 
 class SubBoard:
     """
@@ -12,12 +26,19 @@ class SubBoard:
     <li> O is represented by -1 </li>
     <li> blank is represented by 0 </li>
     </ul>
+    The sub-board keeps a Zobrist hash of its cells, using the keys of its :param index on the main board.
     """
 
-    def __init__(self, n: int):
+    def __init__(self, n: int, index: int = 0):
         self.n: int = n
         self.grid = np.array([[0 for _ in range(n)] for __ in range(n)], dtype=np.byte)
         self.winner: Optional[int] = None
+        self._keys: List[Tuple[int, int]] = get_keys(n).cells[index]
+        self._hash: int = 0
+        self._powers: List[int] = [3 ** k for k in range(n * n)]
+        self.state: int = 0  # base-3 number with digit i * n + j = 0 for blank, 1 for X, 2 for O at cell (i, j)
+        self.filled: int = 0  # number of non-blank cells
+        self.empty_mask: int = (1 << (n * n)) - 1  # bit i * n + j is set while cell (i, j) is blank
 
     def __repr__(self):
         return f'{self.grid}'
@@ -25,14 +46,25 @@ class SubBoard:
     def get_grid(self):
         return self.grid
 
+    @property
+    def zobrist_hash(self) -> int:
+        """
+        :return: XOR of the Zobrist keys of the pieces on this sub-board
+        """
+        return self._hash
+
     def is_board_full(self) -> bool:
-        return np.count_nonzero(self.grid) == (self.n ** 2)
+        return self.filled == self.n * self.n
 
     def play(self, player: int, position: Tuple[int, int]) -> Optional[int]:
         i, j = position
         assert self.grid[i][j] == 0  # can play only on blank cells
         assert self.winner is None  # can not play on a board after it's won
         self.grid[i][j] = player
+        self.filled += 1
+        self.empty_mask &= ~(1 << (i * self.n + j))
+        self._hash ^= self._keys[i * self.n + j][piece_index(player)]
+        self.state += (piece_index(player) + 1) * self._powers[i * self.n + j]
         if self.is_winner(player, position):
             self.winner = player
             return self.winner
@@ -40,6 +72,48 @@ class SubBoard:
             self.winner = 0
             return 0  # draw
 
+    def set_cells(self, x_mask: int, o_mask: int) -> None:
+        """
+        Sets every cell at once, bit i * n + j of :param x_mask or :param o_mask marking an X or an O at (i, j).
+        The winner is worked out from the cells. Used to rebuild a sub-board without replaying its moves.
+        """
+        self.grid[:] = 0
+        self._hash = self.state = self.filled = 0
+        self.empty_mask = (1 << (self.n * self.n)) - 1
+        self.winner = None
+        for cell in range(self.n * self.n):
+            player = 1 if x_mask >> cell & 1 else (-1 if o_mask >> cell & 1 else 0)
+            if player:
+                self.grid[cell // self.n][cell % self.n] = player
+                self.filled += 1
+                self.empty_mask &= ~(1 << cell)
+                self._hash ^= self._keys[cell][piece_index(player)]
+                self.state += (piece_index(player) + 1) * self._powers[cell]
+        for line in get_lines(self.n):
+            if x_mask & line == line:
+                self.winner = 1
+                return
+            if o_mask & line == line:
+                self.winner = -1
+                return
+        if self.is_board_full():
+            self.winner = 0
+
+    def undo(self, position: Tuple[int, int]) -> None:
+        """
+        Takes back the move at :param position. Only the most recent move of a sub-board can be undone,
+        and a board can only have been played on while it had no winner, so the winner is cleared.
+        """
+        i, j = position
+        player = int(self.grid[i][j])
+        assert player != 0
+        self._hash ^= self._keys[i * self.n + j][piece_index(player)]
+        self.state -= (piece_index(player) + 1) * self._powers[i * self.n + j]
+        self.grid[i][j] = 0
+        self.filled -= 1
+        self.empty_mask |= 1 << (i * self.n + j)
+        self.winner = None
+
     def process_count(self, player: int, position: Tuple[int, int]) -> int:
         i, j = position
         configs = [[(i, j - 1), '←', (i, j + 1), '→'],
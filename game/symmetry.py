@@ -0,0 +1,113 @@
+"""
+The 8 symmetries of the board (rotations and reflections of the square).
+A symmetry is applied to the main grid and, in the same way, to every sub-board: the piece on cell (i, j) of
+sub-board (x, y) moves to cell t(i, j) of sub-board t(x, y). The rules are the same under every symmetry, so
+transformed positions have transformed legal moves, including the sub-board the next move is forced into.
+
+canonical_form() picks one representative of the (up to) 8 equivalent positions, so caches keyed on it store
+each position once.
+"""
+from functools import lru_cache
+from typing import Callable, List, Tuple
+
+from game.zobrist import get_keys, piece_index
+
+Move = Tuple[Tuple[int, int], Tuple[int, int]]
+
+# Transform t maps (i, j) of an n x n grid to TRANSFORMS[t](i, j, n)
+TRANSFORMS: Tuple[Callable[[int, int, int], Tuple[int, int]], ...] = (
+    lambda i, j, n: (i, j),  # identity
+    lambda i, j, n: (j, n - 1 - i),  # rotate 90 degrees clockwise
+    lambda i, j, n: (n - 1 - i, n - 1 - j),  # rotate 180 degrees
+    lambda i, j, n: (n - 1 - j, i),  # rotate 270 degrees clockwise
+    lambda i, j, n: (i, n - 1 - j),  # mirror left to right
+    lambda i, j, n: (n - 1 - i, j),  # mirror top to bottom
+    lambda i, j, n: (j, i),  # mirror on the main diagonal
+    lambda i, j, n: (n - 1 - j, n - 1 - i),  # mirror on the anti-diagonal
+)
+IDENTITY = 0
+# INVERSE[t] undoes transform t. The rotations by 90 and 270 degrees undo each other, the rest undo themselves.
+INVERSE: Tuple[int, ...] = (0, 3, 2, 1, 4, 5, 6, 7)
+
+
+class SymmetryTables:
+    """
+    Per board size lookups for the transforms: index permutations and the Zobrist keys of transformed positions.
+    """
+
+    def __init__(self, n: int):
+        self.n: int = n
+        # perm[t][x * n + y] is the index of t(x, y), used for sub-boards and cells alike
+        self.perm: List[List[int]] = [[a * n + b for a, b in (t(k // n, k % n, n) for k in range(n * n))]
+                                      for t in TRANSFORMS]
+        keys = get_keys(n)
+        self.turn: int = keys.turn
+        # cells[t][k][c] are the keys of the cell that (k, c) moves to under t, forced[t][f] likewise
+        self.cells: List[List[List[Tuple[int, int]]]] = [[[keys.cells[p[k]][p[c]] for c in range(n * n)]
+                                                          for k in range(n * n)] for p in self.perm]
+        self.forced: List[List[int]] = [[keys.forced[p[f]] for f in range(n * n)] + [keys.forced[n * n]]
+                                        for p in self.perm]
+
+
+@lru_cache(maxsize=None)
+def get_tables(n: int) -> SymmetryTables:
+    """
+    :return: The shared symmetry tables for boards of size n
+    """
+    return SymmetryTables(n)
+
+
+def transform_move(move: Move, transform: int, n: int = 3) -> Move:
+    """
+    :return: The move that corresponds to :move on the board transformed by :transform
+    """
+    (x, y), (i, j) = move
+    t = TRANSFORMS[transform]
+    return t(x, y, n), t(i, j, n)
+
+
+def transformed_hashes(board) -> List[int]:
+    """
+    :param board: Board, BitBoard or any engine with the same interface
+    :return: For each transform t, the Zobrist hash of the board transformed by t. Entry 0 is board.zobrist_hash.
+    """
+    n = board.n
+    tables = get_tables(n)
+    grid = board.get_grid()
+    forced = n * n
+    if board.last_move is not None:
+        (_, _), (i, j) = board.last_move
+        if not grid[i][j].is_terminal():
+            forced = i * n + j
+
+    pieces = []  # (sub-board, cell, piece index) of every piece
+    for k in range(n * n):
+        cells = grid[k // n][k % n].get_grid()
+        for c in range(n * n):
+            value = int(cells[c // n][c % n])
+            if value:
+                pieces.append((k, c, piece_index(value)))
+
+    hashes = []
+    for t in range(len(TRANSFORMS)):
+        h = tables.forced[t][forced]
+        if board.turn == -1:
+            h ^= tables.turn
+        cell_keys = tables.cells[t]
+        for k, c, p in pieces:
+            h ^= cell_keys[k][c][p]
+        hashes.append(h)
+    return hashes
+
+
+def canonical_form(board) -> Tuple[int, int]:
+    """
+    Finds the canonical form of the position: the transform whose transformed position has the smallest hash.
+    Equivalent positions share the key. To use a move stored for the key on :board, map it back with
+    transform_move(move, INVERSE[transform]); to store a move of :board, map it with transform_move(move, transform).
+    :param board: Board, BitBoard or any engine with the same interface
+    :return: (key, transform) with the key being the Zobrist hash of the canonical position
+    """
+    hashes = transformed_hashes(board)
+    transform = min(range(len(hashes)), key=hashes.__getitem__)
+    return hashes[transform], transform
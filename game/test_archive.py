@@ -0,0 +1,103 @@
+import os
+import random
+import tempfile
+import unittest
+
+from agent.random_agent import RandomAgent
+from game.archive import ArchiveWriter, GameArchive, GameRecord, INDEX_SUFFIX, rebuild_index
+from game.bitboard import BitBoard
+from game.board import Board
+from playground.evaluator import evaluate
+
+
+def random_game(rng: random.Random) -> GameRecord:
+    board, moves = Board(), []
+    while not board.is_terminal():
+        moves.append(rng.choice(board.get_legal_moves()))
+        board.play(board.turn, *moves[-1])
+    return GameRecord.from_moves(moves, {'result': board.winner, 'times': [0.5] * len(moves)})
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'games.uga')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        rng = random.Random(1)
+        games = [random_game(rng) for _ in range(50)]
+        with ArchiveWriter(self.path, generation=3) as writer:
+            writer.extend(games[:20])
+        with ArchiveWriter(self.path) as writer:  # appends to the existing archive
+            writer.extend(games[20:])
+        with GameArchive(self.path) as archive:
+            self.assertEqual(len(archive), len(games))
+            for game, record in zip(games, archive):
+                self.assertEqual(record.moves, game.moves)
+                self.assertEqual(record.get_moves(), game.get_moves())
+                self.assertEqual(record.result, game.result)
+                self.assertEqual(record.metadata['times'], game.metadata['times'])
+            self.assertEqual(archive[0].metadata['generation'], 3)
+            self.assertNotIn('generation', archive[-1].metadata)
+            self.assertEqual(archive.moves(7), games[7].moves)
+
+    def test_replay(self):
+        record = random_game(random.Random(2))
+        with ArchiveWriter(self.path) as writer:
+            writer.append(record)
+        with GameArchive(self.path) as archive:
+            board = Board()
+            for ply, move in enumerate(record.get_moves()):
+                self.assertEqual(archive.replay(0, ply).to_bytes(), board.to_bytes())
+                board.play(board.turn, *move)
+            self.assertEqual(archive.replay(0).to_bytes(), board.to_bytes())
+            self.assertEqual(archive.replay(0, board_type=BitBoard).winner, record.result)
+
+    def test_recovery(self):
+        rng = random.Random(3)
+        with ArchiveWriter(self.path) as writer:
+            writer.extend([random_game(rng) for _ in range(5)])
+        # a crash after the last game was written but before its offset was, and in the middle of another game
+        index_path = self.path + INDEX_SUFFIX
+        os.truncate(index_path, os.path.getsize(index_path) - 8)
+        with open(self.path, 'ab') as f:
+            f.write(random_game(rng).to_bytes()[:10])
+        with ArchiveWriter(self.path) as writer:
+            writer.append(random_game(rng))
+        with GameArchive(self.path) as archive:
+            self.assertEqual(len(archive), 6)
+            self.assertTrue(all(record.replay().is_terminal() for record in archive))
+
+        os.remove(index_path)
+        self.assertEqual(rebuild_index(self.path), 6)
+        with GameArchive(self.path) as archive:
+            self.assertEqual(len(archive), 6)
+
+    def test_truncate(self):
+        rng = random.Random(5)
+        games = [random_game(rng) for _ in range(6)]
+        with ArchiveWriter(self.path) as writer:
+            writer.extend(games[:4])
+            self.assertEqual(len(writer), 4)
+            writer.truncate(2)
+            self.assertEqual(len(writer), 2)
+            writer.extend(games[4:])
+        with GameArchive(self.path) as archive:
+            self.assertEqual([record.moves for record in archive], [game.moves for game in games[:2] + games[4:]])
+
+    def test_evaluate(self):
+        games = []
+        a, b = RandomAgent(), RandomAgent()
+        evaluate(a, b, num_games=4, seed=4, archive=games)
+        self.assertEqual(len(games), 4)
+        for record in games:
+            self.assertEqual(record.replay().winner, record.result)
+            self.assertEqual(len(record.metadata['times']), len(record))
+            self.assertEqual(record.metadata['x']['type'], 'RandomAgent')
+
+
+if __name__ == '__main__':
+    unittest.main()
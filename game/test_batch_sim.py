@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from game.batch_sim import play_random_games
+from game.bitboard import BitBoard
+from game.board import Board
+from game.moves import decode_move
+from game.perft import POSITIONS, setup
+
+
+class TestBatchSim(unittest.TestCase):
+    def replay(self, moves, outcomes, lengths, played=()):
+        # every recorded game must be legal move by move on Board, end on its last move and have the same result
+        for g in range(len(outcomes)):
+            b = setup(Board, played)
+            for ply in range(lengths[g]):
+                self.assertFalse(b.is_terminal())
+                move = decode_move(3, int(moves[g][ply]))
+                self.assertIn(move, b.get_legal_moves())
+                b.play(b.turn, *move)
+            self.assertTrue(b.is_terminal())
+            self.assertEqual(b.winner, outcomes[g])
+            self.assertTrue((moves[g][lengths[g]:] == -1).all())
+
+    def test_agrees_with_board(self):
+        outcomes, lengths, moves = play_random_games(300, seed=1, record_moves=True)
+        self.replay(moves, outcomes, lengths)
+        self.assertEqual(set(outcomes.tolist()), {1, -1, 0})
+
+    def test_start_position(self):
+        for name in ('free_move', 'late_game', 'endgame'):
+            played, _ = POSITIONS[name]
+            for board_type in (Board, BitBoard):
+                with self.subTest(position=name, engine=board_type.__name__):
+                    outcomes, lengths, moves = play_random_games(50, seed=2, start=setup(board_type, played),
+                                                                 record_moves=True)
+                    self.replay(moves, outcomes, lengths, played)
+
+    def test_seed(self):
+        first = play_random_games(100, seed=7, record_moves=True)
+        second = play_random_games(100, seed=7, record_moves=True)
+        for a, b in zip(first, second):
+            np.testing.assert_array_equal(a, b)
+        self.assertIsNone(play_random_games(10, seed=7)[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
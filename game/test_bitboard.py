@@ -0,0 +1,71 @@
+import random
+import unittest
+
+from game.bitboard import BitBoard, WIN_TABLE
+from game.board import Board
+
+
+class TestBitBoard(unittest.TestCase):
+    def test_win_table(self):
+        self.assertTrue(WIN_TABLE[0b000000111])
+        self.assertTrue(WIN_TABLE[0b100010001])
+        self.assertTrue(WIN_TABLE[0b001010100 | 0b000000010])
+        self.assertFalse(WIN_TABLE[0])
+        self.assertFalse(WIN_TABLE[0b110001110])  # five cells without a line
+        self.assertEqual(sum(WIN_TABLE), 282)
+
+    def test_game_initialization(self):
+        b = BitBoard()
+        self.assertEqual(b.turn, 1)
+        self.assertEqual(b.get_legal_moves(), Board().get_legal_moves())
+        self.assertIsNone(b.last_move)
+        self.assertIsNone(b.winner)
+        self.assertFalse(b.is_board_full())
+        self.assertFalse(b.is_terminal())
+
+    def test_matches_board_on_random_games(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            board, bit_board = Board(), BitBoard()
+            while not board.is_terminal():
+                self.assertFalse(bit_board.is_terminal())
+                moves = board.get_legal_moves()
+                self.assertEqual(bit_board.get_legal_moves(), moves)
+                (x, y), (i, j) = rng.choice(moves)
+                self.assertEqual(bit_board.play(board.turn, (x, y), (i, j)), board.play(board.turn, (x, y), (i, j)))
+                self.assertEqual(bit_board.turn, board.turn)
+                self.assertEqual(bit_board.last_move, board.last_move)
+            self.assertTrue(bit_board.is_terminal())
+            self.assertEqual(bit_board.winner, board.winner)
+            self.assertEqual(bit_board.is_board_full(), board.is_board_full())
+            for row, bit_row in zip(board.get_grid(), bit_board.get_grid()):
+                for sub_board, bit_sub_board in zip(row, bit_row):
+                    self.assertEqual(bit_sub_board.winner, sub_board.winner)
+                    self.assertEqual(bit_sub_board.get_grid(), sub_board.get_grid().tolist())
+                    self.assertEqual(bit_sub_board.state, sub_board.state)
+
+    def test_make_move_undo_round_trip(self):
+        rng = random.Random(11)
+        for _ in range(50):
+            b = BitBoard()
+            snapshots, tokens = [], []
+            while not b.is_terminal():
+                snapshots.append((b.x_masks[:], b.o_masks[:], b.macro_x, b.macro_o, b.macro_draw,
+                                  b.winner, b.turn, b.last_move, b.get_legal_moves()))
+                tokens.append(b.make_move(b.turn, *rng.choice(b.get_legal_moves())))
+            while tokens:
+                b.undo(tokens.pop())
+                self.assertEqual((b.x_masks, b.o_masks, b.macro_x, b.macro_o, b.macro_draw,
+                                  b.winner, b.turn, b.last_move, b.get_legal_moves()), snapshots.pop())
+
+    def test_illegal_moves(self):
+        b = BitBoard()
+        b.play(1, (0, 0), (1, 1))
+        with self.assertRaises(AssertionError):
+            b.play(1, (1, 1), (0, 0))  # not X's turn
+        with self.assertRaises(AssertionError):
+            b.play(-1, (0, 0), (1, 1))  # cell taken
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,83 @@
+import random
 import unittest
 
 from game.board import Board
 
+# (player, board_position, sub_board_position) of a full game that X wins on the last move
+SIMPLE_GAME = [
+    (1, (0, 0), (1, 2)),
+    (-1, (1, 2), (1, 1)),
+    (1, (1, 1), (0, 2)),
+    (-1, (0, 2), (2, 0)),
+    (1, (2, 0), (0, 0)),
+    (-1, (0, 0), (1, 0)),
+    (1, (1, 0), (2, 1)),
+    (-1, (2, 1), (2, 1)),
+    (1, (2, 1), (2, 0)),
+    (-1, (2, 0), (1, 2)),
+    (1, (1, 2), (0, 1)),
+    (-1, (0, 1), (0, 0)),
+    (1, (0, 0), (1, 1)),
+    (-1, (1, 1), (1, 2)),
+    (1, (1, 2), (2, 1)),
+    (-1, (2, 1), (2, 2)),
+    (1, (2, 2), (2, 0)),
+    (-1, (2, 0), (1, 0)),
+    (1, (1, 0), (1, 1)),
+    (-1, (1, 1), (2, 2)),
+    (1, (2, 2), (1, 0)),
+    (-1, (1, 0), (0, 0)),
+    (1, (0, 0), (2, 2)),
+    (-1, (2, 2), (1, 2)),
+    (1, (1, 2), (1, 0)),
+    (-1, (1, 0), (1, 2)),
+    (1, (1, 2), (2, 2)),
+    (-1, (2, 2), (1, 1)),
+    (1, (1, 1), (1, 1)),
+    (-1, (1, 1), (0, 0)),
+    (1, (0, 0), (2, 1)),
+    (-1, (2, 1), (1, 0)),
+    (1, (1, 0), (0, 2)),
+    (-1, (0, 2), (0, 1)),
+    (1, (0, 1), (0, 1)),
+    (-1, (0, 1), (2, 1)),
+    (1, (2, 1), (1, 1)),
+    (-1, (1, 1), (2, 0)),
+    (1, (2, 0), (2, 2)),
+    (-1, (2, 2), (0, 1)),
+    (1, (0, 1), (1, 0)),
+    (-1, (1, 0), (2, 2)),
+    (1, (2, 2), (2, 1)),
+    (-1, (2, 1), (1, 2)),
+    (1, (1, 2), (0, 2)),
+    (-1, (0, 2), (1, 2)),
+    (1, (1, 2), (2, 0)),
+    (-1, (2, 0), (2, 1)),
+    (1, (2, 1), (0, 0)),
+    (-1, (0, 0), (0, 2)),
+    (1, (0, 2), (1, 1)),
+    (-1, (1, 1), (2, 1)),
+    (1, (2, 1), (0, 1)),
+    (-1, (0, 1), (0, 2)),
+    (1, (0, 2), (2, 2)),
+    (-1, (2, 2), (2, 2)),
+    (1, (2, 2), (0, 0)),
+    (-1, (0, 0), (0, 1)),
+    (1, (0, 1), (2, 2)),
+    (-1, (1, 0), (1, 0)),
+    (1, (1, 0), (2, 0)),
+    (-1, (2, 0), (0, 2)),
+    (1, (0, 2), (1, 0)),
+    (-1, (0, 2), (0, 2)),
+    (1, (0, 2), (0, 0))
+]
+
+
+def snapshot(b: Board):
+    return ([[sub_board.get_grid().tolist() for sub_board in row] for row in b.get_grid()],
+            [[sub_board.winner for sub_board in row] for row in b.get_grid()],
+            b.winner, b.turn, b.last_move, b.get_legal_moves(), b.is_terminal(), b.is_board_full())
+
 
 class TestBoard(unittest.TestCase):
     def test_game_initialization(self):
@@ -23,74 +99,54 @@ class TestBoard(unittest.TestCase):
         self.assertFalse(b.is_board_full())
         self.assertFalse(b.is_terminal())
 
-        b.play(1, (0, 0), (1, 2))
-        b.play(-1, (1, 2), (1, 1))
-        b.play(1, (1, 1), (0, 2))
-        b.play(-1, (0, 2), (2, 0))
-        b.play(1, (2, 0), (0, 0))
-        b.play(-1, (0, 0), (1, 0))
-        b.play(1, (1, 0), (2, 1))
-        b.play(-1, (2, 1), (2, 1))
-        b.play(1, (2, 1), (2, 0))
-        b.play(-1, (2, 0), (1, 2))
-        b.play(1, (1, 2), (0, 1))
-        b.play(-1, (0, 1), (0, 0))
-        b.play(1, (0, 0), (1, 1))
-        b.play(-1, (1, 1), (1, 2))
-        b.play(1, (1, 2), (2, 1))
-        b.play(-1, (2, 1), (2, 2))
-        b.play(1, (2, 2), (2, 0))
-        b.play(-1, (2, 0), (1, 0))
-        b.play(1, (1, 0), (1, 1))
-        b.play(-1, (1, 1), (2, 2))
-        b.play(1, (2, 2), (1, 0))
-        b.play(-1, (1, 0), (0, 0))
-        b.play(1, (0, 0), (2, 2))
-        b.play(-1, (2, 2), (1, 2))
-        b.play(1, (1, 2), (1, 0))
-        b.play(-1, (1, 0), (1, 2))
-        b.play(1, (1, 2), (2, 2))
-        b.play(-1, (2, 2), (1, 1))
-        b.play(1, (1, 1), (1, 1))
-        b.play(-1, (1, 1), (0, 0))
-        b.play(1, (0, 0), (2, 1))
-        b.play(-1, (2, 1), (1, 0))
-        b.play(1, (1, 0), (0, 2))
-        b.play(-1, (0, 2), (0, 1))
-        b.play(1, (0, 1), (0, 1))
-        b.play(-1, (0, 1), (2, 1))
-        b.play(1, (2, 1), (1, 1))
-        b.play(-1, (1, 1), (2, 0))
-        b.play(1, (2, 0), (2, 2))
-        b.play(-1, (2, 2), (0, 1))
-        b.play(1, (0, 1), (1, 0))
-        b.play(-1, (1, 0), (2, 2))
-        b.play(1, (2, 2), (2, 1))
-        b.play(-1, (2, 1), (1, 2))
-        b.play(1, (1, 2), (0, 2))
-        b.play(-1, (0, 2), (1, 2))
-        b.play(1, (1, 2), (2, 0))
-        b.play(-1, (2, 0), (2, 1))
-        b.play(1, (2, 1), (0, 0))
-        b.play(-1, (0, 0), (0, 2))
-        b.play(1, (0, 2), (1, 1))
-        b.play(-1, (1, 1), (2, 1))
-        b.play(1, (2, 1), (0, 1))
-        b.play(-1, (0, 1), (0, 2))
-        b.play(1, (0, 2), (2, 2))
-        b.play(-1, (2, 2), (2, 2))
-        b.play(1, (2, 2), (0, 0))
-        b.play(-1, (0, 0), (0, 1))
-        b.play(1, (0, 1), (2, 2))
-        b.play(-1, (1, 0), (1, 0))
-        b.play(1, (1, 0), (2, 0))
-        b.play(-1, (2, 0), (0, 2))
-        b.play(1, (0, 2), (1, 0))
-        b.play(-1, (0, 2), (0, 2))
-        w = b.play(1, (0, 2), (0, 0))
+        for player, board_position, sub_board_position in SIMPLE_GAME[:-1]:
+            b.play(player, board_position, sub_board_position)
+        w = b.play(*SIMPLE_GAME[-1])
         self.assertEqual(w, 1)
         self.assertTrue(b.is_terminal())
 
+    def test_make_move_undo_round_trip(self):
+        b = Board(3)
+        snapshots, tokens = [], []
+        for player, board_position, sub_board_position in SIMPLE_GAME:
+            snapshots.append(snapshot(b))
+            tokens.append(b.make_move(player, board_position, sub_board_position))
+        self.assertEqual(b.winner, 1)
+        while tokens:
+            b.undo(tokens.pop())
+            self.assertEqual(snapshot(b), snapshots.pop())
+
+        # undo in the middle of the game and replay a different move
+        b = Board(3)
+        for player, board_position, sub_board_position in SIMPLE_GAME[:10]:
+            b.play(player, board_position, sub_board_position)
+        before = snapshot(b)
+        for move in b.get_legal_moves():
+            token = b.make_move(b.turn, *move)
+            b.undo(token)
+            self.assertEqual(snapshot(b), before)
+
+    def test_status_counters(self):
+        # The counters kept by play() and undo() must agree with the sub-boards themselves
+        def check(b: Board):
+            sub_boards = sum(b.grid, [])
+            self.assertEqual(b.is_terminal(), b.winner is not None or all(x.is_terminal() for x in sub_boards))
+            self.assertEqual(b.is_board_full(), all(x.is_board_full() for x in sub_boards))
+            for x in sub_boards:
+                self.assertEqual(x.filled, int((x.get_grid() != 0).sum()))
+
+        rng = random.Random(11)
+        for _ in range(30):
+            b = Board(3)
+            tokens = []
+            check(b)
+            while not b.is_terminal():
+                tokens.append(b.make_move(b.turn, *rng.choice(b.get_legal_moves())))
+                check(b)
+            while tokens:
+                b.undo(tokens.pop())
+                check(b)
+
 
 if __name__ == '__main__':
     unittest.main()
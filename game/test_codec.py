@@ -0,0 +1,69 @@
+import random
+import unittest
+
+import numpy as np
+
+from game import codec
+from game.bitboard import BitBoard
+from game.board import Board
+
+
+def random_positions(count: int, seed: int):
+    # positions of random games played on both engines, up to and including the end of each game
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board, bit_board = Board(), BitBoard()
+        positions.append((board.to_bytes(), bit_board.to_bytes(), board.zobrist_hash))
+        while not board.is_terminal():
+            move = rng.choice(board.get_legal_moves())
+            board.play(board.turn, *move)
+            bit_board.play(bit_board.turn, *move)
+            positions.append((board.to_bytes(), bit_board.to_bytes(), board.zobrist_hash))
+    return positions
+
+
+class TestCodec(unittest.TestCase):
+    def test_engines_agree(self):
+        for data, bit_data, _ in random_positions(500, 1):
+            self.assertEqual(len(data), codec.SIZE)
+            self.assertEqual(data, bit_data)
+
+    def test_round_trip(self):
+        rng = random.Random(2)
+        for board_type in (Board, BitBoard):
+            board = board_type()
+            while True:
+                copy = board_type.from_bytes(board.to_bytes())
+                self.assertEqual(copy.to_bytes(), board.to_bytes())
+                self.assertEqual(copy.zobrist_hash, board.zobrist_hash)
+                self.assertEqual((copy.last_move, copy.turn, copy.winner), (board.last_move, board.turn, board.winner))
+                self.assertEqual(copy.is_terminal(), board.is_terminal())
+                self.assertEqual(copy.get_legal_moves(), board.get_legal_moves())
+                if board.is_terminal():
+                    break
+                move = rng.choice(board.get_legal_moves())
+                board.play(board.turn, *move)
+                copy.play(copy.turn, *move)  # a decoded board plays on like the original
+                self.assertEqual(copy.to_bytes(), board.to_bytes())
+
+    def test_cross_engine(self):
+        for data, _, key in random_positions(300, 3):
+            self.assertEqual(BitBoard.from_bytes(data).zobrist_hash, key)
+            self.assertEqual(Board.from_bytes(data).zobrist_hash, key)
+
+    def test_batch(self):
+        positions = [data for data, _, _ in random_positions(200, 4)]
+        boards = [Board.from_bytes(data) for data in positions]
+        buffer = codec.encode_batch(boards)
+        self.assertEqual(buffer.shape, (len(boards), codec.SIZE))
+        self.assertEqual([board.to_bytes() for board in codec.decode_batch(buffer, BitBoard)], positions)
+        cells = codec.cells_of(buffer)
+        for board, board_cells in zip(boards, cells):
+            grid = board.get_grid()
+            expected = [[int(grid[k // 3][k % 3].get_grid()[c // 3][c % 3]) for c in range(9)] for k in range(9)]
+            np.testing.assert_array_equal(board_cells, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
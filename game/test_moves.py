@@ -0,0 +1,48 @@
+import pickle
+import random
+import unittest
+from copy import deepcopy
+
+from game.bitboard import BitBoard
+from game.board import Board
+from game.moves import MoveTable, get_move_table
+
+
+class TestMoves(unittest.TestCase):
+    def test_move_table(self):
+        table = get_move_table(3)
+        self.assertIs(table, get_move_table(3))
+        self.assertEqual(table.get(4, 0b111111111), tuple(((1, 1), (i, j)) for i in range(3) for j in range(3)))
+        self.assertEqual(table.get(0, 0), ())
+        self.assertEqual(table.get(5, 0b100000010), (((1, 2), (0, 1)), ((1, 2), (2, 2))))
+        # every mask hands out the same tuple for a move
+        self.assertIs(table.get(5, 0b100000010)[1], table.get(5, 0b100000000)[0])
+
+    def test_lazy_table(self):
+        table = MoveTable(4)
+        self.assertEqual(table.get(15, 0b1000000000000001), (((3, 3), (0, 0)), ((3, 3), (3, 3))))
+        self.assertEqual(len(table.tables[15]), 1)
+
+    def test_iter_legal_moves(self):
+        rng = random.Random(5)
+        for board_type in (Board, BitBoard):
+            for _ in range(20):
+                b = board_type()
+                while not b.is_terminal():
+                    moves = b.get_legal_moves()
+                    self.assertEqual(list(b.iter_legal_moves()), moves)
+                    b.play(b.turn, *rng.choice(moves))
+
+    def test_copies_share_tables(self):
+        for board_type in (Board, BitBoard):
+            b = board_type()
+            b.play(1, (1, 1), (0, 2))
+            for copy in (deepcopy(b), pickle.loads(pickle.dumps(b))):
+                self.assertIs(copy._moves, get_move_table(3))
+                self.assertIs(copy._keys, b._keys)
+                self.assertEqual(copy.zobrist_hash, b.zobrist_hash)
+                self.assertEqual(copy.get_legal_moves(), b.get_legal_moves())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from game.perft import ENGINES, POSITIONS, perft, setup
+
+
+class TestPerft(unittest.TestCase):
+    def test_reference_counts(self):
+        # Board is slow, so only the shallow counts are checked for every engine
+        for engine, board_type in ENGINES.items():
+            for name, (moves, expected) in POSITIONS.items():
+                board = setup(board_type, moves)
+                for depth in range(1, 4):
+                    with self.subTest(engine=engine, position=name, depth=depth):
+                        self.assertEqual(perft(board, depth), expected[depth])
+
+    def test_board_is_restored(self):
+        for board_type in ENGINES.values():
+            moves, _ = POSITIONS['late_game']
+            board = setup(board_type, moves)
+            before = (board.zobrist_hash, board.last_move, board.turn, board.get_legal_moves())
+            perft(board, 3)
+            self.assertEqual((board.zobrist_hash, board.last_move, board.turn, board.get_legal_moves()), before)
+
+    def test_depth_zero(self):
+        for board_type in ENGINES.values():
+            self.assertEqual(perft(board_type(), 0), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
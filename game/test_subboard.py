@@ -34,6 +34,15 @@ class TestSubBoard(unittest.TestCase):
 
         self.assertEqual(b.play(1, (4, 0)), 1)
 
+    def test_state(self):
+        b = SubBoard(3)
+        self.assertEqual(b.state, 0)
+        b.play(1, (0, 0))
+        b.play(-1, (1, 2))
+        self.assertEqual(b.state, 1 + 2 * 3 ** 5)
+        b.undo((1, 2))
+        self.assertEqual(b.state, 1)
+
 
 if __name__ == '__main__':
     unittest.main()
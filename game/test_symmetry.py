@@ -0,0 +1,58 @@
+import random
+import unittest
+
+from game.bitboard import BitBoard
+from game.board import Board
+from game.symmetry import TRANSFORMS, INVERSE, IDENTITY, canonical_form, transform_move, transformed_hashes
+
+
+class TestSymmetry(unittest.TestCase):
+    def test_inverse(self):
+        for n in (3, 4):
+            for t in range(len(TRANSFORMS)):
+                for x in range(n):
+                    for y in range(n):
+                        move = ((x, y), (y, x))
+                        self.assertEqual(transform_move(transform_move(move, t, n), INVERSE[t], n), move)
+        self.assertEqual(transform_move(((0, 1), (2, 2)), IDENTITY), ((0, 1), (2, 2)))
+        self.assertEqual(transform_move(((0, 1), (2, 2)), 1), ((1, 2), (2, 0)))
+
+    def test_transformed_games(self):
+        # Playing the transformed moves of a game gives the transformed positions of that game
+        rng = random.Random(7)
+        for board_type in (Board, BitBoard):
+            for _ in range(10):
+                boards = [board_type() for _ in TRANSFORMS]
+                while not boards[0].is_terminal():
+                    hashes = transformed_hashes(boards[0])
+                    key, transform = canonical_form(boards[0])
+                    self.assertEqual(hashes[IDENTITY], boards[0].zobrist_hash)
+                    for t, b in enumerate(boards):
+                        self.assertEqual(b.zobrist_hash, hashes[t])
+                        self.assertEqual(canonical_form(b)[0], key)
+                        self.assertEqual(sorted(b.get_legal_moves()),
+                                         sorted(transform_move(m, t) for m in boards[0].get_legal_moves()))
+                    move = rng.choice(boards[0].get_legal_moves())
+                    # a move stored for the canonical position maps back to the move on this board
+                    canonical_move = transform_move(move, transform)
+                    self.assertEqual(transform_move(canonical_move, INVERSE[transform]), move)
+                    self.assertIn(canonical_move, boards[transform].get_legal_moves())
+                    for t, b in enumerate(boards):
+                        b.play(b.turn, *transform_move(move, t))
+                for b in boards:
+                    self.assertEqual(b.winner, boards[0].winner)
+
+    def test_symmetric_positions_share_a_key(self):
+        corners = [((0, 0), (0, 0)), ((0, 2), (0, 2)), ((2, 0), (2, 0)), ((2, 2), (2, 2))]
+        keys = set()
+        for move in corners:
+            b = Board()
+            b.play(1, *move)
+            keys.add(canonical_form(b)[0])
+        self.assertEqual(len(keys), 1)
+        b = Board()
+        self.assertEqual(canonical_form(b), (b.zobrist_hash, IDENTITY))
+
+
+if __name__ == '__main__':
+    unittest.main()
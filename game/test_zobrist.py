@@ -0,0 +1,75 @@
+import random
+import unittest
+
+from game.bitboard import BitBoard
+from game.board import Board
+from game.zobrist import compute_hash
+
+
+def recompute(b: Board) -> int:
+    n = b.n
+    cells = [b.grid[x][y].get_grid().flatten().tolist() for x in range(n) for y in range(n)]
+    forced = n * n
+    if b.last_move is not None:
+        (_, _), (i, j) = b.last_move
+        if not b.grid[i][j].is_terminal():
+            forced = i * n + j
+    return compute_hash(n, cells, b.turn, forced)
+
+
+class TestZobrist(unittest.TestCase):
+    def test_incremental_hash_matches_recomputed_hash(self):
+        rng = random.Random(3)
+        for _ in range(50):
+            b, bit_board = Board(), BitBoard()
+            self.assertEqual(b.zobrist_hash, recompute(b))
+            while not b.is_terminal():
+                move = rng.choice(b.get_legal_moves())
+                b.play(b.turn, *move)
+                bit_board.play(bit_board.turn, *move)
+                self.assertEqual(b.zobrist_hash, recompute(b))
+                self.assertEqual(bit_board.zobrist_hash, b.zobrist_hash)
+
+    def test_hash_restored_by_undo(self):
+        rng = random.Random(5)
+        for board_type in (Board, BitBoard):
+            b = board_type()
+            hashes, tokens = [], []
+            while not b.is_terminal():
+                hashes.append(b.zobrist_hash)
+                tokens.append(b.make_move(b.turn, *rng.choice(b.get_legal_moves())))
+            while tokens:
+                b.undo(tokens.pop())
+                self.assertEqual(b.zobrist_hash, hashes.pop())
+
+    def test_transpositions_share_a_hash(self):
+        a, b = Board(), Board()
+        for move in [((1, 1), (0, 0)), ((0, 0), (1, 1)), ((1, 1), (2, 2)), ((2, 2), (1, 1))]:
+            a.play(a.turn, *move)
+        for move in [((1, 1), (2, 2)), ((2, 2), (1, 1)), ((1, 1), (0, 0)), ((0, 0), (1, 1))]:
+            b.play(b.turn, *move)
+        self.assertEqual(a.zobrist_hash, b.zobrist_hash)
+
+    def test_hash_covers_turn_and_forced_board(self):
+        a, b = Board(), Board()
+        a.play(1, (0, 0), (1, 1))
+        b.play(1, (0, 0), (1, 2))
+        self.assertNotEqual(a.zobrist_hash, b.zobrist_hash)
+        self.assertNotEqual(Board().zobrist_hash, a.zobrist_hash)
+        # play until a move sends the opponent to a decided sub-board, which gives a free move
+        rng = random.Random(9)
+        c = Board()
+        while c.last_move is None or not c.grid[c.last_move[1][0]][c.last_move[1][1]].is_terminal():
+            c.play(c.turn, *rng.choice(c.get_legal_moves()))
+        self.assertGreater(len({board_position for board_position, _ in c.get_legal_moves()}), 1)
+        self.assertEqual(c.zobrist_hash, recompute(c))
+
+    def test_larger_boards(self):
+        b = Board(4)
+        b.play(1, (0, 0), (3, 3))
+        b.play(-1, (3, 3), (0, 0))
+        self.assertEqual(b.zobrist_hash, recompute(b))
+
+
+if __name__ == '__main__':
+    unittest.main()
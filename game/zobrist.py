@@ -0,0 +1,69 @@
+import random
+from functools import lru_cache
+from typing import List, Tuple
+
+DEFAULT_SEED = 0x5EED
+
+
+class ZobristKeys:
+    """
+    Random 64-bit keys for Zobrist hashing a board of size n.
+    A position's hash is the XOR of
+    <ul>
+    <li> cells[sub_board][cell][0] for every X and cells[sub_board][cell][1] for every O </li>
+    <li> turn if O is to move </li>
+    <li> forced[sub_board] for the sub-board the next move must be played in, or forced[n * n] for a free move </li>
+    </ul>
+    Sub-boards and cells are numbered row by row: (x, y) -> x * n + y.
+    The keys are generated from a fixed seed so hashes are stable across runs and processes.
+    Copies and pickles refer to the shared keys of get_keys() instead of duplicating them.
+    """
+
+    def __init__(self, n: int, seed: int = DEFAULT_SEED):
+        rng = random.Random(seed * 31 + n)
+        self.n: int = n
+        self.seed: int = seed
+        self.cells: List[List[Tuple[int, int]]] = [[(rng.getrandbits(64), rng.getrandbits(64)) for _ in range(n * n)]
+                                                   for __ in range(n * n)]
+        self.turn: int = rng.getrandbits(64)
+        self.forced: List[int] = [rng.getrandbits(64) for _ in range(n * n + 1)]
+
+    def __reduce__(self):
+        if self.seed == DEFAULT_SEED:
+            return get_keys, (self.n,)
+        return ZobristKeys, (self.n, self.seed)
+
+
+@lru_cache(maxsize=None)
+def get_keys(n: int) -> ZobristKeys:
+    """
+    :return: The shared keys for boards of size n
+    """
+    return ZobristKeys(n)
+
+
+def piece_index(player: int) -> int:
+    """
+    :return: Index into ZobristKeys.cells for a piece: 0 for X (+1), 1 for O (-1)
+    """
+    return (1 - player) >> 1
+
+
+def compute_hash(n: int, cells: List[List[int]], turn: int, forced: int) -> int:
+    """
+    Computes a hash from scratch. Boards update their hash incrementally, this is for checks and transforms.
+    :param n: Size of the board
+    :param cells: cells[sub_board][cell] holding 1 for X, -1 for O and 0 for blank
+    :param turn: The player to move
+    :param forced: Index of the sub-board the next move must be played in, n * n for a free move
+    :return: The 64-bit Zobrist hash
+    """
+    keys = get_keys(n)
+    h = keys.forced[forced]
+    if turn == -1:
+        h ^= keys.turn
+    for k, sub_board in enumerate(cells):
+        for c, v in enumerate(sub_board):
+            if v:
+                h ^= keys.cells[k][c][piece_index(v)]
+    return h
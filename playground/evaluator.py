@@ -1,42 +1,254 @@
-from typing import Optional
+import random
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Dict, Optional, List, Tuple
 from agent.base_agent import Agent
+from agent.latency import LatencyHistogram
+from agent.search_stats import SearchStats
+from playground.sprt import SPRT, PENTANOMIAL
 from agent.simple_minimax_agent import SimpleMinimaxAgent
 #from agent.genetic_agent import GeneticAgent
 #from GeneticProgram.genetic import GeneticProgram
+from game.archive import GameRecord, describe_game
 from game.board import Board
 
 
-def play(x_player: Agent, o_player: Agent) -> Optional[Agent]:
+def play(x_player: Agent, o_player: Agent, board_type: type = Board, archive=None) -> Optional[Agent]:
     """
     Takes 2 agents and plays a game. Returns the winner.
     :param x_player: Agent playing X (plays first)
     :param o_player: Agent playing O (plays second)
+    :param board_type: Game engine to play on, Board or any class with the same interface such as BitBoard
+    :param archive: If given, the game is appended to it as a game.archive.GameRecord. An ArchiveWriter or a list.
     :return: The winner if an agent has won, else None in case of draw.
     """
-    b = Board()
+    b = board_type()
+    x_player.start_game(b, 1)
+    o_player.start_game(b, -1)
     current_player = x_player
+    moves, times = [], []
     while not b.is_terminal():
+        start = perf_counter()
         current_player.play_move(board=b)
+        if archive is not None:
+            times.append(perf_counter() - start)
+            moves.append(b.last_move)
         current_player = o_player if current_player == x_player else x_player
+    x_player.end_game()
+    o_player.end_game()
     assert b.winner is not None  # must be +1, 0, -1
+    if archive is not None:
+        archive.append(GameRecord.from_moves(moves, describe_game(x_player, o_player, b.winner, times)))
     return None if b.winner == 0 else (x_player if b.winner == 1 else o_player)
 
 
-def evaluate(a: Agent, b: Agent, num_games: int = 100) -> float:
+def evaluate(a: Agent, b: Agent, num_games: int = 100, board_type: type = Board, workers: Optional[int] = None,
+             seed: Optional[int] = None, archive=None) -> float:
     """
     Takes 2 agents :a and :b and plays :num_games games. Evaluates a's play against b.
     :param a: Agent a
     :param b: Agent b
     :param num_games: Number of games both agents play
+    :param board_type: Game engine to play on, see play()
+    :param workers: Number of processes to spread the games over. Games are played one after another in this
+    process if None or 1. The statistics the agents collect in the workers are merged back into :a and :b.
+    :param seed: If given, the random module is seeded before every game with a per-game seed derived from it,
+    so the result does not depend on :workers, and put back in its state afterwards. With workers and no seed, the
+    per-game seeds come from random.
+    :param archive: If given, every game is appended to it in the order the games were played in, see play()
     :return: Score for agent a
     """
-    a_points = 0  # number of points A has. +1 for win, +0.5 for draw.
-    x_player, o_player = a, b
-    for i in range(num_games):
-        winner = play(x_player, o_player)
-        a_points = a_points + 1 if id(winner) == id(a) else (a_points + 0.5 if winner is None else a_points)
-        x_player, o_player = o_player, x_player  # swap agents for the next game
-    return a_points / num_games
+    seeds = game_seeds(num_games, seed) if seed is not None or (workers or 1) > 1 else None
+    if (workers or 1) <= 1:
+        a_points = 0  # number of points A has. +1 for win, +0.5 for draw.
+        x_player, o_player = a, b
+        state = random.getstate() if seeds is not None else None  # the caller's random stream, put back after
+        try:
+            for i in range(num_games):
+                if seeds is not None:
+                    random.seed(seeds[i])
+                winner = play(x_player, o_player, board_type, archive)
+                a_points = a_points + 1 if id(winner) == id(a) else (a_points + 0.5 if winner is None else a_points)
+                x_player, o_player = o_player, x_player  # swap agents for the next game
+        finally:
+            if state is not None:
+                random.setstate(state)
+        return a_points / num_games
+
+    # Game i is played by the worker i % workers, with a as X in even games as above.
+    chunks = [[(i, seeds[i]) for i in range(k, num_games, workers)] for k in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_play_games, [a] * workers, [b] * workers, chunks, [board_type] * workers,
+                                [archive is not None] * workers))
+    points = [0.0] * num_games
+    records = [None] * num_games
+    for chunk, (scores, games, a_copy, b_copy) in zip(chunks, results):
+        for (i, _), score, record in zip(chunk, scores, games):
+            points[i] = score
+            records[i] = record
+        a.merge_stats(a_copy)
+        if b is not a:
+            b.merge_stats(b_copy)
+    if archive is not None:
+        archive.extend(records)
+    return sum(points) / num_games
+
+
+def evaluate_pairs(pairs: List[Tuple[Agent, Agent]], num_games: int, workers: Optional[int] = None,
+                   seed: Optional[int] = None, board_type: type = Board, archive=None,
+                   pair_seeds: Optional[List[int]] = None) -> List[float]:
+    """
+    Runs evaluate(a, b, num_games) for every (a, b) in :pairs. With :workers, the pairs are played in a pool
+    of processes and the statistics each agent collects there are merged back into it in the order of :pairs,
+    so the outcome does not depend on which worker finishes first.
+    :param pairs: The (a, b) agent pairs to evaluate
+    :param num_games: Number of games per pair
+    :param workers: Number of processes. The pairs are evaluated one after another in this process if None or 1.
+    :param seed: Seed for the per-pair seeds, see evaluate()
+    :param board_type: Game engine to play on, see play()
+    :param archive: If given, every game is appended to it, pair after pair in the order of :pairs, see play()
+    :param pair_seeds: The seed of every pair, see evaluate(), instead of seeds derived from :seed
+    :return: a's score for every pair
+    """
+    if pair_seeds is not None:
+        assert len(pair_seeds) == len(pairs)
+        seeds = pair_seeds
+    elif seed is not None or (workers or 1) > 1:
+        seeds = game_seeds(len(pairs), seed)
+    else:
+        seeds = [None] * len(pairs)
+    if (workers or 1) <= 1:
+        return [evaluate(a, b, num_games, board_type, seed=pair_seed, archive=archive)
+                for (a, b), pair_seed in zip(pairs, seeds)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_evaluate_pair, [a for a, _ in pairs], [b for _, b in pairs],
+                                [num_games] * len(pairs), seeds, [board_type] * len(pairs),
+                                [archive is not None] * len(pairs)))
+    scores = []
+    for (a, b), (score, games, a_copy, b_copy) in zip(pairs, results):
+        a.merge_stats(a_copy)
+        if b is not a:
+            b.merge_stats(b_copy)
+        if archive is not None:
+            archive.extend(games)
+        scores.append(score)
+    return scores
+
+
+def evaluate_sprt(a: Agent, b: Agent, elo0: float = 0, elo1: float = 5, alpha: float = 0.05, beta: float = 0.05,
+                  model: str = PENTANOMIAL, max_games: int = 10000, board_type: type = Board,
+                  workers: Optional[int] = None, seed: Optional[int] = None) -> Tuple[Optional[str], float, int]:
+    """
+    Plays a against b, swapping colours every game like evaluate(), until a sequential probability ratio test
+    decides between H0, a is elo0 Elo stronger than b, and H1, a is elo1 Elo stronger. See playground.sprt.
+    :param elo0: Elo difference of H0
+    :param elo1: Elo difference of H1, greater than elo0
+    :param alpha: Chance of accepting H1 when H0 holds
+    :param beta: Chance of accepting H0 when H1 holds
+    :param model: sprt.TRINOMIAL to test game by game, sprt.PENTANOMIAL to test pairs of games with the colours swapped
+    :param max_games: Number of games after which the test stops without a decision
+    :param board_type: Game engine to play on, see play()
+    :param workers: Number of processes. With workers, games are played in rounds of a few games per worker and
+    the test goes through them in order, so it stops after the same game as with one process. The games a round
+    played past that point are left out.
+    :param seed: Seed for the per-game seeds, see evaluate()
+    :return: (decision, LLR, games played): the decision is sprt.H0 or sprt.H1, or None if max_games were played
+    without crossing a bound
+    """
+    test = SPRT(elo0, elo1, alpha, beta, model)
+    seeds = game_seeds(max_games, seed) if seed is not None or (workers or 1) > 1 else None
+    if (workers or 1) <= 1:
+        x_player, o_player = a, b
+        state = random.getstate() if seeds is not None else None
+        try:
+            for i in range(max_games):
+                if seeds is not None:
+                    random.seed(seeds[i])
+                winner = play(x_player, o_player, board_type)
+                if test.add_game(1 if id(winner) == id(a) else (0.5 if winner is None else 0)) is not None:
+                    break
+                x_player, o_player = o_player, x_player
+        finally:
+            if state is not None:
+                random.setstate(state)
+        return test.decision, test.llr, test.games
+
+    # Game i of a round is played by the worker i % workers, with a as X in even games as above.
+    round_size = 4 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, max_games, round_size):
+            games = range(start, min(start + round_size, max_games))
+            chunks = [[(i, seeds[i]) for i in games[k::workers]] for k in range(workers)]
+            chunks = [chunk for chunk in chunks if chunk]
+            results = list(pool.map(_play_games, [a] * len(chunks), [b] * len(chunks), chunks,
+                                    [board_type] * len(chunks), [False] * len(chunks)))
+            points = {}
+            for chunk, (scores, _, a_copy, b_copy) in zip(chunks, results):
+                points.update(zip((i for i, _ in chunk), scores))
+                a.merge_stats(a_copy)
+                if b is not a:
+                    b.merge_stats(b_copy)
+            for i in games:
+                if test.add_game(points[i]) is not None:
+                    return test.decision, test.llr, test.games
+    return test.decision, test.llr, test.games
+
+
+def search_summary(agents: List[Agent]) -> Dict[str, Dict[str, float]]:
+    """
+    Summarizes the searches and move times of the agents in the games they played, including games played in worker
+    processes, whose statistics evaluate() and evaluate_pairs() merge back. Agents with the same name are added up.
+    :param agents: The agents
+    :return: SearchStats.summary() and LatencyHistogram.summary() of every agent name
+    """
+    totals: Dict[str, Tuple[SearchStats, LatencyHistogram]] = {}
+    for agent in agents:
+        stats, latency = totals.setdefault(agent.agent_name, (SearchStats(), LatencyHistogram()))
+        stats.merge(agent.search_stats)
+        latency.merge(agent.latency)
+    return {name: dict(stats.summary(), **latency.summary()) for name, (stats, latency) in totals.items()}
+
+
+def game_seeds(num_games: int, seed: Optional[int] = None) -> List[int]:
+    """
+    :return: One seed per game, derived from :seed, or drawn from the random module if :seed is None
+    """
+    rng = random.Random(seed) if seed is not None else random
+    return [rng.getrandbits(64) for _ in range(num_games)]
+
+
+def _play_games(a: Agent, b: Agent, games: List[Tuple[int, int]], board_type: type, record: bool) -> Tuple[
+        List[float], List[GameRecord], Agent, Agent]:
+    """
+    Runs in a worker process of evaluate() on copies of the agents.
+    :param games: (game index, seed) of the games to play. a plays X in the even games.
+    :param record: Whether to return the records of the games
+    :return: a's score in every game, the records of the games if :record, and the agents, holding only the
+    statistics of these games
+    """
+    a.reset_stats()
+    b.reset_stats()
+    scores = []
+    records = [] if record else None
+    for i, game_seed in games:
+        random.seed(game_seed)
+        winner = play(a, b, board_type, records) if i % 2 == 0 else play(b, a, board_type, records)
+        scores.append(1 if id(winner) == id(a) else (0.5 if winner is None else 0))
+    return scores, records or [], a, b
+
+
+def _evaluate_pair(a: Agent, b: Agent, num_games: int, seed: int, board_type: type, record: bool) -> Tuple[
+        float, List[GameRecord], Agent, Agent]:
+    """
+    Runs in a worker process of evaluate_pairs() on copies of the agents.
+    :return: a's score, the records of the games if :record, and the agents, holding only the statistics of
+    these games
+    """
+    a.reset_stats()
+    b.reset_stats()
+    records = [] if record else None
+    return evaluate(a, b, num_games, board_type, seed=seed, archive=records), records or [], a, b
 
 
 if __name__ == '__main__':
@@ -49,6 +261,7 @@ if __name__ == '__main__':
     # simple minimax agent should be better, may take some time to finish
     p = SimpleMinimaxAgent(max_depth=4)
     print(evaluate(p, q, num_games=8))
+    print(search_summary([p]))
 
     # Deeper minimax agent must outperform shallower minimax agent? Nope, it's 0.5
     q = SimpleMinimaxAgent(max_depth=2)
@@ -58,6 +271,9 @@ if __name__ == '__main__':
     p = SimpleMinimaxAgent(max_depth=5)
     print(evaluate(p, q, num_games=16))
 
+    # Stop as soon as it is clear whether depth 5 is at least 50 Elo stronger than depth 2
+    print(evaluate_sprt(p, q, elo0=0, elo1=50, max_games=400))
+
     """gp = GeneticProgram()
     g = gp.generate_random_agent()
     print(evaluate(g, p, num_games=1))"""
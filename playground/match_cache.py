@@ -0,0 +1,151 @@
+"""
+Persistent cache of match results between genetic agents, kept in an SQLite file.
+A match is keyed on the traits and the settings (class, depth, time budget, ...) of both agents, the number of
+games and the seed, so a pairing that comes back in a later generation (a survivor meeting an opponent again, or a
+child of a crossover that copied a parent's traits) is answered without playing it again.
+With a seed, every match is played with a seed derived from its key (see match_seed()), so a cached result is the
+one the match would give if it were played again. Without a seed the first result of a pairing would be kept for
+good, so only a cache in memory, which lives as long as the run, can be used without one.
+"""
+import hashlib
+import json
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+from agent.base_agent import Agent
+from playground.evaluator import evaluate_pairs
+
+MEMORY = ':memory:'
+SCHEMA_VERSION = 2  # PRAGMA user_version of the cache files this module reads and writes
+
+# Attributes of an agent, besides its traits, that change how it plays
+_SETTINGS = ('max_depth', 'time_budget', 'tt_size', 'workers')
+
+
+def agent_settings(agent: Agent) -> dict:
+    """
+    :return: The class and search settings of an agent, which the results of its matches depend on
+    """
+    settings = {name: getattr(agent, name) for name in _SETTINGS if hasattr(agent, name)}
+    settings['type'] = type(agent).__name__
+    settings['book'] = agent.opening_book.path if agent.opening_book is not None else None
+    return settings
+
+
+def match_settings(a: Agent, b: Agent) -> str:
+    """
+    :return: The settings of both agents of a match, as they are stored in the cache
+    """
+    return json.dumps([agent_settings(a), agent_settings(b)], sort_keys=True)
+
+
+def _key(a_traits: Sequence[float], b_traits: Sequence[float], num_games: int, seed: Optional[int],
+         settings: str = '') -> tuple:
+    return json.dumps(list(a_traits)), json.dumps(list(b_traits)), num_games, str(seed), settings
+
+
+def match_seed(a_traits: Sequence[float], b_traits: Sequence[float], num_games: int, seed: int) -> int:
+    """
+    :return: The seed a match is played with, see evaluate(). It depends on the key of the match only.
+    """
+    digest = hashlib.blake2b(json.dumps(_key(a_traits, b_traits, num_games, seed)[:4]).encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), 'little')
+
+
+class MatchCache:
+    """
+    Results of matches, a's score against b, stored in an SQLite database.
+    hits and misses count the lookups since the last take_counts().
+    """
+
+    def __init__(self, path: str = MEMORY):
+        """
+        :param path: The database file, created if needed. The cache only lives as long as the object if MEMORY.
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        tables = self.connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        if tables and version != SCHEMA_VERSION:
+            self.connection.close()
+            raise ValueError(f'{path} is not a match cache of version {SCHEMA_VERSION}')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS matches (a_traits TEXT NOT NULL, b_traits TEXT NOT NULL, '
+                                'games INTEGER NOT NULL, seed TEXT NOT NULL, settings TEXT NOT NULL, '
+                                'score REAL NOT NULL, PRIMARY KEY (a_traits, b_traits, games, seed, settings))')
+        self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+
+    def get(self, a_traits: Sequence[float], b_traits: Sequence[float], num_games: int,
+            seed: Optional[int] = None, settings: str = '') -> Optional[float]:
+        """
+        :param settings: The settings of the agents, see match_settings()
+        :return: a's score against b, or None if the match is not in the cache
+        """
+        row = self.connection.execute('SELECT score FROM matches WHERE a_traits = ? AND b_traits = ? AND games = ? '
+                                      'AND seed = ? AND settings = ?',
+                                      _key(a_traits, b_traits, num_games, seed, settings)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put_many(self, results: List[Tuple[Sequence[float], Sequence[float], int, Optional[int], str, float]]) -> None:
+        """
+        Stores the results of matches in one transaction.
+        :param results: (a's traits, b's traits, games, seed, settings, a's score) of every match
+        """
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?, ?)',
+                                        [_key(a, b, games, seed, settings) + (score,)
+                                         for a, b, games, seed, settings, score in results])
+
+    def take_counts(self) -> Tuple[int, int]:
+        """
+        :return: The (hits, misses) since the last call, for per-generation reports
+        """
+        counts = self.hits, self.misses
+        self.hits = self.misses = 0
+        return counts
+
+    def evaluate_pairs(self, pairs: List[Tuple[Agent, Agent]], num_games: int, workers: Optional[int] = None,
+                       seed: Optional[int] = None, **kwargs) -> List[float]:
+        """
+        evaluate_pairs() that answers the pairs found in the cache and only plays the others, once per key. The
+        agents must have a traits attribute.
+        :param seed: Seed of the matches, see match_seed(). Required unless the cache is in memory.
+        :param kwargs: Other arguments of evaluate_pairs(), which only apply to the matches that are played
+        :return: a's score for every pair
+        """
+        if seed is None and self.path != MEMORY:
+            raise ValueError('A match cache kept in a file needs seeded matches, so its results can be reused')
+        scores: List[Optional[float]] = [None] * len(pairs)
+        missing = {}  # key of a match to play: the indices of the pairs it answers
+        for i, (a, b) in enumerate(pairs):
+            settings = match_settings(a, b)
+            key = _key(a.traits, b.traits, num_games, seed, settings)
+            if key in missing:
+                missing[key].append(i)
+                self.hits += 1
+                continue
+            scores[i] = self.get(a.traits, b.traits, num_games, seed, settings)
+            if scores[i] is None:
+                missing[key] = [i]
+        if missing:
+            played = [pairs[indices[0]] for indices in missing.values()]
+            pair_seeds = None if seed is None else [match_seed(a.traits, b.traits, num_games, seed) for a, b in played]
+            results = evaluate_pairs(played, num_games, workers, seed, pair_seeds=pair_seeds, **kwargs)
+            for indices, score in zip(missing.values(), results):
+                for i in indices:
+                    scores[i] = score
+            self.put_many([(a.traits, b.traits, num_games, seed, match_settings(a, b), score)
+                           for (a, b), score in zip(played, results)])
+        return scores
+
+    def close(self) -> None:
+        self.connection.close()
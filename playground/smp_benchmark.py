@@ -0,0 +1,69 @@
+"""
+Measures the speedup of the Lazy SMP search (see agent.search.LazySMP) over the single process search.
+The agent searches every position of game.perft to a fixed depth with 1, 2, 4, ... processes, and the time to
+reach the depth with each number of processes is compared with the time taken by one process.
+
+Run with: python -m playground.smp_benchmark [--agent minimax|genetic] [--depth N] [--workers 4]
+"""
+import argparse
+import os
+from time import perf_counter
+from typing import Dict, List
+
+from agent.genetic_agent import GeneticAgent
+from agent.simple_minimax_agent import SimpleMinimaxAgent
+from game.bitboard import BitBoard
+from game.perft import POSITIONS, setup
+
+GENETIC_TRAITS = [0.3, 0.1, 0.5, 0.2, 0.9, 0.2, 0.5, 0.1, 0.3]
+
+
+def make_agent(kind: str, depth: int, workers: int):
+    if kind == 'genetic':
+        return GeneticAgent('Genetic Agent', GENETIC_TRAITS, max_depth=depth, tt_size=1 << 20, workers=workers)
+    return SimpleMinimaxAgent(max_depth=depth, tt_size=1 << 20, workers=workers)
+
+
+def time_positions(kind: str, depth: int, workers: int) -> float:
+    """
+    :return: Seconds taken to search every non terminal position of game.perft to :depth plies
+    """
+    total = 0
+    for moves, _ in POSITIONS.values():
+        board = setup(BitBoard, moves)
+        if board.is_terminal():
+            continue
+        agent = make_agent(kind, depth, workers)
+        agent.start_game(board, board.turn)  # the helper processes are started here, outside of the timing
+        start = perf_counter()
+        agent.play_move(board)
+        total += perf_counter() - start
+        agent.end_game()
+    return total
+
+
+def run(kind: str, depth: int, max_workers: int) -> Dict[int, float]:
+    """
+    Prints the time and the speedup over one process for 1, 2, 4, ... up to :max_workers processes.
+    :return: The time taken for each number of processes
+    """
+    counts: List[int] = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    times = {}
+    for workers in counts:
+        times[workers] = time_positions(kind, depth, workers)
+        print(f'{workers:>3} workers: {times[workers]:8.2f}s  speedup {times[1] / times[workers]:.2f}x')
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Times the Lazy SMP search with increasing numbers of processes.')
+    parser.add_argument('--agent', choices=['minimax', 'genetic'], default='genetic', help='agent to search with')
+    parser.add_argument('--depth', type=int, default=5, help='depth to search every position to')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='maximum number of processes')
+    args = parser.parse_args()
+    print(f'{os.cpu_count()} CPUs available')
+    run(args.agent, args.depth, args.workers)
@@ -0,0 +1,143 @@
+"""
+Sequential probability ratio test (SPRT) of a match between two agents, as used to test chess engines.
+The test compares two hypotheses about a's strength relative to b, in logistic Elo: H0 that it is elo0 and H1 that
+it is elo1. After every game (trinomial model) or every pair of games with the colours swapped (pentanomial model)
+it updates the log-likelihood ratio (LLR) of H1 over H0 and stops as soon as the LLR leaves the bounds set by the
+error rates: alpha is the chance to accept H1 when H0 holds and beta the chance to accept H0 when H1 holds.
+
+The LLR is that of the generalized SPRT: each hypothesis is represented by the distribution of outcomes closest to
+the observed frequencies (in the maximum likelihood sense) whose expected score is the one of its Elo difference.
+Pairs absorb the advantage of playing first, so the pentanomial model needs fewer games when it is large.
+See playground.evaluator.evaluate_sprt().
+"""
+from math import log
+from typing import List, Optional, Sequence, Tuple
+
+# Decisions of a test
+H0 = 'H0'
+H1 = 'H1'
+
+TRINOMIAL = 'trinomial'
+PENTANOMIAL = 'pentanomial'
+MODELS = (TRINOMIAL, PENTANOMIAL)
+
+# Score of a game, and of a pair of games, for each outcome the counts are kept for
+GAME_SCORES = (0, 0.5, 1)
+PAIR_SCORES = (0, 0.25, 0.5, 0.75, 1)
+
+# Outcomes that have not happened yet count for this much, so that every outcome stays possible
+_PRIOR = 1e-3
+
+
+def elo_to_score(elo: float) -> float:
+    """
+    :return: The expected score of a player :elo logistic Elo points stronger than the opponent
+    """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def sprt_bounds(alpha: float, beta: float) -> Tuple[float, float]:
+    """
+    :return: The (lower, upper) LLR bounds: H0 is accepted below the lower one and H1 above the upper one
+    """
+    return log(beta / (1 - alpha)), log((1 - beta) / alpha)
+
+
+def closest_distribution(frequencies: Sequence[float], scores: Sequence[float], expected: float) -> List[float]:
+    """
+    :param frequencies: Observed frequency of each outcome, all above 0 and summing to 1
+    :param scores: Score of each outcome
+    :param expected: Expected score the distribution must have, strictly between the lowest and highest score
+    :return: The distribution of the outcomes with the given expected score that gives the observed frequencies
+    the highest likelihood
+    """
+    # The maximum is p[i] = frequencies[i] / (1 + x * (scores[i] - expected)) for the x that makes the expected
+    # score right. The expected score decreases with x, which keeps every p[i] positive between low and high.
+    offsets = [score - expected for score in scores]
+    low = -1 / max(offsets)
+    high = -1 / min(offsets)
+    for _ in range(100):
+        x = (low + high) / 2
+        if sum(f * d / (1 + x * d) for f, d in zip(frequencies, offsets)) > 0:
+            low = x
+        else:
+            high = x
+    x = (low + high) / 2
+    p = [f / (1 + x * d) for f, d in zip(frequencies, offsets)]
+    total = sum(p)
+    return [q / total for q in p]
+
+
+def llr(counts: Sequence[float], scores: Sequence[float], elo0: float, elo1: float) -> float:
+    """
+    :param counts: Number of times each outcome happened
+    :param scores: Score of each outcome, GAME_SCORES or PAIR_SCORES
+    :return: The log-likelihood ratio of H1 (elo1) over H0 (elo0)
+    """
+    total = sum(counts)
+    if total == 0:
+        return 0.0
+    frequencies = [(count or _PRIOR) for count in counts]
+    n = sum(frequencies)
+    frequencies = [f / n for f in frequencies]
+    p0 = closest_distribution(frequencies, scores, elo_to_score(elo0))
+    p1 = closest_distribution(frequencies, scores, elo_to_score(elo1))
+    return total * sum(f * (log(q1) - log(q0)) for f, q0, q1 in zip(frequencies, p0, p1))
+
+
+class SPRT:
+    """
+    The state of a running test. Feed it the scores of the games in the order they were played with add_game();
+    the pentanomial model pairs game 2k with game 2k + 1.
+    """
+
+    def __init__(self, elo0: float = 0, elo1: float = 5, alpha: float = 0.05, beta: float = 0.05,
+                 model: str = PENTANOMIAL):
+        """
+        :param elo0: Elo difference of H0
+        :param elo1: Elo difference of H1, greater than elo0
+        :param alpha: Chance of accepting H1 when H0 holds
+        :param beta: Chance of accepting H0 when H1 holds
+        :param model: TRINOMIAL to count wins, draws and losses, PENTANOMIAL to count the scores of pairs of games
+        """
+        assert elo0 < elo1 and model in MODELS
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.model = model
+        self.lower, self.upper = sprt_bounds(alpha, beta)
+        self.scores = PAIR_SCORES if model == PENTANOMIAL else GAME_SCORES
+        self.counts = [0] * len(self.scores)
+        self.games = 0
+        self.llr = 0.0
+        self.decision: Optional[str] = None
+        self._first: Optional[float] = None  # score of the first game of an unfinished pair
+
+    def add_game(self, score: float) -> Optional[str]:
+        """
+        :param score: a's score in the game: 1, 0.5 or 0
+        :return: The decision, H0 or H1, once a bound is crossed, else None
+        """
+        assert self.decision is None
+        self.games += 1
+        if self.model == TRINOMIAL:
+            self.counts[int(score * 2)] += 1
+        elif self._first is None:
+            self._first = score
+            return None
+        else:
+            self.counts[int((self._first + score) * 2)] += 1
+            self._first = None
+        self.llr = llr(self.counts, self.scores, self.elo0, self.elo1)
+        if self.llr >= self.upper:
+            self.decision = H1
+        elif self.llr <= self.lower:
+            self.decision = H0
+        return self.decision
+
+    @property
+    def score(self) -> float:
+        """
+        a's mean score over the games counted so far
+        """
+        n = sum(self.counts)
+        return sum(count * score for count, score in zip(self.counts, self.scores)) / n if n else 0.5
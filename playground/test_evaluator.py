@@ -0,0 +1,22 @@
+import random
+import unittest
+
+from agent.random_agent import RandomAgent
+from playground.evaluator import evaluate, evaluate_sprt
+
+
+class TestEvaluator(unittest.TestCase):
+    def test_seed_keeps_random_stream(self):
+        random.seed(1)
+        expected = random.random()
+        random.seed(1)
+        score = evaluate(RandomAgent(), RandomAgent(), 4, seed=2)
+        self.assertEqual(random.random(), expected)  # the games were seeded, the caller's stream was put back
+        self.assertEqual(evaluate(RandomAgent(), RandomAgent(), 4, seed=2), score)
+        random.seed(1)
+        evaluate_sprt(RandomAgent(), RandomAgent(), max_games=4, seed=2)
+        self.assertEqual(random.random(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
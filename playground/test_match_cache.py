@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from agent.genetic_agent import GeneticAgent
+from playground.evaluator import evaluate
+from playground.match_cache import MatchCache, match_seed, match_settings
+
+
+def agent(traits):
+    return GeneticAgent('GeneticAgent', list(traits), max_depth=1)
+
+
+class TestMatchCache(unittest.TestCase):
+    def test_persistent(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'matches.sqlite')
+            cache = MatchCache(path)
+            cache.put_many([([0.1] * 9, [0.2] * 9, 4, 7, 'x', 0.75), ([0.1] * 9, [0.2] * 9, 4, None, 'x', 0.25)])
+            cache.close()
+            cache = MatchCache(path)
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.get([0.1] * 9, [0.2] * 9, 4, 7, 'x'), 0.75)
+            self.assertEqual(cache.get([0.1] * 9, [0.2] * 9, 4, settings='x'), 0.25)
+            self.assertIsNone(cache.get([0.2] * 9, [0.1] * 9, 4, 7, 'x'))  # the order of the agents matters
+            self.assertIsNone(cache.get([0.1] * 9, [0.2] * 9, 6, 7, 'x'))
+            self.assertIsNone(cache.get([0.1] * 9, [0.2] * 9, 4, 7, 'y'))  # agents set up differently
+            self.assertEqual(cache.take_counts(), (2, 3))
+            self.assertEqual(cache.take_counts(), (0, 0))
+            # results kept in a file are only reused if they can be played again
+            with self.assertRaises(ValueError):
+                cache.evaluate_pairs([(agent([0.1] * 9), agent([0.2] * 9))], 4)
+            cache.close()
+
+    def test_evaluate_pairs(self):
+        cache = MatchCache()
+        a, b, c = [0.9, 0.1, 0.8, 0.2, 0.7, 0.3, 0.6, 0.4, 0.5], [0.5] * 9, [0.1] * 9
+        pairs = [(agent(a), agent(b)), (agent(b), agent(c)), (agent(a), agent(b))]
+        scores = cache.evaluate_pairs(pairs, 2, seed=3)
+        self.assertEqual(cache.take_counts(), (1, 2))  # the repeated pairing is only played once
+        self.assertEqual(scores[0], scores[2])
+        # a cached result is the result of playing the match again
+        self.assertEqual(evaluate(agent(b), agent(c), 2, seed=match_seed(b, c, 2, 3)), scores[1])
+        # a child with the traits of a parent reuses its results
+        self.assertEqual(cache.evaluate_pairs([(agent(b), agent(c)), (agent(a), agent(b))], 2, seed=3), scores[1:])
+        self.assertEqual(cache.take_counts(), (2, 0))
+        # deeper agents are other matches
+        deeper = GeneticAgent('GeneticAgent', list(b), max_depth=2), GeneticAgent('GeneticAgent', list(c), max_depth=2)
+        self.assertNotEqual(match_settings(*deeper), match_settings(agent(b), agent(c)))
+        cache.evaluate_pairs([deeper], 2, seed=3)
+        self.assertEqual(cache.take_counts(), (0, 1))
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from agent.random_agent import RandomAgent
+from agent.simple_minimax_agent import SimpleMinimaxAgent
+from playground.evaluator import evaluate_sprt
+from playground.sprt import SPRT, H0, H1, TRINOMIAL, PENTANOMIAL, GAME_SCORES, PAIR_SCORES, closest_distribution, \
+    elo_to_score, llr, sprt_bounds
+
+
+class TestSPRT(unittest.TestCase):
+    def test_bounds(self):
+        lower, upper = sprt_bounds(0.05, 0.05)
+        self.assertAlmostEqual(lower, -2.944, places=3)
+        self.assertAlmostEqual(upper, 2.944, places=3)
+        self.assertAlmostEqual(elo_to_score(0), 0.5)
+        self.assertAlmostEqual(elo_to_score(400), 10 / 11)
+
+    def test_closest_distribution(self):
+        frequencies = [0.3, 0.2, 0.5]
+        for expected in (0.3, 0.5, 0.6, 0.9):
+            p = closest_distribution(frequencies, GAME_SCORES, expected)
+            self.assertAlmostEqual(sum(p), 1)
+            self.assertAlmostEqual(sum(q * score for q, score in zip(p, GAME_SCORES)), expected)
+        # frequencies that already have the expected score are their own closest distribution
+        for q, f in zip(closest_distribution(frequencies, GAME_SCORES, 0.6), frequencies):
+            self.assertAlmostEqual(q, f)
+
+    def test_llr(self):
+        self.assertEqual(llr([0, 0, 0], GAME_SCORES, 0, 10), 0)
+        self.assertGreater(llr([30, 40, 50], GAME_SCORES, 0, 10), 0)
+        self.assertLess(llr([50, 40, 30], GAME_SCORES, 0, 10), 0)
+        # more games with the same frequencies are more evidence
+        self.assertAlmostEqual(llr([60, 80, 100], GAME_SCORES, 0, 10), 2 * llr([30, 40, 50], GAME_SCORES, 0, 10))
+        self.assertGreater(llr([5, 10, 30, 20, 15], PAIR_SCORES, 0, 10), 0)
+
+    def test_decisions(self):
+        for model in (TRINOMIAL, PENTANOMIAL):
+            test = SPRT(0, 50, model=model)
+            while test.add_game(1) is None:
+                pass
+            self.assertEqual(test.decision, H1)
+            self.assertGreater(test.llr, test.upper)
+            test = SPRT(0, 50, model=model)
+            while test.add_game(0.5 if test.games % 3 else 0) is None:
+                pass
+            self.assertEqual(test.decision, H0)
+            self.assertLess(test.llr, test.lower)
+        test = SPRT(model=PENTANOMIAL)
+        for score in (1, 0, 0.5):
+            test.add_game(score)
+        self.assertEqual(test.counts, [0, 0, 1, 0, 0])  # one pair of a win and a loss, the draw waits for its pair
+
+    def test_evaluate_sprt(self):
+        decision, ratio, games = evaluate_sprt(SimpleMinimaxAgent(max_depth=2), RandomAgent(), 0, 100,
+                                               max_games=200, seed=1)
+        self.assertEqual(decision, H1)
+        self.assertLess(games, 200)
+        self.assertEqual(evaluate_sprt(SimpleMinimaxAgent(max_depth=2), RandomAgent(), 0, 100, max_games=200,
+                                       seed=1, workers=2), (decision, ratio, games))
+
+
+if __name__ == '__main__':
+    unittest.main()